@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class AppFinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_finance'
+
+    def ready(self):
+        # ผูก signals ที่ดูแลยอดคงเหลือของบัญชี + ตารางสรุปรายเดือน
+        from . import signals  # noqa: F401
+
+        # นับ query ของทุก connection (รวม thread ของ sync_to_async) ให้ QueryStatsMiddleware
+        from django.db.backends.signals import connection_created
+
+        from .utils_perf import install_query_recorder
+        connection_created.connect(install_query_recorder, dispatch_uid="app_finance.query_recorder")
@@ -128,4 +128,27 @@ class DebtPlanSettingForm(forms.ModelForm):
                 "min": "0",
             }),
             "strategy": forms.Select(attrs={"class": "form-select"}),
-        }
\ No newline at end of file
+        }
+
+class StatementImportForm(forms.Form):
+    file = forms.FileField(
+        label="ไฟล์ CSV",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv,.txt"}),
+    )
+    account = forms.ModelChoiceField(
+        label="บัญชีตั้งต้น",
+        queryset=Account.objects.none(),
+        required=False,
+        help_text="ใช้กับแถวที่ไม่มีคอลัมน์บัญชี (เช่น statement ของบัญชีเดียว)",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    dry_run = forms.BooleanField(
+        label="ตรวจอย่างเดียว ยังไม่บันทึก",
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["account"].queryset = Account.objects.filter(owner=user, is_active=True)
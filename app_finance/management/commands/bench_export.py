@@ -0,0 +1,135 @@
+import csv
+import io
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from app_finance import views
+from app_finance.models import Account, Category, Goal, Tag, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "วัดเวลา + memory สูงสุดของ Export CSV แบบ stream กับข้อมูลจำลองจำนวนมาก "
+        "(ข้อมูลถูกสร้างใน transaction แล้ว rollback ทิ้ง ไม่ค้างในฐานข้อมูล)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="จำนวนรายการจำลอง")
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="วัดแบบเดิม (โหลด model ทั้งหมดแล้วเขียนลง memory) เทียบด้วย",
+        )
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+
+        with transaction.atomic():
+            user = self._seed(rows)
+            request = RequestFactory().get("/transactions/export/")
+            request.user = user
+
+            self._measure("stream", lambda: self._consume_stream(request, {}), rows)
+            self._measure(
+                "stream + tags/goal/recurring",
+                lambda: self._consume_stream(request, {"tags": "1", "goal": "1", "recurring": "1"}),
+                rows,
+            )
+            if options["legacy"]:
+                self._measure("legacy (HttpResponse)", lambda: self._legacy(user), rows)
+
+            transaction.set_rollback(True)
+
+    def _seed(self, rows):
+        started = time.perf_counter()
+        random.seed(rows)
+
+        user = User.objects.create(username=f"bench_export_{int(time.time())}")
+        accounts = [
+            Account.objects.create(owner=user, name=f"บัญชี {i}", account_type="BANK")
+            for i in range(3)
+        ]
+        category = Category.objects.create(name="bench", kind="EXPENSE")
+        goal = Goal.objects.create(owner=user, name="bench goal", target_amount=Decimal("1000"))
+        tag = Tag.objects.create(owner=user, name="bench")
+
+        start = date.today() - timedelta(days=3650)
+        batch = []
+        for i in range(rows):
+            batch.append(Transaction(
+                owner=user,
+                account=accounts[i % 3],
+                category=category if i % 2 else None,
+                goal=goal if i % 10 == 0 else None,
+                date=start + timedelta(days=i % 3650),
+                direction="IN" if i % 4 == 0 else "OUT",
+                amount=Decimal(random.randint(1, 100000)) / 100,
+                note=f"รายการทดสอบ {i}",
+            ))
+            if len(batch) == 5000:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Transaction.objects.bulk_create(batch)
+
+        tx_ids = Transaction.objects.filter(owner=user).values_list("id", flat=True)
+        Through = Transaction.tags.through
+        links = []
+        for tx_id in tx_ids.iterator(chunk_size=5000):
+            if tx_id % 5 == 0:
+                links.append(Through(transaction_id=tx_id, tag_id=tag.id))
+            if len(links) == 5000:
+                Through.objects.bulk_create(links)
+                links = []
+        Through.objects.bulk_create(links)
+
+        self.stdout.write(f"สร้างข้อมูลจำลอง {rows:,} รายการ ใช้เวลา {time.perf_counter() - started:.1f}s")
+        return user
+
+    def _consume_stream(self, request, params):
+        request.GET = request.GET.copy()
+        request.GET.clear()
+        request.GET.update(params)
+        response = views.transactions_export_csv(request)
+        size = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+        return size
+
+    def _legacy(self, user):
+        # วิธีเดิม: วน queryset (สร้าง model ทุกแถว) เขียนลง buffer ใน memory ทั้งก้อน
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        qs = Transaction.objects.filter(owner=user).select_related("account", "category").order_by("-date", "-id")
+        for t in qs:
+            writer.writerow([
+                t.date.strftime("%Y-%m-%d"),
+                t.account.name,
+                t.direction,
+                f"{t.amount:.2f}",
+                t.category.name if t.category else "",
+                t.is_estimate,
+                t.note or "",
+            ])
+        return len(buffer.getvalue().encode())
+
+    def _measure(self, label, func, rows):
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = func()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{label}: {elapsed:.2f}s / {rows / elapsed:,.0f} แถว/วินาที / "
+            f"ขนาดไฟล์ {size / 1024 / 1024:.1f} MB / memory สูงสุด {peak / 1024 / 1024:.1f} MB"
+        )
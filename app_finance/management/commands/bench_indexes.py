@@ -0,0 +1,118 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from app_finance.models import Transaction
+from app_finance.utils_rollup import month_range
+
+
+class Command(BaseCommand):
+    help = (
+        "แสดง EXPLAIN QUERY PLAN + เวลาที่ใช้ของ query หลักบน Transaction "
+        "เทียบตอนไม่มี composite index (ก่อน) กับตอนมี index (หลัง)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="username ที่ใช้ทดสอบ (ไม่ใส่ = user ที่มีรายการมากที่สุด)",
+        )
+        parser.add_argument("--repeat", type=int, default=20, help="จำนวนรอบที่จับเวลาต่อ query")
+
+    def handle(self, *args, **options):
+        user = self._pick_user(options.get("user"))
+        today = timezone.now().date()
+        queries = self._queries(user, today.year, today.month)
+        repeat = max(options["repeat"], 1)
+
+        self.stdout.write(f"user: {user.username} / database: {connection.vendor}\n")
+
+        # "ก่อน": ลบ index ชั่วคราวใน transaction แล้ว rollback ทิ้ง
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index in Transaction._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+            before = self._run(queries, repeat)
+            transaction.set_rollback(True)
+
+        after = self._run(queries, repeat)
+
+        for label, _ in queries:
+            plan_before, ms_before = before[label]
+            plan_after, ms_after = after[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f"  ก่อน ({ms_before:.3f} ms)")
+            self.stdout.write(self._indent(plan_before))
+            self.stdout.write(f"  หลัง ({ms_after:.3f} ms)")
+            self.stdout.write(self._indent(plan_after))
+            self.stdout.write("")
+
+    def _pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"ไม่พบ user: {username}")
+
+        user = (
+            User.objects
+            .annotate(n=Count("finance_transactions"))
+            .order_by("-n")
+            .first()
+        )
+        if user is None:
+            raise CommandError("ยังไม่มี user ในระบบ")
+        return user
+
+    def _queries(self, user, year, month):
+        start, end = month_range(year, month)
+        base = Transaction.objects.filter(owner=user)
+        return [
+            (
+                "ยอดรายเดือนแบบเดิม (date__year / date__month)",
+                base.filter(date__year=year, date__month=month, is_estimate=False)
+                .values("direction").annotate(total=Sum("amount")).order_by(),
+            ),
+            (
+                "ยอดรายเดือนแบบช่วงวันที่",
+                base.filter(date__gte=start, date__lt=end, is_estimate=False)
+                .values("direction").annotate(total=Sum("amount")).order_by(),
+            ),
+            (
+                "รายจ่ายจริงต่อหมวดของเดือน",
+                base.filter(is_estimate=False, direction="OUT", date__gte=start, date__lt=end)
+                .values("category_id").annotate(total=Sum("amount")).order_by(),
+            ),
+            (
+                "ความคืบหน้าเป้าหมาย (goal, direction)",
+                base.filter(goal__isnull=False, direction="IN")
+                .values("goal_id").annotate(total=Sum("amount")).order_by(),
+            ),
+            (
+                "รายการที่สร้างจาก recurring ในเดือน",
+                base.filter(source_recurring__isnull=False, date__gte=start, date__lt=end)
+                .values_list("source_recurring_id", "date"),
+            ),
+            (
+                "รายการล่าสุด 50 รายการ",
+                base.order_by("-date", "-id")[:50],
+            ),
+        ]
+
+    def _run(self, queries, repeat):
+        results = {}
+        for label, qs in queries:
+            plan = qs.explain()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(qs.all())
+            elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+            results[label] = (plan, elapsed_ms)
+        return results
+
+    def _indent(self, text):
+        return "\n".join(f"    {line}" for line in text.splitlines())
@@ -0,0 +1,122 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_PATHS = [
+    "/dashboard/",
+    "/report/monthly/",
+    "/budgets/",
+    "/goals/",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "ยิง request พร้อมกันหลาย ๆ ตัวใส่ server ที่รันอยู่ แล้ววัด request/วินาที, p50, p95 "
+        "ใส่ --url หลายตัวเพื่อเทียบ เช่น WSGI (runserver / gunicorn) กับ ASGI "
+        "(uvicorn config.asgi:application) ด้วยข้อมูลชุดเดียวกัน"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            action="append",
+            default=[],
+            help="base URL ของ server เช่น http://127.0.0.1:8000 (ใส่ได้หลายตัว)",
+        )
+        parser.add_argument("--user", required=True, help="username ที่ใช้ login")
+        parser.add_argument("--password", required=True)
+        parser.add_argument(
+            "--path",
+            action="append",
+            default=[],
+            help="หน้าที่จะยิง (ใส่ได้หลายตัว ไม่ใส่ = dashboard / report / budgets / goals)",
+        )
+        parser.add_argument("--concurrency", type=int, default=16, help="จำนวน client พร้อมกัน")
+        parser.add_argument("--requests", type=int, default=200, help="จำนวน request ต่อหน้า")
+        parser.add_argument("--timeout", type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        urls = options["url"] or ["http://127.0.0.1:8000"]
+        paths = options["path"] or DEFAULT_PATHS
+
+        for base in urls:
+            base = base.rstrip("/")
+            opener = self._login(base, options["user"], options["password"], options["timeout"])
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{base}  (concurrency {options['concurrency']}, {options['requests']} req/หน้า)"
+            ))
+            for path in paths:
+                # อุ่นเครื่องก่อน 1 ครั้ง (cache / connection) แล้วค่อยจับเวลา
+                self._fetch(opener, base + path, options["timeout"])
+                result = self._run(opener, base + path, options)
+                self.stdout.write(
+                    f"  {path:<22} {result['rps']:8.1f} req/s   "
+                    f"p50 {result['p50'] * 1000:7.1f} ms   p95 {result['p95'] * 1000:7.1f} ms   "
+                    f"error {result['errors']}"
+                )
+
+    def _login(self, base, username, password, timeout):
+        jar = CookieJar()
+        opener = build_opener(HTTPCookieProcessor(jar))
+        login_url = f"{base}/login/"
+        try:
+            opener.open(login_url, timeout=timeout).read()
+        except URLError as exc:
+            raise CommandError(f"ต่อ {base} ไม่ได้: {exc}")
+
+        csrf = next((c.value for c in jar if c.name == "csrftoken"), "")
+        body = urlencode({
+            "username": username,
+            "password": password,
+            "csrfmiddlewaretoken": csrf,
+        }).encode()
+        request = Request(login_url, data=body, headers={"Referer": login_url})
+        opener.open(request, timeout=timeout).read()
+        if not any(c.name == "sessionid" for c in jar):
+            raise CommandError(f"login {base} ไม่สำเร็จ (username / password ถูกไหม)")
+        return opener
+
+    def _fetch(self, opener, url, timeout):
+        started = time.perf_counter()
+        try:
+            with opener.open(url, timeout=timeout) as response:
+                response.read()
+                ok = response.status == 200
+        except (HTTPError, URLError, TimeoutError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def _run(self, opener, url, options):
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+
+        def worker(_):
+            nonlocal errors
+            elapsed, ok = self._fetch(opener, url, options["timeout"])
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(worker, range(options["requests"])))
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "rps": len(latencies) / wall if wall else 0,
+            "p50": statistics.median(latencies),
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "errors": errors,
+        }
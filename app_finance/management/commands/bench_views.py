@@ -0,0 +1,176 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from app_finance.models import DebtPlanSetting
+from app_finance.utils_debt import calculate_debt_plan
+from app_finance.utils_perf import QueryRecorder
+from app_finance.views import _sweep_input, _user_debts
+
+
+def _debt_plan(user):
+    debts = _sweep_input(_user_debts(user)[0])
+    plan = DebtPlanSetting.objects.filter(user=user).first()
+    budget = plan.monthly_budget if plan and plan.monthly_budget else None
+    if not budget:
+        budget = sum((d["min_payment"] for d in debts), Decimal("0")) * Decimal("1.5")
+    return calculate_debt_plan(debts, budget, "AVALANCHE", max_months=600)
+
+
+# ชื่อ -> URL (ยิงผ่าน test client) หรือฟังก์ชันที่รับ user
+BENCHMARKS = {
+    "dashboard": "/dashboard/",
+    "transactions_list": "/transactions/",
+    "monthly_report": "/report/monthly/",
+    "cash_calendar": "/calendar/",
+    "debts_overview": "/debts/",
+    "export_csv": "/transactions/export/",
+    "export_json": "/tools/export/json/",
+    "calculate_debt_plan": _debt_plan,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "จับเวลา view หลัก ๆ ผ่าน test client (ไม่ต้องเปิด server) พร้อมจำนวน query และ memory สูงสุด "
+        "เขียนผลเป็น JSON ไว้เทียบระหว่าง commit ด้วย --compare "
+        "(สร้างข้อมูลทดสอบก่อนด้วย `python manage.py generate_data`)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", default="bench1", help="username ที่ใช้วัด")
+        parser.add_argument(
+            "--only",
+            action="append",
+            default=[],
+            choices=sorted(BENCHMARKS),
+            help="วัดเฉพาะตัวที่ระบุ (ใส่ได้หลายตัว)",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="จำนวนรอบที่จับเวลาต่อตัว")
+        parser.add_argument("--warmup", type=int, default=1, help="รอบอุ่นเครื่องที่ไม่นับ")
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="ล้าง cache ทุกรอบ (ค่าเริ่มต้นวัดตอน cache อุ่นแล้ว)",
+        )
+        parser.add_argument("--label", default="", help="ชื่อชุดผล เช่น hash ของ commit")
+        parser.add_argument("--output", help="เขียนผลเป็นไฟล์ JSON")
+        parser.add_argument("--compare", help="ไฟล์ JSON ผลเดิม ไว้แสดงว่าเร็ว/ช้าลงเท่าไหร่")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"ไม่พบ user: {options['user']} (สร้างด้วย generate_data ก่อน)")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat ต้องมีอย่างน้อย 1")
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                baseline = {b["name"]: b for b in json.load(fh)["benchmarks"]}
+
+        client = Client()
+        client.force_login(user)
+
+        names = options["only"] or list(BENCHMARKS)
+        results = []
+        with override_settings(ALLOWED_HOSTS=["testserver"], QUERY_BUDGET_STRICT=False):
+            for name in names:
+                result = self._bench(name, BENCHMARKS[name], client, user, options)
+                results.append(result)
+                self._print(result, baseline.get(name) if baseline else None)
+
+        if options["output"]:
+            payload = {
+                "label": options["label"],
+                "created_at": timezone.now().isoformat(),
+                "user": user.username,
+                "cold": options["cold"],
+                "repeat": options["repeat"],
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "benchmarks": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(payload, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"เขียนผลไว้ที่ {options['output']}"))
+
+    def _run_once(self, target, client, user):
+        """return: (จำนวนไบต์ของผลลัพธ์, status)"""
+        if callable(target):
+            return len(target(user)), 200
+        response = client.get(target)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return size, response.status_code
+
+    def _bench(self, name, target, client, user, options):
+        for _ in range(options["warmup"]):
+            self._run_once(target, client, user)
+
+        timings = []
+        queries = []
+        size = status = None
+        for _ in range(options["repeat"]):
+            if options["cold"]:
+                for cache in caches.all():
+                    cache.clear()
+            recorder = QueryRecorder()
+            started = time.perf_counter()
+            with recorder.capture():
+                size, status = self._run_once(target, client, user)
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(recorder.count)
+
+        # วัด memory แยกอีกรอบ (tracemalloc ทำให้ช้าลง ไม่ปนกับเวลา)
+        if options["cold"]:
+            for cache in caches.all():
+                cache.clear()
+        tracemalloc.start()
+        try:
+            self._run_once(target, client, user)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            "name": name,
+            "target": target if isinstance(target, str) else target.__name__,
+            "status": status,
+            "bytes": size,
+            "ms_min": round(timings[0], 2),
+            "ms_median": round(statistics.median(timings), 2),
+            "ms_p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            "ms_max": round(timings[-1], 2),
+            "queries": max(queries),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def _print(self, r, old):
+        line = (
+            f"  {r['name']:<20} {r['ms_median']:9.1f} ms (min {r['ms_min']:.1f})  "
+            f"{r['queries']:4d} queries  peak {r['peak_kb']:9.1f} KB"
+        )
+        if r["status"] != 200:
+            line += f"  status {r['status']}"
+        if old:
+            delta = (r["ms_median"] - old["ms_median"]) / old["ms_median"] * 100 if old["ms_median"] else 0
+            line += f"  | เดิม {old['ms_median']:.1f} ms ({delta:+.0f}%) q {old['queries']}"
+            if r["queries"] > old["queries"] or delta > 20:
+                self.stdout.write(self.style.WARNING(line))
+                return
+        self.stdout.write(line)
@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_finance.models import ReportJob
+from app_finance.utils_reports import (
+    ensure_report_job,
+    pdf_available,
+    run_pending_jobs,
+    run_report_job,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "สร้าง PDF รายงานรายเดือนล่วงหน้า (เช่น สรุปสิ้นปีของทุก user) หรือเก็บคิวงาน PDF ที่ค้างอยู่ "
+        "เดือนที่ข้อมูลไม่เปลี่ยนและมีไฟล์แล้วจะข้ามไป"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="ปีที่ต้องการสร้างรายงาน")
+        parser.add_argument(
+            "--month",
+            type=int,
+            action="append",
+            default=[],
+            help="เดือน 1-12 (ใส่ได้หลายตัว ไม่ใส่ = ทั้งปี)",
+        )
+        parser.add_argument(
+            "--user",
+            help="username ที่ต้องการ (ไม่ใส่ = ทุก user ที่ active)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="สร้างใหม่ทั้งหมดแม้จะมีไฟล์ของข้อมูลเวอร์ชันนี้แล้ว",
+        )
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help="เก็บคิวที่ web สั่งไว้ (ใช้คู่กับ REPORT_WORKERS = 0 แล้วรันผ่าน cron)",
+        )
+
+    def handle(self, *args, **options):
+        if not pdf_available():
+            raise CommandError("ยังไม่ได้ติดตั้ง WeasyPrint สร้าง PDF ไม่ได้")
+
+        if options["pending"]:
+            done, failed = run_pending_jobs()
+            self.stdout.write(self.style.SUCCESS(
+                f"เก็บคิวแล้ว: สำเร็จ {done} / ไม่สำเร็จ {failed}"
+            ))
+            if not options["year"]:
+                return
+
+        year = options["year"]
+        if not year:
+            raise CommandError("ต้องใส่ --year (หรือ --pending)")
+        months = options["month"] or list(range(1, 13))
+        if any(m < 1 or m > 12 for m in months):
+            raise CommandError("--month ต้องอยู่ระหว่าง 1-12")
+
+        users = User.objects.filter(is_active=True).order_by("username")
+        username = options.get("user")
+        if username:
+            users = User.objects.filter(username=username)
+            if not users.exists():
+                raise CommandError(f"ไม่พบ user: {username}")
+
+        built = cached = failed = 0
+        for user in users:
+            for month in months:
+                job, queued = ensure_report_job(user, year, month, force=options["force"])
+                if not queued:
+                    # มีไฟล์แล้ว หรือมี worker อื่นกำลังสร้างอยู่
+                    cached += job.status == "DONE"
+                    continue
+                try:
+                    ok = run_report_job(job.pk)
+                except Exception as exc:
+                    ok = False
+                    self.stderr.write(f"  {user.username} {month:02d}/{year}: {exc}")
+                if ok:
+                    built += 1
+                elif ReportJob.objects.filter(pk=job.pk, status="FAILED").exists():
+                    failed += 1
+
+            self.stdout.write(f"  {user.username}: เสร็จ")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"สร้างใหม่ {built} ไฟล์ / ใช้ไฟล์เดิม {cached} ไฟล์ / ไม่สำเร็จ {failed} ไฟล์"
+        ))
@@ -0,0 +1,231 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app_finance.models import (
+    Account,
+    Category,
+    CategoryBudget,
+    DebtPlanSetting,
+    Goal,
+    RecurringTransaction,
+    Tag,
+    Transaction,
+)
+from app_finance.utils_dashboard import bump_dashboard_version
+from app_finance.utils_goals import rebuild_goal_progress
+from app_finance.utils_ledger import rebuild_account_balances
+from app_finance.utils_rollup import add_months, rebuild_monthly_summaries
+from app_finance.utils_search import rebuild_search_index
+
+# ประเภทบัญชีวนตามลำดับนี้ (2 บัญชีแรกเป็นเงินสด/ธนาคารเสมอ รายการส่วนใหญ่ลงที่นี่)
+ACCOUNT_TYPES = ["BANK", "CASH", "CREDIT", "WALLET", "LOAN", "BANK", "CREDIT"]
+NOTES = ["กาแฟ", "ข้าวกลางวัน", "ค่าเดินทาง", "ซื้อของเข้าบ้าน", "ค่าน้ำค่าไฟ", "โอนเงิน", "", None]
+TAG_NAMES = ["เที่ยว", "ครอบครัว", "งาน", "สุขภาพ", "ของขวัญ", "ลงทุน", "รถ", "บ้าน"]
+
+
+class Command(BaseCommand):
+    help = (
+        "สร้างข้อมูลสมมติสำหรับทดสอบความเร็ว: user / บัญชี / หมวด / tag / เป้าหมาย / รายการประจำ "
+        "และ Transaction จำนวนมาก (หลักพันถึงหลักล้าน) ด้วย bulk_create ทีละ batch"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1, help="จำนวน user ที่จะสร้าง")
+        parser.add_argument("--prefix", default="bench", help="username = prefix + เลขลำดับ")
+        parser.add_argument("--password", default="bench")
+        parser.add_argument("--accounts", type=int, default=5, help="บัญชีต่อ user")
+        parser.add_argument("--categories", type=int, default=15, help="จำนวนหมวดกลางขั้นต่ำ (สร้างเพิ่มถ้าไม่พอ)")
+        parser.add_argument("--tags", type=int, default=6, help="tag ต่อ user")
+        parser.add_argument("--goals", type=int, default=4, help="เป้าหมายต่อ user")
+        parser.add_argument("--recurring", type=int, default=10, help="รายการประจำต่อ user")
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=10_000,
+            help="Transaction ต่อ user (ทดสอบได้ถึงหลักล้าน)",
+        )
+        parser.add_argument("--months", type=int, default=24, help="กระจายรายการย้อนหลังกี่เดือน")
+        parser.add_argument("--estimate-ratio", type=float, default=0.1, help="สัดส่วนรายการประมาณการ")
+        parser.add_argument("--seed", type=int, default=0, help="seed ของ random (ได้ข้อมูลเหมือนเดิมทุกครั้ง)")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="ลบ user ชื่อซ้ำ (และข้อมูลทั้งหมดของเขา) ก่อนสร้างใหม่",
+        )
+
+    def handle(self, *args, **options):
+        if options["transactions"] < 0 or options["users"] < 1:
+            raise CommandError("--users ต้องมากกว่า 0 และ --transactions ห้ามติดลบ")
+        if options["accounts"] < 1:
+            raise CommandError("--accounts ต้องมีอย่างน้อย 1")
+
+        rng = random.Random(options["seed"])
+        today = date.today()
+        categories = self._ensure_categories(options["categories"], options["prefix"])
+
+        started = time.perf_counter()
+        total = 0
+        for n in range(1, options["users"] + 1):
+            username = f"{options['prefix']}{n}"
+            existing = User.objects.filter(username=username)
+            if existing.exists():
+                if not options["clear"]:
+                    raise CommandError(f"มี user {username} อยู่แล้ว (ใส่ --clear เพื่อลบแล้วสร้างใหม่)")
+                existing.delete()
+
+            user_started = time.perf_counter()
+            with transaction.atomic():
+                user = User.objects.create_user(username=username, password=options["password"])
+                created = self._populate(user, categories, rng, today, options)
+            total += created
+            self.stdout.write(
+                f"  {username}: {created:,} รายการ ({time.perf_counter() - user_started:.1f} วินาที)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"สร้าง {options['users']} user / {total:,} รายการ "
+            f"ใน {time.perf_counter() - started:.1f} วินาที"
+        ))
+
+    def _ensure_categories(self, count, prefix):
+        categories = list(Category.objects.all())
+        missing = count - len(categories)
+        if missing > 0:
+            Category.objects.bulk_create([
+                Category(
+                    name=f"{prefix}-หมวด-{i}",
+                    kind="INCOME" if i % 4 == 0 else "EXPENSE",
+                    monthly_budget=Decimal(1000 * (i % 7)) or None,
+                )
+                for i in range(len(categories), count)
+            ])
+            categories = list(Category.objects.all())
+        return categories
+
+    def _populate(self, user, categories, rng, today, options):
+        accounts = Account.objects.bulk_create([
+            Account(
+                owner=user,
+                name=f"บัญชี {i + 1}",
+                account_type=ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)],
+                opening_balance=(
+                    Decimal(-rng.randint(5_000, 300_000))
+                    if ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)] in ("CREDIT", "LOAN")
+                    else Decimal(rng.randint(0, 50_000))
+                ),
+                interest_rate=Decimal(rng.choice([0, 9, 16, 18, 24])),
+                min_payment_percent=Decimal(rng.choice([3, 5, 10])),
+            )
+            for i in range(options["accounts"])
+        ])
+        tags = Tag.objects.bulk_create([
+            Tag(owner=user, name=TAG_NAMES[i % len(TAG_NAMES)] + ("" if i < len(TAG_NAMES) else f" {i}"))
+            for i in range(options["tags"])
+        ])
+        goals = Goal.objects.bulk_create([
+            Goal(
+                owner=user,
+                name=f"เป้าหมาย {i + 1}",
+                account=accounts[0],
+                target_amount=Decimal(rng.randint(10, 500) * 1000),
+                target_date=today + timedelta(days=rng.randint(30, 1000)),
+                direction="OUT" if i % 3 == 2 else "IN",
+            )
+            for i in range(options["goals"])
+        ])
+        expense = [c for c in categories if c.kind == "EXPENSE"] or categories
+        income = [c for c in categories if c.kind == "INCOME"] or categories
+
+        rules = RecurringTransaction.objects.bulk_create([
+            RecurringTransaction(
+                owner=user,
+                account=rng.choice(accounts),
+                category=rng.choice(income if i % 4 == 0 else expense),
+                direction="IN" if i % 4 == 0 else "OUT",
+                amount=Decimal(rng.randint(200, 30_000)),
+                day_of_month=rng.choice([1, 5, 10, 15, 25, 28, 29, 30, 31]),
+                name=f"รายการประจำ {i + 1}",
+            )
+            for i in range(options["recurring"])
+        ])
+
+        created = self._create_transactions(
+            user, accounts, expense, income, tags, goals, rules, rng, today, options,
+        )
+
+        budget_months = [add_months(today.year, today.month, -k) for k in range(3)]
+        CategoryBudget.objects.bulk_create([
+            CategoryBudget(
+                owner=user, category=c, year=y, month=m,
+                amount=Decimal(rng.randint(10, 200) * 100),
+            )
+            for c in expense[:8]
+            for y, m in budget_months
+        ])
+        DebtPlanSetting.objects.create(
+            user=user,
+            monthly_budget=Decimal(rng.randint(5, 30) * 1000),
+            strategy="AVALANCHE",
+        )
+
+        # bulk_create ไม่ผ่าน signals -> คำนวณยอดคงเหลือ / ตารางสรุป / ยอดเป้าหมายใหม่
+        rebuild_account_balances(Account.objects.filter(owner=user))
+        rebuild_monthly_summaries(User.objects.filter(pk=user.pk))
+        rebuild_goal_progress(Goal.objects.filter(owner=user))
+        rebuild_search_index({user.pk})
+        bump_dashboard_version({user.pk})
+        return created
+
+    def _create_transactions(self, user, accounts, expense, income, tags, goals, rules, rng, today, options):
+        """สร้างทีละ batch ไม่เก็บทั้งก้อนไว้ใน memory (รองรับหลักล้านรายการ)"""
+        count = options["transactions"]
+        batch_size = options["batch_size"]
+        span_days = max(options["months"] * 30, 1)
+        estimate_ratio = options["estimate_ratio"]
+        # รายการส่วนใหญ่ลงบัญชีเงินสด / ธนาคาร ให้หนี้ยังติดลบอยู่
+        weights = [6 if a.account_type in ("BANK", "CASH", "WALLET") else 1 for a in accounts]
+        Through = Transaction.tags.through
+
+        created = 0
+        while created < count:
+            batch = []
+            for _ in range(min(batch_size, count - created)):
+                is_income = rng.random() < 0.2
+                is_estimate = rng.random() < estimate_ratio
+                tx_date = today - timedelta(days=rng.randint(-30 if is_estimate else 0, span_days))
+                batch.append(Transaction(
+                    owner=user,
+                    account=rng.choices(accounts, weights)[0],
+                    category=rng.choice(income if is_income else expense) if rng.random() < 0.9 else None,
+                    goal=rng.choice(goals) if goals and rng.random() < 0.05 else None,
+                    date=tx_date,
+                    direction="IN" if is_income else "OUT",
+                    amount=(
+                        Decimal(rng.randint(500_000, 6_000_000)) / 100
+                        if is_income
+                        else Decimal(rng.randint(2_000, 300_000)) / 100
+                    ),
+                    is_estimate=is_estimate,
+                    is_paid=not is_estimate,
+                    note=rng.choice(NOTES),
+                    source_recurring=rng.choice(rules) if rules and rng.random() < 0.05 else None,
+                ))
+
+            Transaction.objects.bulk_create(batch, batch_size=batch_size)
+            if tags:
+                links = [
+                    Through(transaction_id=tx.pk, tag_id=tag.pk)
+                    for tx in batch
+                    if rng.random() < 0.2
+                    for tag in rng.sample(tags, rng.randint(1, min(2, len(tags))))
+                ]
+                Through.objects.bulk_create(links, batch_size=batch_size, ignore_conflicts=True)
+            created += len(batch)
+        return created
@@ -0,0 +1,75 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app_finance.utils_recurring import materialize_recurring
+from app_finance.utils_rollup import add_months
+
+
+def _parse_month(value):
+    try:
+        year, month = (int(part) for part in value.split("-"))
+    except ValueError:
+        raise CommandError(f"เดือนต้องอยู่ในรูป YYYY-MM: {value}")
+    if not 1 <= month <= 12:
+        raise CommandError(f"เดือนต้องอยู่ในรูป YYYY-MM: {value}")
+    return year, month
+
+
+class Command(BaseCommand):
+    help = (
+        "สร้าง Transaction จากรายการประจำ (RecurringTransaction) ทีละหลายเดือน ทุก user "
+        "รันซ้ำได้ ของที่สร้างไปแล้วจะถูกข้าม เหมาะตั้ง cron ไว้ต้นเดือน"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="username (ไม่ใส่ = ทุก user)")
+        parser.add_argument("--from", dest="first", help="เดือนแรก YYYY-MM (ไม่ใส่ = เดือนนี้)")
+        parser.add_argument("--to", dest="last", help="เดือนสุดท้าย YYYY-MM (ไม่ใส่ = ตาม --months)")
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=1,
+            help="จำนวนเดือนนับจาก --from (ใช้เมื่อไม่ใส่ --to)",
+        )
+        parser.add_argument(
+            "--actual",
+            action="store_true",
+            help="สร้างเป็นรายการจริง (จ่ายแล้ว) แทนรายการประมาณการ",
+        )
+
+    def handle(self, *args, **options):
+        owners = None
+        username = options.get("user")
+        if username:
+            owners = User.objects.filter(username=username)
+            if not owners.exists():
+                raise CommandError(f"ไม่พบ user: {username}")
+
+        today = timezone.now().date()
+        first = _parse_month(options["first"]) if options["first"] else (today.year, today.month)
+        if options["last"]:
+            last = _parse_month(options["last"])
+        else:
+            last = add_months(*first, max(options["months"], 1) - 1)
+        if last < first:
+            raise CommandError("--to ต้องไม่ก่อน --from")
+
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = materialize_recurring(first, last, owners=owners, estimate=not options["actual"])
+        elapsed = time.perf_counter() - started
+
+        kind = "รายการจริง" if options["actual"] else "รายการประมาณการ"
+        self.stdout.write(
+            f"{first[1]:02d}/{first[0]} - {last[1]:02d}/{last[0]}: "
+            f"สร้าง{kind} {result['created']:,} รายการ ให้ {len(result['owners'])} user "
+            f"(มีอยู่แล้ว {result['skipped']:,})"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"ใช้ {len(queries)} queries / {elapsed:.2f}s"
+        ))
@@ -0,0 +1,72 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_finance.models import Account
+from app_finance.utils_import import StatementImportError, import_statement
+
+
+class Command(BaseCommand):
+    help = (
+        "นำเข้า statement CSV ให้ user ที่ระบุ (ข้ามรายการที่มีอยู่แล้วให้อัตโนมัติ) "
+        "แสดงจำนวนที่สร้าง / ซ้ำ / ผิดพลาด และความเร็ว"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="ไฟล์ CSV (ใส่ได้หลายไฟล์)")
+        parser.add_argument("--user", required=True, help="username ปลายทาง")
+        parser.add_argument("--account", help="ชื่อบัญชีตั้งต้น สำหรับแถวที่ไม่มีคอลัมน์บัญชี")
+        parser.add_argument(
+            "--map",
+            action="append",
+            default=[],
+            metavar="FIELD=COLUMN",
+            help="กำหนดคอลัมน์เอง เช่น --map date=\"Posting Date\" --map note=Description",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="ตรวจอย่างเดียว ไม่บันทึก")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"ไม่พบ user: {options['user']}")
+
+        account = None
+        if options["account"]:
+            account = Account.objects.filter(owner=user, name=options["account"]).first()
+            if account is None:
+                raise CommandError(f"ไม่พบบัญชี: {options['account']}")
+
+        column_map = {}
+        for item in options["map"]:
+            field, sep, column = item.partition("=")
+            if not sep:
+                raise CommandError(f"--map ต้องอยู่ในรูป FIELD=COLUMN: {item}")
+            column_map[field.strip()] = column.strip()
+
+        for path in options["paths"]:
+            try:
+                with open(path, "rb") as fp:
+                    report = import_statement(
+                        fp, user, default_account=account, column_map=column_map,
+                        dry_run=options["dry_run"],
+                    )
+            except OSError as exc:
+                raise CommandError(f"เปิดไฟล์ไม่ได้: {exc}")
+            except StatementImportError as exc:
+                raise CommandError(f"{path}: {exc}")
+
+            label = " (dry-run)" if report["dry_run"] else ""
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{path}{label}"))
+            self.stdout.write(
+                f"  แถว {report['rows']:,} / สร้างใหม่ {report['created']:,} / "
+                f"ซ้ำ {report['duplicates']:,} / ผิดพลาด {report['errors']:,}"
+            )
+            for line, message in report["error_lines"]:
+                self.stdout.write(self.style.WARNING(f"  บรรทัด {line}: {message}"))
+            if report["unknown_categories"]:
+                self.stdout.write(f"  ไม่พบหมวดหมู่: {', '.join(sorted(report['unknown_categories']))}")
+            if report["new_tags"]:
+                self.stdout.write(f"  Tag ใหม่: {', '.join(sorted(report['new_tags']))}")
+            self.stdout.write(self.style.SUCCESS(
+                f"  ใช้เวลา {report['seconds']:.2f}s ({report['rows_per_second']:,.0f} แถว/วินาที)"
+            ))
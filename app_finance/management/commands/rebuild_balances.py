@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_finance.models import Account
+from app_finance.utils_ledger import rebuild_account_balances
+
+
+class Command(BaseCommand):
+    help = "คำนวณ ledger_balance ของทุกบัญชีใหม่จาก Transaction จริง และตรวจว่ายอดที่เก็บไว้ตรงกันไหม"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="username ที่ต้องการ rebuild (ไม่ใส่ = ทุก user)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="ตรวจอย่างเดียว ไม่เขียนทับ (exit code 1 ถ้าเจอยอดไม่ตรง)",
+        )
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.all()
+        username = options.get("user")
+        if username:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"ไม่พบ user: {username}")
+            accounts = accounts.filter(owner=user)
+
+        check_only = options["check"]
+        mismatches = rebuild_account_balances(accounts, fix=not check_only)
+
+        for acc, stored, expected in mismatches:
+            self.stdout.write(
+                f"  {acc} (id={acc.pk}): เก็บไว้ {stored:.2f} / ยอดจริง {expected:.2f}"
+            )
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("ยอดคงเหลือทุกบัญชีตรงกับรายการจริง"))
+        elif check_only:
+            raise CommandError(f"พบบัญชียอดไม่ตรง {len(mismatches)} บัญชี")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"แก้ยอดคงเหลือแล้ว {len(mismatches)} บัญชี")
+            )
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_finance.models import Goal
+from app_finance.utils_goals import rebuild_goal_progress
+
+
+class Command(BaseCommand):
+    help = "คำนวณ done_amount ของทุกเป้าหมายใหม่จาก Transaction จริง และตรวจว่ายอดที่เก็บไว้ตรงกันไหม"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="username ที่ต้องการ rebuild (ไม่ใส่ = ทุก user)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="ตรวจอย่างเดียว ไม่เขียนทับ (exit code 1 ถ้าเจอยอดไม่ตรง)",
+        )
+
+    def handle(self, *args, **options):
+        goals = Goal.objects.all()
+        username = options.get("user")
+        if username:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"ไม่พบ user: {username}")
+            goals = goals.filter(owner=user)
+
+        check_only = options["check"]
+        mismatches = rebuild_goal_progress(goals, fix=not check_only)
+
+        for goal, stored, expected in mismatches:
+            self.stdout.write(
+                f"  {goal} (id={goal.pk}): เก็บไว้ {stored:.2f} / ยอดจริง {expected:.2f}"
+            )
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("ยอดสะสมทุกเป้าหมายตรงกับรายการจริง"))
+        elif check_only:
+            raise CommandError(f"พบเป้าหมายยอดไม่ตรง {len(mismatches)} เป้า")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"แก้ยอดสะสมแล้ว {len(mismatches)} เป้า")
+            )
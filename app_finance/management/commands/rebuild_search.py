@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_finance.utils_search import check_search_index, rebuild_search_index, search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "สร้าง search index ของรายการ (note / ชื่อบัญชี / ชื่อหมวด / ชื่อ tag) ใหม่จาก Transaction จริง "
+        "และตรวจว่ามีรายการตกหล่น / ค้างอยู่ใน index ไหม"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="username ที่ต้องการ rebuild (ไม่ใส่ = ทุก user)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="ตรวจอย่างเดียว ไม่เขียนทับ (exit code 1 ถ้าเจอรายการไม่ตรง)",
+        )
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        if backend is None:
+            raise CommandError(
+                "ฐานข้อมูลนี้ไม่มี search index (ต้องเป็น SQLite ที่มี FTS5 หรือ PostgreSQL "
+                "และรัน migrate แล้ว) ตอนนี้ค้นด้วย icontains แทน"
+            )
+
+        owner_ids = None
+        username = options.get("user")
+        if username:
+            try:
+                owner_ids = {User.objects.get(username=username).pk}
+            except User.DoesNotExist:
+                raise CommandError(f"ไม่พบ user: {username}")
+
+        if options["check"]:
+            missing, stale = check_search_index(owner_ids)
+            if missing:
+                self.stdout.write(f"  ยังไม่อยู่ใน index {len(missing)} รายการ เช่น id {sorted(missing)[:10]}")
+            if stale:
+                self.stdout.write(f"  ค้างอยู่ใน index ทั้งที่ไม่มีรายการแล้ว {len(stale)} รายการ")
+            if missing or stale:
+                raise CommandError("search index ไม่ตรงกับรายการจริง (รันใหม่โดยไม่ใส่ --check เพื่อแก้)")
+            self.stdout.write(self.style.SUCCESS("search index ครบตรงกับรายการจริง"))
+            return
+
+        started = time.perf_counter()
+        written = rebuild_search_index(owner_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"สร้าง search index ({backend}) ใหม่ {written:,} รายการ "
+            f"ใน {time.perf_counter() - started:.1f} วินาที"
+        ))
@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_finance.utils_rollup import rebuild_monthly_summaries
+
+
+class Command(BaseCommand):
+    help = "สร้างตาราง MonthlySummary ใหม่จาก Transaction จริง และตรวจว่ายอดที่เก็บไว้ตรงกันไหม"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="username ที่ต้องการ rebuild (ไม่ใส่ = ทุก user)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="ตรวจอย่างเดียว ไม่เขียนทับ (exit code 1 ถ้าเจอยอดไม่ตรง)",
+        )
+
+    def handle(self, *args, **options):
+        owners = None
+        username = options.get("user")
+        if username:
+            owners = User.objects.filter(username=username)
+            if not owners.exists():
+                raise CommandError(f"ไม่พบ user: {username}")
+
+        check_only = options["check"]
+        mismatches = rebuild_monthly_summaries(owners, fix=not check_only)
+
+        for key, stored, expected in sorted(mismatches, key=repr):
+            owner_id, year, month, category_id, direction, is_estimate = key
+            self.stdout.write(
+                f"  owner={owner_id} {month:02d}/{year} category={category_id} "
+                f"{direction} estimate={is_estimate}: เก็บไว้ {stored} / ยอดจริง {expected}"
+            )
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("ตารางสรุปรายเดือนตรงกับรายการจริงทั้งหมด"))
+        elif check_only:
+            raise CommandError(f"พบยอดสรุปไม่ตรง {len(mismatches)} แถว")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"สร้างยอดสรุปใหม่แล้ว {len(mismatches)} แถว")
+            )
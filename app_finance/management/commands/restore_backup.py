@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app_finance.utils_restore import RestoreError, restore_backup
+
+
+class Command(BaseCommand):
+    help = (
+        "นำเข้าไฟล์สำรองข้อมูลจาก export_full_json (JSON / NDJSON / .gz) ให้ user ที่ระบุ "
+        "รันซ้ำได้ ของที่มีอยู่แล้วจะไม่ถูกสร้างซ้ำ"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="ไฟล์สำรองข้อมูล")
+        parser.add_argument("--user", required=True, help="username ปลายทาง")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"ไม่พบ user: {options['user']}")
+
+        try:
+            with open(options["path"], "rb") as fp:
+                stats = restore_backup(fp, user)
+        except OSError as exc:
+            raise CommandError(f"เปิดไฟล์ไม่ได้: {exc}")
+        except RestoreError as exc:
+            raise CommandError(f"ไฟล์สำรองข้อมูลไม่ถูกต้อง: {exc}")
+
+        seconds = stats.pop("_seconds")
+        for table, stat in stats.items():
+            self.stdout.write(
+                f"  {table}: สร้างใหม่ {stat['created']:,} / มีอยู่แล้ว {stat['existing']:,}"
+            )
+
+        tx = stats.get("transactions", {"created": 0, "existing": 0})
+        total_tx = tx["created"] + tx["existing"]
+        rate = f" ({total_tx / seconds:,.0f} รายการ/วินาที)" if seconds > 0 and total_tx else ""
+        self.stdout.write(self.style.SUCCESS(f"นำเข้าเสร็จใน {seconds:.1f}s{rate}"))
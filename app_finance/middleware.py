@@ -0,0 +1,92 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .utils_perf import QueryBudgetExceeded, QueryRecorder, perf_stats, query_budgets
+
+logger = logging.getLogger("app_finance.perf")
+
+
+class QueryStatsMiddleware:
+    """
+    วัดทุก request: ชื่อ view, จำนวน SQL, เวลา SQL รวม, query ที่ช้าที่สุด และเวลารวมของ request
+    (view ใน repo นี้ render template ข้างใน view เลย เวลารวมจึงรวมเวลา render แล้ว
+    ส่วนที่ไม่ใช่ SQL = python_ms)
+
+    - สะสมสถิติใน perf_stats (ดูได้ที่ /tools/perf/ สำหรับ staff)
+    - เขียน log 1 บรรทัดเป็น JSON ต่อ request ที่ logger "app_finance.perf"
+    - เกิน QUERY_BUDGETS -> log ระดับ warning หรือ raise QueryBudgetExceeded
+      ถ้า QUERY_BUDGET_STRICT = True (ใช้ตอนรัน test)
+
+    รองรับทั้ง WSGI และ ASGI (async view) ใส่ไว้บนสุดของ MIDDLEWARE เพื่อนับ query ของ session/auth ด้วย
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "PERF_STATS_ENABLED", True)
+        self.slow_limit = getattr(settings, "PERF_SLOW_QUERIES", 3)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.capture():
+            response = self.get_response(request)
+        self._finish(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.capture():
+            response = await self.get_response(request)
+        self._finish(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    def _finish(self, request, response, recorder, elapsed):
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "<unresolved>"
+
+        total_ms = elapsed * 1000
+        sql_ms = recorder.sql_seconds * 1000
+        budget = query_budgets().get(view_name)
+        over_budget = budget is not None and recorder.count > budget
+
+        perf_stats.record(view_name, recorder.count, sql_ms, total_ms, over_budget)
+
+        record = {
+            "view": view_name,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "budget": budget,
+            "sql_ms": round(sql_ms, 2),
+            "python_ms": round(total_ms - sql_ms, 2),
+            "total_ms": round(total_ms, 2),
+        }
+        if over_budget:
+            record["slowest"] = recorder.slowest(self.slow_limit)
+            logger.warning(json.dumps(record, ensure_ascii=False))
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(
+                    f"{view_name} ใช้ {recorder.count} queries (budget {budget})"
+                )
+        elif logger.isEnabledFor(logging.INFO):
+            record["slowest"] = recorder.slowest(self.slow_limit)
+            logger.info(json.dumps(record, ensure_ascii=False))
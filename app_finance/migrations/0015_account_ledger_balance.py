@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:12
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_ledger_balance(apps, schema_editor):
+    Account = apps.get_model("app_finance", "Account")
+    Transaction = apps.get_model("app_finance", "Transaction")
+
+    balances = {}
+    rows = (
+        Transaction.objects
+        .values("account_id", "direction")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in rows:
+        total = row["total"] or Decimal("0")
+        if row["direction"] != "IN":
+            total = -total
+        balances[row["account_id"]] = balances.get(row["account_id"], Decimal("0")) + total
+
+    accounts = list(Account.objects.filter(pk__in=balances.keys()))
+    for acc in accounts:
+        acc.ledger_balance = balances[acc.pk]
+    Account.objects.bulk_update(accounts, ["ledger_balance"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0014_debtplansetting_monthly_budget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='ledger_balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='ยอดสุทธิจากรายการทั้งหมด (ระบบคำนวณให้ ไม่ต้องแก้เอง)', max_digits=14),
+        ),
+        migrations.RunPython(backfill_ledger_balance, migrations.RunPython.noop),
+    ]
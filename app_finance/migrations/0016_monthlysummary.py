@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_monthly_summary(apps, schema_editor):
+    Transaction = apps.get_model("app_finance", "Transaction")
+    MonthlySummary = apps.get_model("app_finance", "MonthlySummary")
+
+    rows = (
+        Transaction.objects
+        .annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values("owner_id", "year", "month", "category_id", "direction", "is_estimate")
+        .annotate(total=Sum("amount"), tx_count=Count("id"))
+        .order_by()
+    )
+    MonthlySummary.objects.bulk_create(
+        [MonthlySummary(**row) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0015_account_ledger_balance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField(help_text='1-12')),
+                ('direction', models.CharField(choices=[('IN', 'เงินเข้า'), ('OUT', 'เงินออก')], max_length=3)),
+                ('is_estimate', models.BooleanField(default=False)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tx_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='app_finance.category')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='finance_monthly_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-year', '-month', 'direction'],
+                'unique_together': {('owner', 'year', 'month', 'category', 'direction', 'is_estimate')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0016_monthlysummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['owner', 'date'], name='tx_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['owner', 'is_estimate', 'direction', 'date'], name='tx_owner_est_dir_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['owner', 'goal', 'direction'], name='tx_owner_goal_dir_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['owner', 'source_recurring', 'date'], name='tx_owner_recurring_date_idx'),
+        ),
+    ]
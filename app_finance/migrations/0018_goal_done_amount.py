@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:40
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_done_amount(apps, schema_editor):
+    Goal = apps.get_model("app_finance", "Goal")
+    Transaction = apps.get_model("app_finance", "Transaction")
+
+    directions = dict(Goal.objects.values_list("pk", "direction"))
+    totals = {}
+    rows = (
+        Transaction.objects
+        .filter(goal__isnull=False, is_estimate=False)
+        .values("goal_id", "direction")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in rows:
+        if directions.get(row["goal_id"]) == row["direction"]:
+            totals[row["goal_id"]] = row["total"] or Decimal("0")
+
+    goals = list(Goal.objects.filter(pk__in=totals.keys()))
+    for goal in goals:
+        goal.done_amount = totals[goal.pk]
+    Goal.objects.bulk_update(goals, ["done_amount"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0017_transaction_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='done_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='ยอดสะสมจากรายการจริงที่ผูกกับเป้าหมาย (ระบบคำนวณให้ ไม่ต้องแก้เอง)', max_digits=14),
+        ),
+        migrations.RunPython(backfill_done_amount, migrations.RunPython.noop),
+    ]
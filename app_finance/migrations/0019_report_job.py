@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:46
+
+import app_finance.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0018_goal_done_amount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField(help_text='1-12')),
+                ('data_version', models.CharField(help_text='hash ของข้อมูลที่ใช้ทำรายงาน ข้อมูลเปลี่ยน = version ใหม่', max_length=40)),
+                ('status', models.CharField(choices=[('QUEUED', 'รอคิว'), ('RUNNING', 'กำลังสร้าง'), ('DONE', 'เสร็จแล้ว'), ('FAILED', 'ไม่สำเร็จ')], default='QUEUED', max_length=10)),
+                ('pdf', models.FileField(blank=True, upload_to=app_finance.models.report_upload_path)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='finance_report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reportjob_status_idx')],
+                'unique_together': {('owner', 'year', 'month', 'data_version')},
+            },
+        ),
+    ]
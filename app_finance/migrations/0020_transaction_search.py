@@ -0,0 +1,87 @@
+import logging
+from collections import defaultdict
+
+from django.db import DatabaseError, migrations
+
+from app_finance.utils_search import SEARCH_TABLE, write_documents
+
+logger = logging.getLogger(__name__)
+
+# FTS5: token แยกด้วยช่องว่างเท่านั้น (ตัดคำ / ตัวเล็ก-ใหญ่ ทำใน python ก่อนเขียน)
+# นับสระ / วรรณยุกต์ไทย (M*) เป็นส่วนหนึ่งของคำ และทำ prefix index ให้ค้นแบบพิมพ์ไปค้นไปได้เร็ว
+SQLITE_CREATE = (
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    "owner, note, account, category, tags, "
+    "tokenize = \"unicode61 remove_diacritics 0 categories 'L* N* Co M*'\", "
+    "prefix = '1 2 3')"
+)
+
+POSTGRESQL_CREATE = [
+    f"CREATE TABLE {SEARCH_TABLE} ("
+    "transaction_id bigint PRIMARY KEY "
+    "REFERENCES app_finance_transaction (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "owner_id integer, "
+    "document tsvector NOT NULL)",
+    f"CREATE INDEX {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING gin (document)",
+    f"CREATE INDEX {SEARCH_TABLE}_owner ON {SEARCH_TABLE} (owner_id)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        try:
+            schema_editor.execute(SQLITE_CREATE)
+        except DatabaseError:
+            # SQLite ที่ compile มาไม่มี FTS5 -> ไม่มี index ค้นด้วย icontains แบบเดิม
+            logger.warning("SQLite นี้ไม่มี FTS5 ข้ามการสร้าง search index")
+            return
+    elif vendor == "postgresql":
+        for sql in POSTGRESQL_CREATE:
+            schema_editor.execute(sql)
+    else:
+        return
+
+    Transaction = apps.get_model("app_finance", "Transaction")
+    Through = Transaction.tags.through
+
+    last_pk = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            rows = list(
+                Transaction.objects
+                .filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "owner_id", "note", "account__name", "category__name")[:2000]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            tags = defaultdict(list)
+            for tx_id, name in (
+                Through.objects
+                .filter(transaction_id__in=[r[0] for r in rows])
+                .values_list("transaction_id", "tag__name")
+            ):
+                tags[tx_id].append(name)
+            write_documents(
+                [(*row, tags.get(row[0], [])) for row in rows],
+                cursor=cursor,
+                backend=vendor,
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0019_report_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:36
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+KEY_FIELDS = ("owner_id", "year", "month", "category_id", "direction", "is_estimate")
+
+
+def merge_duplicate_summaries(apps, schema_editor):
+    """
+    แถวที่ key ซ้ำกัน (เกิดจากแถว category / owner เป็น NULL ถูกสร้างพร้อมกัน) ต่างถือยอดคนละส่วน
+    รวมยอดเข้าแถวแรกแล้วลบแถวที่เหลือ ก่อนสร้าง constraint
+    """
+    MonthlySummary = apps.get_model("app_finance", "MonthlySummary")
+    keep = {}
+    extra = []
+    for row in MonthlySummary.objects.order_by("id").values("id", "total", "tx_count", *KEY_FIELDS):
+        key = tuple(row[f] for f in KEY_FIELDS)
+        if key in keep:
+            first = keep[key]
+            first["total"] += row["total"]
+            first["tx_count"] += row["tx_count"]
+            first["merged"] = True
+            extra.append(row["id"])
+        else:
+            keep[key] = row
+    for row in keep.values():
+        if row.get("merged"):
+            MonthlySummary.objects.filter(pk=row["id"]).update(total=row["total"], tx_count=row["tx_count"])
+    for i in range(0, len(extra), 500):
+        MonthlySummary.objects.filter(pk__in=extra[i:i + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0020_transaction_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='monthlysummary',
+            unique_together=set(),
+        ),
+        migrations.RunPython(merge_duplicate_summaries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='monthlysummary',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('owner', 0), models.F('year'), models.F('month'), django.db.models.functions.comparison.Coalesce('category', 0), models.F('direction'), models.F('is_estimate'), name='monthly_summary_unique_key'),
+        ),
+    ]
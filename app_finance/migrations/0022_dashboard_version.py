@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_finance', '0021_monthly_summary_null_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=40, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
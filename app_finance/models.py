@@ -4,7 +4,7 @@ from math import ceil
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models import Sum
+from django.db.models.functions import Coalesce
 
 
 class Account(models.Model):
@@ -56,25 +56,44 @@ class Account(models.Model):
     )
     is_active = models.BooleanField(default=True)
 
+    # ยอดสุทธิของรายการทั้งหมดในบัญชีนี้ (รวมรายรับ - รวมรายจ่าย)
+    # อัปเดตอัตโนมัติทุกครั้งที่ Transaction ถูกสร้าง/แก้ไข/ลบ (ดู signals.py)
+    # ถ้าสงสัยว่ายอดเพี้ยน ใช้ `python manage.py rebuild_balances` สร้างใหม่ได้
+    ledger_balance = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text="ยอดสุทธิจากรายการทั้งหมด (ระบบคำนวณให้ ไม่ต้องแก้เอง)",
+    )
+
     def __str__(self):
         return f"{self.name} ({self.get_account_type_display()})"
 
+    def save(self, *args, **kwargs):
+        """
+        ledger_balance ถูกบวกลบด้วย F() จาก signals ตลอดเวลา
+        save() ทั้งแถว (ฟอร์มแก้บัญชี / admin) จึงห้ามเขียนค่าที่โหลดมาทับ
+        ไม่งั้นรายการที่บันทึกระหว่างโหลดกับ save จะหายไปจากยอด
+        (สร้างใหม่ หรือระบุ update_fields ที่มี ledger_balance เอง ยังเขียนได้ตามปกติ)
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "ledger_balance"
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def current_balance(self):
         """
         ยอดปัจจุบัน = opening_balance + (รวมรายรับ - รวมรายจ่าย)
         ใช้กรณีที่ amount ของ Transaction เก็บเป็นจำนวนบวกเสมอ
+        อ่านจาก ledger_balance ที่เก็บไว้แล้ว ไม่ต้อง query ทุกครั้ง
         """
         opening = self.opening_balance or Decimal("0")
-        total_in = (
-            self.transactions.filter(direction="IN").aggregate(s=Sum("amount"))["s"]
-            or Decimal("0")
-        )
-        total_out = (
-            self.transactions.filter(direction="OUT").aggregate(s=Sum("amount"))["s"]
-            or Decimal("0")
-        )
-        return opening + total_in - total_out
+        return opening + (self.ledger_balance or Decimal("0"))
 
 
 class Category(models.Model):
@@ -230,6 +249,14 @@ class Goal(models.Model):
     is_active = models.BooleanField(default=True)
     note = models.TextField(blank=True, null=True)
 
+    done_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text="ยอดสะสมจากรายการจริงที่ผูกกับเป้าหมาย (ระบบคำนวณให้ ไม่ต้องแก้เอง)",
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -311,6 +338,21 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # index ตามรูปแบบ query ที่ใช้บ่อยใน views (กรอง owner ก่อนเสมอ)
+        indexes = [
+            models.Index(fields=["owner", "date"], name="tx_owner_date_idx"),
+            models.Index(
+                fields=["owner", "is_estimate", "direction", "date"],
+                name="tx_owner_est_dir_date_idx",
+            ),
+            models.Index(fields=["owner", "goal", "direction"], name="tx_owner_goal_dir_idx"),
+            models.Index(
+                fields=["owner", "source_recurring", "date"],
+                name="tx_owner_recurring_date_idx",
+            ),
+        ]
+
     def __str__(self):
         prefix = "ประมาณการ" if self.is_estimate else "จริง"
         return f"[{prefix}] {self.date} {self.get_direction_display()} {self.amount} ({self.account})"
@@ -370,6 +412,57 @@ class RecurringTransaction(models.Model):
         return f"[ประจำ] ทุกวันที่ {self.day_of_month} {direction} {self.amount} ({self.account})"
 
 
+class MonthlySummary(models.Model):
+    """
+    ยอดรวมรายเดือนที่คำนวณเก็บไว้ล่วงหน้า (ต่อ owner / เดือน / หมวด / ประเภท / ประมาณการ)
+    อัปเดตทีละรายการผ่าน signals ตอน Transaction ถูกสร้าง/แก้ไข/ลบ
+    ถ้าข้อมูลเพี้ยน ใช้ `python manage.py rebuild_summaries` สร้างใหม่ได้
+    """
+
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="finance_monthly_summaries",
+        null=True,
+        blank=True,
+    )
+    year = models.IntegerField()
+    month = models.IntegerField(help_text="1-12")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="monthly_summaries",
+        null=True,
+        blank=True,
+    )
+    direction = models.CharField(max_length=3, choices=Transaction.DIRECTION_CHOICES)
+    is_estimate = models.BooleanField(default=False)
+
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tx_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-year", "-month", "direction"]
+        constraints = [
+            # unique_together ธรรมดานับ NULL ไม่ซ้ำกัน แถว "ไม่ระบุหมวด" จึงซ้ำได้ตอนสร้างพร้อมกัน
+            # ใช้ COALESCE ให้ NULL เทียบกันได้ (ใช้ได้ทั้ง SQLite / PostgreSQL)
+            models.UniqueConstraint(
+                Coalesce("owner", 0),
+                "year",
+                "month",
+                Coalesce("category", 0),
+                "direction",
+                "is_estimate",
+                name="monthly_summary_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:02d}/{self.year} {self.direction} {self.category_id} - {self.total}"
+
+
 class CategoryBudget(models.Model):
     """
     งบประมาณรายจ่ายต่อหมวด ต่อเดือน/ปี (แยกตาม owner)
@@ -478,3 +571,66 @@ class DashboardPreference(models.Model):
 
     def __str__(self):
         return f"Dashboard preference for {self.user}"
+
+
+class DashboardVersion(models.Model):
+    """
+    version ของข้อมูลที่ใช้ทำ key ของ cache การ์ด Dashboard
+    scope = "user:<id>" ต่อ user หรือ "global" สำหรับข้อมูลที่ทุก user ใช้ร่วมกัน (หมวดหมู่)
+    เก็บในฐานข้อมูลให้ทุก worker / process เห็นค่าเดียวกัน (ตัว cache ของการ์ดไม่ต้องแชร์ข้าม process)
+    """
+
+    scope = models.CharField(max_length=40, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope} @ {self.version}"
+
+
+def report_upload_path(instance, filename):
+    return f"reports/{instance.owner_id}/{filename}"
+
+
+class ReportJob(models.Model):
+    """
+    งานสร้าง PDF รายงานรายเดือน (คิวเก็บในฐานข้อมูล)
+    1 แถว = 1 (owner, ปี, เดือน, data_version) ถ้าข้อมูลเดือนนั้นไม่เปลี่ยน ใช้ไฟล์เดิมได้เลย
+    สร้าง/รันผ่าน utils_reports หรือ `python manage.py build_reports`
+    """
+
+    STATUS_CHOICES = [
+        ("QUEUED", "รอคิว"),
+        ("RUNNING", "กำลังสร้าง"),
+        ("DONE", "เสร็จแล้ว"),
+        ("FAILED", "ไม่สำเร็จ"),
+    ]
+
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="finance_report_jobs",
+    )
+    year = models.IntegerField()
+    month = models.IntegerField(help_text="1-12")
+    data_version = models.CharField(
+        max_length=40,
+        help_text="hash ของข้อมูลที่ใช้ทำรายงาน ข้อมูลเปลี่ยน = version ใหม่",
+    )
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="QUEUED")
+    pdf = models.FileField(upload_to=report_upload_path, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("owner", "year", "month", "data_version")
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="reportjob_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"รายงาน {self.month:02d}/{self.year} ของ {self.owner} ({self.status})"
@@ -0,0 +1,192 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    Account,
+    Category,
+    CategoryBudget,
+    DebtPlanSetting,
+    Goal,
+    RecurringTransaction,
+    Tag,
+    Transaction,
+)
+from .utils_dashboard import bump_dashboard_version, bump_global_dashboard_version
+from .utils_goals import apply_goal_change, rebuild_goal_progress
+from .utils_ledger import apply_transaction_change
+from .utils_rollup import apply_summary_change, detach_category_summaries
+from .utils_search import index_transactions, reindex_queryset, remove_transactions, search_backend
+
+
+# field ของ Transaction ที่ต้องรู้ค่าเดิมก่อนบันทึก เพื่อคำนวณส่วนต่าง
+TRACKED_FIELDS = (
+    "owner_id",
+    "account_id",
+    "category_id",
+    "date",
+    "direction",
+    "amount",
+    "is_estimate",
+    "goal_id",
+)
+
+
+def _snapshot(instance):
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS}
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_state(sender, instance, **kwargs):
+    """เก็บค่าเดิมจากฐานข้อมูลไว้ก่อน save (ถ้าเป็นรายการที่มีอยู่แล้ว)"""
+    previous = None
+    if instance.pk:
+        previous = (
+            Transaction.objects
+            .filter(pk=instance.pk)
+            .values(*TRACKED_FIELDS)
+            .first()
+        )
+    instance._previous_state = previous
+
+
+@receiver(post_save, sender=Transaction)
+def update_aggregates_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_state", None)
+    current = _snapshot(instance)
+    apply_transaction_change(previous, current)
+    apply_summary_change(previous, current)
+    apply_goal_change(previous, current)
+    instance._previous_state = None
+
+
+@receiver(post_delete, sender=Transaction)
+def update_aggregates_on_delete(sender, instance, **kwargs):
+    previous = _snapshot(instance)
+    apply_transaction_change(previous, None)
+    apply_summary_change(previous, None)
+    apply_goal_change(previous, None)
+
+
+@receiver(pre_delete, sender=Category)
+def detach_summaries_on_category_delete(sender, instance, **kwargs):
+    detach_category_summaries(instance.pk)
+
+
+@receiver(post_save, sender=Goal)
+def refresh_goal_done_amount(sender, instance, created, **kwargs):
+    """
+    แก้ทิศทางของเป้า -> ยอดสะสมต้องนับใหม่ทั้งก้อน
+    (คิดใหม่ทุกครั้งที่บันทึกเป้า กัน save() เขียน done_amount เก่าทับยอดที่เพิ่งบวกไป)
+    """
+    if created:
+        return
+    for goal, _, expected in rebuild_goal_progress(Goal.objects.filter(pk=instance.pk)):
+        instance.done_amount = expected
+
+
+# =========================
+#   Dashboard cache: ข้อมูลที่การ์ดใช้เปลี่ยน -> เลื่อน version ของเจ้าของ
+# =========================
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=CategoryBudget)
+@receiver(post_delete, sender=CategoryBudget)
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+@receiver(post_save, sender=RecurringTransaction)
+@receiver(post_delete, sender=RecurringTransaction)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_owner_dashboard(sender, instance, **kwargs):
+    bump_dashboard_version({instance.owner_id})
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def invalidate_dashboard_on_tag_change(sender, instance, action, **kwargs):
+    # ?q= ค้นชื่อ tag ด้วย -> ยอดรวมของหน้ารายการที่ cache ไว้ต้องหมดอายุ (instance เป็นได้ทั้งรายการ / Tag)
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_dashboard_version({instance.owner_id})
+
+
+@receiver(post_save, sender=DebtPlanSetting)
+@receiver(post_delete, sender=DebtPlanSetting)
+def invalidate_debt_plan_dashboard(sender, instance, **kwargs):
+    bump_dashboard_version({instance.user_id})
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_shared_dashboard(sender, instance, **kwargs):
+    bump_global_dashboard_version()
+
+
+# =========================
+#   Search index: note / ชื่อบัญชี / ชื่อหมวด / ชื่อ tag เปลี่ยน -> ทำ index ของรายการที่เกี่ยวใหม่
+# =========================
+
+@receiver(post_save, sender=Transaction)
+def index_transaction_on_save(sender, instance, **kwargs):
+    index_transactions([instance.pk])
+
+
+@receiver(post_delete, sender=Transaction)
+def unindex_transaction_on_delete(sender, instance, **kwargs):
+    remove_transactions([instance.pk])
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def index_transaction_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            index_transactions([instance.pk])
+        return
+    # tag.transactions.add(...) / clear() -> instance คือ Tag
+    if action == "pre_clear":
+        instance._search_tx_ids = list(instance.transactions.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        index_transactions(pk_set)
+    elif action == "post_clear":
+        index_transactions(getattr(instance, "_search_tx_ids", []))
+
+
+@receiver(pre_save, sender=Account)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Tag)
+def remember_previous_name(sender, instance, **kwargs):
+    instance._previous_name = None
+    if instance.pk and search_backend():
+        instance._previous_name = (
+            sender.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def reindex_on_rename(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_name", None)
+    if created or previous is None or previous == instance.name:
+        return
+    lookup = {Account: "account", Category: "category", Tag: "tags"}[sender]
+    reindex_queryset(Transaction.objects.filter(**{lookup: instance}))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def remember_indexed_transactions(sender, instance, **kwargs):
+    """ลบหมวด / tag แล้วรายการยังอยู่ (SET_NULL / ลบแค่ลิงก์) -> ต้องเอาชื่อเก่าออกจาก index"""
+    instance._search_tx_ids = []
+    if search_backend():
+        lookup = "category" if sender is Category else "tags"
+        instance._search_tx_ids = list(
+            Transaction.objects.filter(**{lookup: instance}).values_list("pk", flat=True)
+        )
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def reindex_after_delete(sender, instance, **kwargs):
+    index_transactions(getattr(instance, "_search_tx_ids", []))
@@ -1,3 +1,1607 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import urls as finance_urls
+from . import utils_reports
+from .models import (
+    Account,
+    Category,
+    CategoryBudget,
+    DashboardPreference,
+    DebtPlanSetting,
+    Goal,
+    MonthlySummary,
+    RecurringTransaction,
+    ReportJob,
+    Tag,
+    Transaction,
+)
+from .utils_calendar import build_cash_calendar
+from .utils_dashboard import DASHBOARD_CARDS, dashboard_versions
+from .utils_debt import (
+    DEBT_STRATEGIES,
+    calculate_debt_plan,
+    debt_plan_key,
+    debt_snapshot,
+    summarize_debt_plan,
+    sweep_debt_plans,
+)
+from .utils_export import iter_backup_json, iter_backup_ndjson, iter_transactions_csv
+from .utils_ledger import rebuild_account_balances
+from .utils_rollup import add_months, build_monthly_rollup, category_spending, rebuild_monthly_summaries
+from .forms import StatementImportForm
+from .utils_forecast import build_forecast
+from .utils_goals import goal_progress, project_goal, rebuild_goal_progress
+from .utils_import import import_statement, statement_fingerprint
+from .utils_perf import QueryBudgetExceeded, perf_stats
+from .utils_recurring import materialize_recurring
+from .utils_reports import (
+    REPORT_JOB_STALE_AFTER,
+    ReportUnavailable,
+    build_report_context,
+    ensure_report_job,
+    run_pending_jobs,
+    run_report_job,
+)
+from .utils_restore import BackupRestorer, RestoreError, iter_backup_records
+from .utils_search import check_search_index, search_backend, search_transactions
+from .views import DASHBOARD_PREFERENCE_FIELDS, DEBT_SWEEP_MAX_MONTHS
+
+_seq = count(1)
+
+# จำนวน query สูงสุดของ view ที่ไม่ได้อยู่ใน settings.QUERY_BUDGETS (นับรวม session / auth)
+# view ที่อยู่ใน QUERY_BUDGETS ใช้ค่าจาก settings เลย ที่เดียวกับที่ middleware ใช้เตือนตอนรันจริง
+EXTRA_QUERY_BOUNDS = {
+    "dashboard_preferences": 4,
+    "transaction_edit": 6,
+    "transactions_export_csv": 3,
+    "transactions_import": 3,
+    "transaction_create": 6,
+    "accounts_manage": 3,
+    "account_edit": 3,
+    "recurring_list": 3,
+    "recurring_generate_for_month": 23,
+    "recurring_apply_month": 2,
+    "goal_detail": 5,
+    "monthly_report_pdf": 12,
+    "report_job_status": 3,
+    "report_job_download": 3,
+    "tools_home": 2,
+    "perf_stats_json": 2,
+    "export_full_json": 12,
+    "import_full_json": 2,
+    "howto": 2,
+}
+
+
+def query_bound(url_name):
+    budget = settings.QUERY_BUDGETS.get(f"app_finance:{url_name}")
+    return budget if budget is not None else EXTRA_QUERY_BOUNDS[url_name]
+
+
+def seed_finance_data(user, today, accounts=2, categories=3, goals=2, recurring=2, days=5, per_day=2):
+    """
+    ข้อมูลตายตัวสำหรับนับ query เรียกซ้ำเพื่อเพิ่มข้อมูลได้
+    (บัญชี / หมวด / เป้าหมาย / รายการประจำ / จำนวนวันที่มีรายการ)
+    """
+    n = next(_seq)
+    accs = [
+        Account.objects.create(
+            owner=user,
+            name=f"บัญชี {n}-{i}",
+            account_type=("BANK", "CASH", "CREDIT", "LOAN")[i % 4],
+            opening_balance=Decimal("-20000") if i % 4 >= 2 else Decimal("5000"),
+            interest_rate=Decimal("18"),
+            min_payment_percent=Decimal("5"),
+        )
+        for i in range(accounts)
+    ]
+    cats = [
+        Category.objects.create(
+            name=f"หมวด {n}-{i}",
+            kind="INCOME" if i % 3 == 0 else "EXPENSE",
+            monthly_budget=Decimal("3000"),
+        )
+        for i in range(categories)
+    ]
+    tag = Tag.objects.create(owner=user, name=f"tag {n}")
+    goal_objs = [
+        Goal.objects.create(
+            owner=user,
+            name=f"เป้าหมาย {n}-{i}",
+            account=accs[0],
+            target_amount=Decimal("10000"),
+            target_date=today + timedelta(days=200),
+            direction="IN" if i % 2 == 0 else "OUT",
+        )
+        for i in range(goals)
+    ]
+    for i in range(recurring):
+        RecurringTransaction.objects.create(
+            owner=user,
+            account=accs[i % len(accs)],
+            category=cats[i % len(cats)],
+            direction="OUT",
+            amount=Decimal("500"),
+            day_of_month=(5, 31, 15)[i % 3],
+            name=f"ประจำ {n}-{i}",
+        )
+    for c in cats:
+        if c.kind == "EXPENSE":
+            CategoryBudget.objects.create(
+                owner=user, category=c, year=today.year, month=today.month, amount=Decimal("2000"),
+            )
+
+    first_day = today.replace(day=1)
+    for d in range(days):
+        tx_date = first_day + timedelta(days=d % 28)
+        for k in range(per_day):
+            tx = Transaction.objects.create(
+                owner=user,
+                account=accs[(d + k) % len(accs)],
+                category=cats[(d + k) % len(cats)],
+                goal=goal_objs[k % len(goal_objs)] if goal_objs and k == 0 else None,
+                date=tx_date,
+                direction="IN" if k % 3 == 0 else "OUT",
+                amount=Decimal("120.50") + d,
+                is_estimate=(d + k) % 5 == 0,
+                note=f"รายการ {d}-{k}",
+            )
+            if k == 1:
+                tx.tags.add(tag)
+    return accs, cats, goal_objs
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, REPORT_WORKERS=0)
+class QueryCountTestCase(TestCase):
+    """ฐานของ test ที่นับ query: login ไว้แล้ว + ล้าง cache ก่อนนับทุกครั้ง (นับตอน cache ว่าง)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.user = User.objects.create_user("tester", password="pw", is_staff=True)
+        cls.accounts, cls.categories, cls.goals = seed_finance_data(cls.user, cls.today)
+        DebtPlanSetting.objects.create(user=cls.user, monthly_budget=Decimal("5000"), strategy="AVALANCHE")
+        cls.job = ReportJob.objects.create(
+            owner=cls.user, year=cls.today.year, month=cls.today.month,
+            data_version="test", status="DONE",
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        for cache in caches.all():
+            cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+            # streaming response ยิง query ตอนอ่าน content -> ต้องอ่านให้หมดภายในช่วงที่นับ
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return len(ctx), response
+
+    def assertQueriesAtMost(self, url, bound):
+        n, response = self.count_queries(url)
+        self.assertLessEqual(n, bound, f"{url} ใช้ {n} queries (ไม่เกิน {bound})")
+        return response
+
+    def set_dashboard_cards(self, enabled):
+        pref, _ = DashboardPreference.objects.get_or_create(user=self.user)
+        for field, _label in DASHBOARD_PREFERENCE_FIELDS:
+            setattr(pref, field, enabled)
+        pref.save()
+
+
+class ViewQueryBoundTests(QueryCountTestCase):
+    """ทุก view ใน app_finance/urls.py ต้องใช้ query ไม่เกินที่กำหนด"""
+
+    def view_cases(self):
+        tx = Transaction.objects.filter(owner=self.user).first()
+        return {
+            "home": [reverse("app_finance:home")],
+            "dashboard": [reverse("app_finance:dashboard")],
+            "dashboard_card_json": [
+                reverse("app_finance:dashboard_card_json", args=[name])
+                for name, card in DASHBOARD_CARDS.items() if card.lazy
+            ],
+            "dashboard_preferences": [reverse("app_finance:dashboard_preferences")],
+            "transactions_list": [
+                reverse("app_finance:transactions_list"),
+                reverse("app_finance:transactions_list") + "?q=หมวด",
+            ],
+            "transactions_page_json": [reverse("app_finance:transactions_page_json")],
+            "transactions_search_json": [
+                reverse("app_finance:transactions_search_json") + "?q=รายการ",
+                reverse("app_finance:transactions_search_json") + "?q=บัญชี tag",
+            ],
+            "transaction_edit": [reverse("app_finance:transaction_edit", args=[tx.pk])],
+            "transactions_export_csv": [reverse("app_finance:transactions_export_csv")],
+            "transactions_import": [reverse("app_finance:transactions_import")],
+            "transaction_create": [
+                reverse("app_finance:transaction_create"),
+                reverse("app_finance:transaction_create") + f"?goal={self.goals[0].pk}&type=IN",
+            ],
+            "accounts_manage": [reverse("app_finance:accounts_manage")],
+            "account_edit": [reverse("app_finance:account_edit", args=[self.accounts[0].pk])],
+            "categories_manage": [reverse("app_finance:categories_manage")],
+            "recurring_list": [reverse("app_finance:recurring_list")],
+            "recurring_generate_for_month": [reverse("app_finance:recurring_generate_for_month")],
+            "summary_month": [reverse("app_finance:summary_month")],
+            "goals_list": [reverse("app_finance:goals_list")],
+            "goal_detail": [reverse("app_finance:goal_detail", args=[self.goals[0].pk])],
+            "monthly_report_pdf": [reverse("app_finance:monthly_report_pdf")],
+            "report_job_status": [reverse("app_finance:report_job_status", args=[self.job.pk])],
+            "report_job_download": [reverse("app_finance:report_job_download", args=[self.job.pk])],
+            "cash_calendar": [
+                reverse("app_finance:cash_calendar"),
+                reverse("app_finance:cash_calendar") + "?view=year",
+            ],
+            "cash_forecast": [
+                reverse("app_finance:cash_forecast") + f"?months={m}" for m in (3, 12, 36)
+            ],
+            "cash_forecast_json": [reverse("app_finance:cash_forecast_json") + "?months=36"],
+            "budgets_overview": [reverse("app_finance:budgets_overview")],
+            "monthly_report": [reverse("app_finance:monthly_report")],
+            "debts_overview": [reverse("app_finance:debts_overview")],
+            "debts_sweep_json": [reverse("app_finance:debts_sweep_json")],
+            "tools_home": [reverse("app_finance:tools_home")],
+            "perf_stats_json": [reverse("app_finance:perf_stats_json")],
+            "export_full_json": [
+                reverse("app_finance:export_full_json"),
+                reverse("app_finance:export_full_json") + "?format=ndjson",
+            ],
+            "import_full_json": [reverse("app_finance:import_full_json")],
+            "recurring_apply_month": [reverse("app_finance:recurring_apply_month")],
+            "howto": [reverse("app_finance:howto")],
+        }
+
+    def test_every_url_has_a_case(self):
+        names = {p.name for p in finance_urls.urlpatterns}
+        self.assertEqual(names - set(self.view_cases()), set())
+
+    def test_views_stay_within_query_bounds(self):
+        for name, urls in self.view_cases().items():
+            for url in urls:
+                with self.subTest(view=name, url=url):
+                    response = self.assertQueriesAtMost(url, query_bound(name))
+                    self.assertIn(response.status_code, (200, 302, 404))
+
+    def test_dashboard_with_all_cards_on_and_off(self):
+        bound = query_bound("dashboard")
+        for enabled in (True, False):
+            with self.subTest(cards=enabled):
+                self.set_dashboard_cards(enabled)
+                self.assertQueriesAtMost(reverse("app_finance:dashboard"), bound)
+                for name, card in DASHBOARD_CARDS.items():
+                    if card.lazy:
+                        url = reverse("app_finance:dashboard_card_json", args=[name])
+                        self.assertQueriesAtMost(url, query_bound("dashboard_card_json"))
+
+    def test_dashboard_cards_off_never_costs_more(self):
+        url = reverse("app_finance:dashboard")
+        self.set_dashboard_cards(True)
+        all_on, _ = self.count_queries(url)
+        self.set_dashboard_cards(False)
+        all_off, _ = self.count_queries(url)
+        self.assertLessEqual(all_off, all_on)
+
+    def test_transactions_list_later_pages_reuse_summary(self):
+        url = reverse("app_finance:transactions_list")
+        first, response = self.count_queries(url + "?per_page=5")
+        cursor = response.context["next_cursor"]
+        self.assertTrue(cursor)
+        # ยอดรวม + ตัวเลือกปีอยู่ใน cache แล้ว หน้าถัดไปเหลือแค่อ่าน version + ดึงรายการ
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {"per_page": 5, "after": cursor})
+        self.assertEqual(len(ctx), first - 2)
+        self.assertFalse(any("SUM(" in q["sql"].upper() for q in ctx.captured_queries))
+        self.assertTrue(response.context["years"])
+
+
+class QueryCountScalingTests(QueryCountTestCase):
+    """จำนวน query ต้องไม่โตตามจำนวนบัญชี / หมวด / เป้าหมาย / วันที่มีรายการ (กัน N+1)"""
+
+    SCALING_VIEWS = [
+        "home",
+        "dashboard",
+        "categories_manage",
+        "goals_list",
+        "cash_calendar",
+        "cash_forecast",
+        "summary_month",
+        "budgets_overview",
+        "monthly_report",
+        "transactions_list",
+        "accounts_manage",
+        "debts_overview",
+    ]
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.set_dashboard_cards(True)
+        urls = {name: reverse(f"app_finance:{name}") for name in self.SCALING_VIEWS}
+        urls["goal_detail"] = reverse("app_finance:goal_detail", args=[self.goals[0].pk])
+        urls["dashboard_card_goals"] = reverse("app_finance:dashboard_card_json", args=["goals"])
+
+        before = {name: self.count_queries(url)[0] for name, url in urls.items()}
+
+        seed_finance_data(
+            self.user, self.today,
+            accounts=6, categories=10, goals=8, recurring=6, days=28, per_day=3,
+        )
+
+        for name, url in urls.items():
+            with self.subTest(view=name):
+                for cache in caches.all():
+                    cache.clear()
+                with self.assertNumQueries(before[name]):
+                    self.client.get(url)
+
+    def test_cash_calendar_span_does_not_add_queries(self):
+        url = reverse("app_finance:cash_calendar")
+        month, _ = self.count_queries(url + "?view=month")
+        for span in ("quarter", "year"):
+            with self.subTest(view=span):
+                n, _ = self.count_queries(url + f"?view={span}")
+                self.assertEqual(n, month)
+
+    def test_forecast_horizon_does_not_add_queries(self):
+        url = reverse("app_finance:cash_forecast_json")
+        short, _ = self.count_queries(url + "?months=3")
+        long, _ = self.count_queries(url + "?months=36")
+        self.assertEqual(long, short)
+
+
+class SearchIndexTests(TestCase):
+    """search index ต้องตามทันการแก้รายการ / ชื่อบัญชี / หมวด / tag และค้นได้เหมือน icontains เดิม"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("searcher", password="pw")
+        cls.other = User.objects.create_user("other", password="pw")
+        cls.account = Account.objects.create(owner=cls.user, name="กสิกร", account_type="BANK")
+        cls.category = Category.objects.create(name="อาหาร", kind="EXPENSE")
+        cls.tag = Tag.objects.create(owner=cls.user, name="เที่ยว")
+
+    def setUp(self):
+        if search_backend() is None:
+            self.skipTest("ฐานข้อมูลนี้ไม่มี search index")
+
+    def add(self, note, owner=None, **kwargs):
+        owner = owner or self.user
+        account = self.account if owner == self.user else Account.objects.create(
+            owner=owner, name="บัญชีอื่น", account_type="CASH",
+        )
+        return Transaction.objects.create(
+            owner=owner, account=account, date=timezone.now().date(),
+            direction="OUT", amount=Decimal("50"), note=note, **kwargs,
+        )
+
+    def ids(self, q, user=None):
+        return {t.pk for t in search_transactions(user or self.user, q, limit=50)}
+
+    def test_thai_substring_and_latin_prefix(self):
+        coffee = self.add("กาแฟเย็น Starbucks")
+        rice = self.add("ข้าวมันไก่")
+        self.assertEqual(self.ids("แฟเย"), {coffee.pk})
+        self.assertEqual(self.ids("star"), {coffee.pk})
+        self.assertEqual(self.ids("ข้าว"), {rice.pk})
+        self.assertEqual(self.ids("กาแฟ ข้าว"), set())
+        self.assertEqual(self.ids("กสิกร"), {coffee.pk, rice.pk})
+
+    def test_results_are_limited_to_owner(self):
+        mine = self.add("ค่าน้ำมัน")
+        self.add("ค่าน้ำมัน", owner=self.other)
+        self.assertEqual(self.ids("น้ำมัน"), {mine.pk})
+
+    def test_note_match_ranks_above_account_match(self):
+        by_account = self.add("อื่น ๆ")
+        Account.objects.filter(pk=self.account.pk).update(name="ออมทรัพย์")
+        by_account.save()
+        by_note = self.add("โอนเข้าออมทรัพย์")
+        ranked = [t.pk for t in search_transactions(self.user, "ออมทรัพย์")]
+        self.assertEqual(ranked, [by_note.pk, by_account.pk])
+
+    def test_index_follows_edits_renames_and_deletes(self):
+        tx = self.add("ตั๋วเครื่องบิน", category=self.category)
+        tx.tags.add(self.tag)
+        self.assertEqual(self.ids("เที่ยว"), {tx.pk})
+        self.assertEqual(self.ids("อาหาร"), {tx.pk})
+
+        tx.note = "ตั๋วรถไฟ"
+        tx.save()
+        self.assertEqual(self.ids("เครื่องบิน"), set())
+        self.assertEqual(self.ids("รถไฟ"), {tx.pk})
+
+        self.account.name = "ไทยพาณิชย์"
+        self.account.save()
+        self.assertEqual(self.ids("กสิกร"), set())
+        self.assertEqual(self.ids("พาณิชย์"), {tx.pk})
+
+        self.tag.name = "พักร้อน"
+        self.tag.save()
+        self.assertEqual(self.ids("พักร้อน"), {tx.pk})
+        self.tag.delete()
+        self.assertEqual(self.ids("พักร้อน"), set())
+
+        self.category.delete()
+        self.assertEqual(self.ids("อาหาร"), set())
+
+        tx.delete()
+        self.assertEqual(self.ids("รถไฟ"), set())
+        self.assertEqual(check_search_index(), (set(), set()))
+
+    def test_list_filter_uses_index(self):
+        tx = self.add("ค่าเช่าห้อง")
+        self.add("ค่าไฟ")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("app_finance:transactions_list") + "?q=เช่า")
+        self.assertEqual([t.pk for t in response.context["transactions"]], [tx.pk])
+
+
+class FinanceTestCase(TestCase):
+    """ฐานของ test พฤติกรรม: user 1 คน + บัญชีธนาคาร / บัตรเครดิต + หมวดรายรับ / รายจ่าย"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.user = User.objects.create_user("owner", password="pw")
+        cls.bank = Account.objects.create(
+            owner=cls.user, name="ธนาคาร", account_type="BANK", opening_balance=Decimal("1000"),
+        )
+        cls.card = Account.objects.create(
+            owner=cls.user, name="บัตร", account_type="CREDIT", opening_balance=Decimal("-5000"),
+            interest_rate=Decimal("18"), min_payment_percent=Decimal("5"),
+        )
+        cls.salary = Category.objects.create(name="เงินเดือน", kind="INCOME")
+        cls.food = Category.objects.create(name="อาหาร", kind="EXPENSE", monthly_budget=Decimal("3000"))
+
+    def tx(self, amount, direction="OUT", account=None, day=None, **kwargs):
+        return Transaction.objects.create(
+            owner=self.user,
+            account=account or self.bank,
+            date=day or self.today,
+            direction=direction,
+            amount=Decimal(amount),
+            **kwargs,
+        )
+
+    def balance(self, account):
+        return Account.objects.get(pk=account.pk).ledger_balance
+
+
+class LedgerBalanceTests(FinanceTestCase):
+    """Account.ledger_balance ต้องตามทุกการสร้าง / แก้ / ลบ Transaction"""
+
+    def test_create_edit_and_delete_apply_deltas(self):
+        t = self.tx("300")
+        self.tx("1000", direction="IN")
+        self.assertEqual(self.balance(self.bank), Decimal("700"))
+
+        t.amount = Decimal("250")
+        t.save()
+        self.assertEqual(self.balance(self.bank), Decimal("750"))
+
+        t.direction = "IN"
+        t.save()
+        self.assertEqual(self.balance(self.bank), Decimal("1250"))
+
+        t.account = self.card
+        t.save()
+        self.assertEqual(self.balance(self.bank), Decimal("1000"))
+        self.assertEqual(self.balance(self.card), Decimal("250"))
+
+        t.delete()
+        self.assertEqual(self.balance(self.card), Decimal("0"))
+        self.assertEqual(rebuild_account_balances(Account.objects.filter(owner=self.user)), [])
+
+    def test_saving_a_stale_account_keeps_concurrent_deltas(self):
+        stale = Account.objects.get(pk=self.bank.pk)
+        self.tx("400")
+        stale.name = "ธนาคารใหม่"
+        stale.save()
+        self.assertEqual(self.balance(self.bank), Decimal("-400"))
+        self.assertEqual(Account.objects.get(pk=self.bank.pk).name, "ธนาคารใหม่")
+
+    def test_account_edit_form_does_not_overwrite_balance(self):
+        self.client.force_login(self.user)
+        url = reverse("app_finance:account_edit", args=[self.bank.pk])
+        form = self.client.get(url).context["form"]
+        self.tx("150")
+        data = {k: v for k, v in form.initial.items() if v is not None}
+        data["name"] = "บัญชีเงินเดือน"
+        self.client.post(url, data)
+        account = Account.objects.get(pk=self.bank.pk)
+        self.assertEqual(account.name, "บัญชีเงินเดือน")
+        self.assertEqual(account.ledger_balance, Decimal("-150"))
+
+
+class MonthlyRollupTests(FinanceTestCase):
+    """build_monthly_rollup ต้องได้ยอดเดียวกับการรวมจาก Transaction ตรง ๆ ด้วย query เดียว"""
+
+    def test_totals_counts_and_category_ranking(self):
+        this_month = self.today.replace(day=1)
+        last_month = add_months(this_month.year, this_month.month, -1)
+        prev = this_month.replace(year=last_month[0], month=last_month[1])
+
+        self.tx("100", category=self.food, day=this_month)
+        self.tx("50", category=self.food, day=this_month)
+        self.tx("70", day=this_month)
+        self.tx("999", category=self.food, day=this_month, is_estimate=True)
+        self.tx("5000", direction="IN", category=self.salary, day=this_month)
+        self.tx("30", category=self.food, day=prev)
+
+        y, m = this_month.year, this_month.month
+        with self.assertNumQueries(1):
+            rollup = build_monthly_rollup(self.user, last_month, (y, m))
+
+        self.assertEqual(rollup.total(y, m, "OUT"), Decimal("220"))
+        self.assertEqual(rollup.count(y, m, "OUT"), 3)
+        self.assertEqual(rollup.total(y, m, "OUT", is_estimate=True), Decimal("999"))
+        self.assertEqual(rollup.total(y, m, "IN"), Decimal("5000"))
+        self.assertEqual(rollup.total(*last_month, "OUT"), Decimal("30"))
+        self.assertEqual(rollup.by_category(y, m), {self.food.pk: Decimal("150"), None: Decimal("70")})
+        self.assertEqual(
+            rollup.category_ranking(y, m),
+            [(self.food.pk, "อาหาร", Decimal("150")), (None, None, Decimal("70"))],
+        )
+
+    def test_months_outside_the_range_are_ignored(self):
+        old = self.today.replace(day=1) - timedelta(days=400)
+        self.tx("10", day=old)
+        current = (self.today.year, self.today.month)
+        rollup = build_monthly_rollup(self.user, current, current)
+        self.assertEqual(rollup.total(old.year, old.month, "OUT"), Decimal("0"))
+
+
+class MonthlySummaryTests(FinanceTestCase):
+    """MonthlySummary ที่อัปเดตทีละรายการต้องตรงกับการ rebuild จาก Transaction ทุกขั้น"""
+
+    def assertSummariesConsistent(self):
+        self.assertEqual(rebuild_monthly_summaries(User.objects.filter(pk=self.user.pk), fix=False), [])
+
+    def summary(self, **lookup):
+        return MonthlySummary.objects.filter(owner=self.user, **lookup).values_list("total", "tx_count").first()
+
+    def test_edits_move_amounts_between_rows(self):
+        first = self.today.replace(day=1)
+        t = self.tx("100", category=self.food, day=first)
+        self.tx("40", category=self.food, day=first)
+        self.assertEqual(self.summary(category=self.food, direction="OUT"), (Decimal("140"), 2))
+        self.assertSummariesConsistent()
+
+        t.category = None
+        t.save()
+        self.assertEqual(self.summary(category=self.food, direction="OUT"), (Decimal("40"), 1))
+        self.assertEqual(self.summary(category=None, direction="OUT"), (Decimal("100"), 1))
+        self.assertSummariesConsistent()
+
+        t.date = first - timedelta(days=1)
+        t.is_estimate = True
+        t.save()
+        self.assertFalse(MonthlySummary.objects.filter(owner=self.user, category=None, is_estimate=False).exists())
+        self.assertSummariesConsistent()
+
+        t.delete()
+        self.assertEqual(MonthlySummary.objects.filter(owner=self.user).count(), 1)
+        self.assertSummariesConsistent()
+
+    def test_deleting_a_category_moves_totals_to_uncategorized(self):
+        self.tx("60", category=self.food)
+        self.tx("15")
+        self.food.delete()
+        self.assertEqual(self.summary(category=None, direction="OUT"), (Decimal("75"), 2))
+        self.assertSummariesConsistent()
+
+    def test_rebuild_repairs_drift(self):
+        self.tx("80", category=self.food)
+        MonthlySummary.objects.filter(owner=self.user).update(total=Decimal("1"))
+        owners = User.objects.filter(pk=self.user.pk)
+        self.assertEqual(len(rebuild_monthly_summaries(owners)), 1)
+        self.assertSummariesConsistent()
+
+    def test_uncategorized_rows_cannot_be_duplicated(self):
+        self.tx("30")
+        row = MonthlySummary.objects.get(owner=self.user, category=None)
+        # request อื่นที่สร้างแถวเดียวกันพร้อมกันต้องชน constraint แล้วไปใช้ update แทน
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MonthlySummary.objects.create(
+                owner=self.user, year=row.year, month=row.month, category=None,
+                direction="OUT", total=Decimal("5"), tx_count=1,
+            )
+        self.tx("12")
+        self.assertEqual(self.summary(category=None, direction="OUT"), (Decimal("42"), 2))
+
+
+class TransactionFilterTests(FinanceTestCase):
+    """filter ปี / เดือนของหน้ารายการ + export CSV"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_year_month_range_filter(self):
+        inside = self.tx("10", day=self.today.replace(day=1))
+        self.tx("20", day=self.today.replace(day=1) - timedelta(days=1))
+        url = reverse("app_finance:transactions_list")
+        response = self.client.get(url, {"year": self.today.year, "month": self.today.month})
+        self.assertEqual([t.pk for t in response.context["transactions"]], [inside.pk])
+
+    def test_out_of_range_years_are_ignored(self):
+        self.tx("10")
+        for params in ({"year": "0"}, {"year": "99999"}, {"year": "0", "month": "1"}, {"year": "9999", "month": "12"}):
+            for name in ("transactions_list", "transactions_export_csv"):
+                with self.subTest(view=name, **params):
+                    response = self.client.get(reverse(f"app_finance:{name}"), params)
+                    self.assertEqual(response.status_code, 200)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+
+    @override_settings(REPORT_WORKERS=0)
+    def test_monthly_pages_fall_back_to_this_month(self):
+        self.tx("10")
+        views = ["summary_month", "monthly_report", "budgets_overview", "cash_calendar", "monthly_report_pdf"]
+        params = [{"month": "0"}, {"month": "13"}, {"year": "0", "month": "x"}, {"year": "99999"},
+                  {"year": "9998", "month": "12", "view": "year"}]
+        with mock.patch("app_finance.views.pdf_available", return_value=True):
+            for name in views:
+                for query in params:
+                    with self.subTest(page=name, **query):
+                        response = self.client.get(reverse(f"app_finance:{name}"), query)
+                        self.assertEqual(response.status_code, 200)
+        jobs = set(ReportJob.objects.values_list("year", "month"))
+        self.assertEqual(jobs, {(self.today.year, self.today.month), (9998, 12)})
+
+    def test_totals_follow_new_transactions(self):
+        url = reverse("app_finance:transactions_list")
+        self.tx("100", direction="IN")
+        self.assertEqual(self.client.get(url).context["income_sum"], Decimal("100"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tx("50", direction="IN", day=self.today.replace(year=self.today.year - 1, day=1))
+        response = self.client.get(url)
+        self.assertEqual(response.context["income_sum"], Decimal("150"))
+        self.assertEqual(response.context["years"], [str(self.today.year), str(self.today.year - 1)])
+
+    def test_totals_follow_tag_changes(self):
+        url = reverse("app_finance:transactions_list")
+        tagged = self.tx("40", note="ค่าแท็กซี่")
+        tag = Tag.objects.create(owner=self.user, name="เดินทาง")
+        self.assertEqual(self.client.get(url, {"q": "เดินทาง"}).context["expense_sum"], Decimal("0"))
+        tagged.tags.add(tag)
+        self.assertEqual(self.client.get(url, {"q": "เดินทาง"}).context["expense_sum"], Decimal("40"))
+        tag.name = "ทริป"
+        tag.save()
+        self.assertEqual(self.client.get(url, {"q": "เดินทาง"}).context["expense_sum"], Decimal("0"))
+        self.assertEqual(self.client.get(url, {"q": "ทริป"}).context["expense_sum"], Decimal("40"))
+        tag.delete()
+        self.assertEqual(self.client.get(url, {"q": "ทริป"}).context["expense_sum"], Decimal("0"))
+
+
+class DashboardCacheTests(FinanceTestCase):
+    """cache ของการ์ด Dashboard ต้องหมดอายุทันทีที่ข้อมูลเปลี่ยน แม้การแก้จะมาจาก worker อื่น"""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client.force_login(self.user)
+
+    def card_income(self):
+        url = reverse("app_finance:dashboard_card_json", args=["trend_chart"])
+        return self.client.get(url).json()["data"]["chart_income"][-1]
+
+    def test_versions_live_in_the_database(self):
+        self.tx("10")
+        before = dashboard_versions(self.user.pk)
+        for cache in caches.all():
+            cache.clear()
+        self.assertEqual(dashboard_versions(self.user.pk), before)
+        self.tx("10")
+        self.assertNotEqual(dashboard_versions(self.user.pk)[0], before[0])
+
+    def test_write_from_another_worker_invalidates_cached_card(self):
+        self.tx("100", direction="IN")
+        self.assertEqual(self.card_income(), 100.0)
+        # worker อื่นมี LocMemCache ของตัวเอง -> การแก้ข้อมูลของมันต้องไม่พึ่ง cache ของเรา
+        other_worker = {"default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "other-worker",
+        }}
+        with override_settings(CACHES=other_worker):
+            self.tx("50", direction="IN")
+        self.assertEqual(self.card_income(), 150.0)
+
+
+class CsvExportTests(FinanceTestCase):
+    """export CSV แบบ stream: ข้อมูลครบทุกแถวไม่ว่าจะแบ่ง chunk อย่างไร + คอลัมน์เสริม"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def read_csv(self, params=None):
+        response = self.client.get(reverse("app_finance:transactions_export_csv"), params or {})
+        self.assertEqual(response.status_code, 200)
+        text = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(text.startswith("\ufeff"))
+        return list(csv.reader(io.StringIO(text[1:])))
+
+    def test_rows_and_optional_columns(self):
+        goal = Goal.objects.create(owner=self.user, name="เที่ยว", target_amount=Decimal("1000"))
+        recurring = RecurringTransaction.objects.create(
+            owner=self.user, account=self.bank, direction="OUT", amount=Decimal("99"),
+            day_of_month=1, name="ค่าเน็ต",
+        )
+        tag = Tag.objects.create(owner=self.user, name="งาน")
+        first = self.tx("120.5", category=self.food, note="ข้าว\nเย็น", goal=goal)
+        first.tags.add(tag)
+        self.tx("99", source_recurring=recurring, is_estimate=True)
+        self.tx("1000", direction="IN", category=self.salary)
+
+        rows = self.read_csv({"tags": 1, "goal": 1, "recurring": 1})
+        self.assertEqual(rows[0][-3:], ["Tag", "เป้าหมาย", "รายการประจำ"])
+        # เรียงใหม่สุดก่อน (-date, -id)
+        day = self.today.strftime("%Y-%m-%d")
+        self.assertEqual(rows[1:], [
+            [day, "ธนาคาร", "รายรับ", "1000.00", "เงินเดือน", "จริง", "", "", "", ""],
+            [day, "ธนาคาร", "รายจ่าย", "99.00", "", "ประมาณการ", "", "", "", "ค่าเน็ต"],
+            [day, "ธนาคาร", "รายจ่าย", "120.50", "อาหาร", "จริง", "ข้าว เย็น", "งาน", "เที่ยว", ""],
+        ])
+        self.assertEqual(len(self.read_csv()[0]), 7)
+
+    def test_chunk_size_does_not_change_output(self):
+        for i in range(7):
+            self.tx(str(10 + i), note=f"รายการ {i}").tags.add(
+                Tag.objects.create(owner=self.user, name=f"tag{i}")
+            )
+        qs = Transaction.objects.filter(owner=self.user).order_by("-date", "-id")
+        whole = "".join(iter_transactions_csv(qs, include_tags=True, chunk_size=500))
+        self.assertEqual("".join(iter_transactions_csv(qs, include_tags=True, chunk_size=2)), whole)
+        self.assertEqual(whole.count("\n"), 8)
+
+
+class BackupExportTests(FinanceTestCase):
+    """ไฟล์สำรองข้อมูลทุกแบบ (JSON จัดย่อหน้า / compact / NDJSON / gzip) ต้องมีข้อมูลชุดเดียวกัน"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.tx("120.5", category=self.food, note="ข้าว").tags.add(
+            Tag.objects.create(owner=self.user, name="งาน")
+        )
+        self.tx("1000", direction="IN", category=self.salary)
+
+    def download(self, **params):
+        response = self.client.get(reverse("app_finance:export_full_json"), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_all_formats_carry_the_same_tables(self):
+        def without_time(data):
+            data.pop("generated_at")
+            return data
+
+        pretty = without_time(json.loads(self.download()))
+        self.assertEqual(pretty["user"], "owner")
+        self.assertEqual(len(pretty["transactions"]), 2)
+        self.assertEqual(len(pretty["transaction_tags"]), 1)
+        self.assertEqual(pretty["goals"], [])
+
+        self.assertEqual(without_time(json.loads(self.download(compact="1"))), pretty)
+        self.assertEqual(without_time(json.loads(gzip.decompress(self.download(gzip="1")))), pretty)
+
+        lines = [json.loads(line) for line in self.download(format="ndjson").decode().splitlines()]
+        self.assertEqual(lines[0]["table"], "_meta")
+        self.assertEqual(lines[0]["row"]["user"], "owner")
+        tables = {}
+        for line in lines[1:]:
+            tables.setdefault(line["table"], []).append(line["row"])
+        for key, rows in pretty.items():
+            if key != "user":
+                with self.subTest(table=key):
+                    self.assertEqual(tables.get(key, []), rows)
+
+    def test_chunk_size_does_not_change_output(self):
+        generated_at = timezone.now()
+        whole = "".join(iter_backup_json(self.user, generated_at))
+        self.assertEqual("".join(iter_backup_json(self.user, generated_at, chunk_size=1)), whole)
+        self.assertEqual(
+            "".join(iter_backup_ndjson(self.user, generated_at, chunk_size=1)),
+            "".join(iter_backup_ndjson(self.user, generated_at)),
+        )
+        # โครงสร้างเดียวกับไฟล์แบบเดิม (json.dumps indent=2 ทั้งก้อน)
+        self.assertEqual(
+            whole,
+            json.dumps(json.loads(whole), cls=DjangoJSONEncoder, ensure_ascii=False, indent=2),
+        )
+
+
+class RestoreTests(FinanceTestCase):
+    """restore จากไฟล์สำรอง: map id เดิม -> id ใหม่ให้ user ปลายทาง ยอดที่คำนวณเก็บไว้ตรง และรันซ้ำได้"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user("other", password="pw")
+        # ของเดิมของ user ปลายทาง ทำให้ id ใหม่ไม่ตรงกับ id ในไฟล์
+        Account.objects.create(owner=cls.other, name="กระเป๋า", account_type="CASH")
+        Tag.objects.create(owner=cls.other, name="ส่วนตัว")
+
+    def setUp(self):
+        goal = Goal.objects.create(owner=self.user, name="เที่ยว", account=self.bank, target_amount=Decimal("5000"))
+        recurring = RecurringTransaction.objects.create(
+            owner=self.user, account=self.card, category=self.food, direction="OUT",
+            amount=Decimal("99"), day_of_month=5, name="ค่าเน็ต",
+        )
+        CategoryBudget.objects.create(
+            owner=self.user, category=self.food, year=self.today.year, month=self.today.month, amount=Decimal("3000"),
+        )
+        self.tx("2000", direction="IN", category=self.salary, goal=goal).tags.add(
+            Tag.objects.create(owner=self.user, name="งาน")
+        )
+        self.tx("99", account=self.card, category=self.food, source_recurring=recurring)
+        # รายการหน้าตาเหมือนกัน 2 รายการต้องได้ 2 รายการ
+        self.tx("45", category=self.food, note="กาแฟ")
+        self.tx("45", category=self.food, note="กาแฟ")
+
+    def restore(self, data, batch_size=2):
+        return BackupRestorer(self.other, batch_size=batch_size).run(iter_backup_records(io.BytesIO(data)))
+
+    def assertSameLedger(self):
+        def snapshot(user):
+            return {
+                "balances": dict(Account.objects.filter(owner=user).values_list("name", "ledger_balance")),
+                "goals": dict(Goal.objects.filter(owner=user).values_list("name", "done_amount")),
+                "transactions": sorted(
+                    Transaction.objects.filter(owner=user).values_list(
+                        "account__name", "amount", "category__name", "goal__name",
+                        "source_recurring__name", "note",
+                    )
+                ),
+                "tags": sorted(
+                    Transaction.tags.through.objects
+                    .filter(transaction__owner=user).values_list("transaction__amount", "tag__name")
+                ),
+            }
+
+        mine, theirs = snapshot(self.user), snapshot(self.other)
+        self.assertEqual(theirs["balances"].pop("กระเป๋า"), Decimal("0"))
+        self.assertEqual(theirs, mine)
+        self.assertEqual(rebuild_monthly_summaries(User.objects.filter(pk=self.other.pk), fix=False), [])
+        if search_backend():
+            self.assertEqual(check_search_index({self.other.pk}), (set(), set()))
+
+    def test_round_trip_remaps_ids(self):
+        data = "".join(iter_backup_ndjson(self.user, timezone.now())).encode()
+        stats = self.restore(data)
+        self.assertEqual(stats["transactions"], {"created": 4, "existing": 0})
+        self.assertEqual(stats["accounts"], {"created": 2, "existing": 0})
+        self.assertEqual(stats["categories"], {"created": 0, "existing": 2})
+        self.assertSameLedger()
+        # FK ทุกตัวชี้ไปที่ของ user ปลายทาง
+        self.assertFalse(
+            Transaction.objects.filter(owner=self.other).exclude(account__owner=self.other).exists()
+        )
+        self.assertFalse(
+            Transaction.tags.through.objects.filter(transaction__owner=self.other)
+            .exclude(tag__owner=self.other).exists()
+        )
+        self.assertEqual(CategoryBudget.objects.filter(owner=self.other, category=self.food).count(), 1)
+
+    def test_restoring_again_creates_nothing(self):
+        data = gzip.compress("".join(iter_backup_json(self.user, timezone.now())).encode())
+        self.restore(data, batch_size=500)
+        stats = self.restore(data)
+        for table, counts in stats.items():
+            if table != "_seconds":
+                with self.subTest(table=table):
+                    self.assertEqual(counts["created"], 0)
+        self.assertEqual(stats["transactions"]["existing"], 4)
+        self.assertSameLedger()
+
+    def test_invalid_file_is_rejected(self):
+        with self.assertRaises(RestoreError):
+            self.restore(b'{"table": "transactions", "row"\n')
+        self.assertFalse(Transaction.objects.filter(owner=self.other).exists())
+
+
+class StatementImportTests(FinanceTestCase):
+    """นำเข้า statement CSV: จับรายการซ้ำ, จำกัดบัญชีเฉพาะของ user, ยอด / ตารางสรุป / index ตามทัน"""
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def run_import(self, text, **kwargs):
+        kwargs.setdefault("default_account", self.bank)
+        return import_statement(io.BytesIO(text.encode("utf-8")), self.user, **kwargs)
+
+    def test_fingerprint_ignores_whitespace_and_keeps_sign(self):
+        day = self.today
+        self.assertEqual(
+            statement_fingerprint(1, day, "OUT", Decimal("10"), "  ร้าน   กาแฟ "),
+            statement_fingerprint(1, day, "OUT", Decimal("10.00"), "ร้าน กาแฟ"),
+        )
+        self.assertNotEqual(
+            statement_fingerprint(1, day, "OUT", Decimal("10"), "x"),
+            statement_fingerprint(1, day, "IN", Decimal("10"), "x"),
+        )
+
+    def test_duplicates_are_matched_as_a_multiset(self):
+        self.tx("45", note="กาแฟ", day=date(2025, 3, 2))
+        statement = (
+            "วันที่,รายละเอียด,ถอน,ฝาก\n"
+            "02/03/2568,กาแฟ,45.00,\n"
+            "02/03/2568, กาแฟ ,45.00,\n"
+            "03/03/2025,เงินเดือน,,\"20,000.00\"\n"
+        )
+        report = self.run_import(statement, dry_run=True)
+        self.assertEqual((report["created"], report["duplicates"]), (2, 1))
+        self.assertEqual(Transaction.objects.filter(owner=self.user).count(), 1)
+
+        report = self.run_import(statement)
+        self.assertEqual((report["created"], report["duplicates"], report["errors"]), (2, 1, 0))
+        again = self.run_import(statement)
+        self.assertEqual((again["created"], again["duplicates"]), (0, 3))
+        self.assertEqual(Transaction.objects.filter(owner=self.user).count(), 3)
+
+    def test_import_keeps_balances_summaries_and_index(self):
+        report = self.run_import(
+            "date,account,category,amount,note,tags\n"
+            f"{self.today:%Y-%m-%d},บัตร,อาหาร,-250,ข้าวมันไก่,\"ข้าว, เที่ยง\"\n"
+            f"{self.today:%Y-%m-%d},,เงินเดือน,1000,โบนัส,\n"
+        )
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(self.balance(self.card), Decimal("-250"))
+        self.assertEqual(self.balance(self.bank), Decimal("1000"))
+        self.assertEqual(rebuild_account_balances(Account.objects.filter(owner=self.user), fix=False), [])
+        self.assertEqual(rebuild_monthly_summaries(User.objects.filter(pk=self.user.pk), fix=False), [])
+        imported = Transaction.objects.get(owner=self.user, note="ข้าวมันไก่")
+        self.assertEqual(imported.category, self.food)
+        self.assertEqual(sorted(imported.tags.values_list("name", flat=True)), ["ข้าว", "เที่ยง"])
+        if search_backend():
+            self.assertEqual(check_search_index({self.user.pk}), (set(), set()))
+            self.assertEqual([t.pk for t in search_transactions(self.user, "มันไก่")], [imported.pk])
+
+    def test_accounts_of_other_users_cannot_be_used(self):
+        other = User.objects.create_user("other", password="pw")
+        foreign = Account.objects.create(owner=other, name="ของคนอื่น", account_type="BANK")
+
+        form = StatementImportForm(
+            {"account": foreign.pk},
+            {"file": SimpleUploadedFile("s.csv", b"date,amount\n")},
+            user=self.user,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("account", form.errors)
+
+        report = self.run_import(f"date,account,amount\n{self.today:%Y-%m-%d},ของคนอื่น,-10\n")
+        self.assertEqual((report["created"], report["errors"]), (0, 1))
+        self.assertFalse(Transaction.objects.filter(account=foreign).exists())
+
+
+class RecurringMaterializeTests(FinanceTestCase):
+    """สร้างรายการจากรายการประจำ: วันที่ถูก, รันซ้ำไม่สร้างซ้ำ, ยอด / ตารางสรุปตรงเฉพาะเดือนที่สร้าง"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.rent = RecurringTransaction.objects.create(
+            owner=cls.user, account=cls.bank, category=cls.food, direction="OUT",
+            amount=Decimal("500"), day_of_month=31, name="ค่าเช่า",
+        )
+        cls.pay = RecurringTransaction.objects.create(
+            owner=cls.user, account=cls.bank, category=cls.salary, direction="IN",
+            amount=Decimal("2000"), day_of_month=25, name="เงินเดือน",
+            start_date=date(2024, 3, 1),
+        )
+
+    def test_dates_and_idempotency(self):
+        result = materialize_recurring((2024, 1), (2024, 4), owners=[self.user])
+        self.assertEqual((result["created"], result["skipped"]), (6, 0))
+        self.assertEqual(
+            sorted(Transaction.objects.filter(source_recurring=self.rent).values_list("date", flat=True)),
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)],
+        )
+        summaries = MonthlySummary.objects.filter(owner=self.user).count()
+
+        again = materialize_recurring((2024, 1), (2024, 5), owners=[self.user])
+        self.assertEqual((again["created"], again["skipped"]), (2, 6))
+        self.assertEqual(Transaction.objects.filter(owner=self.user).count(), 8)
+        self.assertEqual(MonthlySummary.objects.filter(owner=self.user).count(), summaries + 2)
+        self.assertEqual(self.balance(self.bank), Decimal("6000") - Decimal("2500"))
+        self.assertEqual(rebuild_monthly_summaries(User.objects.filter(pk=self.user.pk), fix=False), [])
+
+    def test_summary_rebuild_is_limited_to_the_generated_months(self):
+        self.tx("70", category=self.food, day=date(2023, 6, 1))
+        # ยอดเพี้ยนในเดือนที่ไม่ได้สร้างรายการต้องไม่ถูกแตะ (ไม่ได้อ่านประวัติทั้งหมดใหม่)
+        MonthlySummary.objects.filter(owner=self.user, year=2023).update(total=Decimal("1"))
+        materialize_recurring((2024, 1), (2024, 1), owners=[self.user])
+        self.assertEqual(MonthlySummary.objects.get(owner=self.user, year=2023).total, Decimal("1"))
+        self.assertEqual(
+            MonthlySummary.objects.get(owner=self.user, year=2024, month=1).total, Decimal("500"),
+        )
+
+    def test_view_creates_this_month_once(self):
+        self.client.force_login(self.user)
+        url = reverse("app_finance:recurring_generate_for_month")
+        self.client.post(url)
+        self.client.post(url)
+        this_month = Transaction.objects.filter(
+            owner=self.user, source_recurring=self.rent, date__year=self.today.year, date__month=self.today.month,
+        )
+        self.assertEqual(this_month.count(), 1)
+        self.assertFalse(this_month.get().is_estimate)
+
+
+class CashCalendarTests(FinanceTestCase):
+    """ยอดคงเหลือในปฏิทินเงิน: ยอดยกมา + รายการจริง เฉพาะบัญชีที่ยังใช้งาน"""
+
+    def test_inactive_accounts_are_left_out(self):
+        closed = Account.objects.create(
+            owner=self.user, name="ปิดแล้ว", account_type="BANK",
+            opening_balance=Decimal("700"), is_active=False,
+        )
+        first = self.today.replace(day=1)
+        self.tx("200", direction="IN", day=first - timedelta(days=1))
+        self.tx("300", direction="IN", account=closed, day=first - timedelta(days=1))
+        self.tx("50", day=first)
+        self.tx("80", account=closed, day=first)
+
+        this_month = (self.today.year, self.today.month)
+        month = build_cash_calendar(self.user, this_month, this_month, self.today)[0]
+        # ธนาคาร 1000 + บัตร -5000 + รายการก่อนเดือนนี้ 200 แล้วจ่าย 50 วันแรก
+        self.assertEqual(month["days"][0]["balance"], Decimal("-3850"))
+        self.assertEqual(month["total_out"], Decimal("50"))
+
+    def test_future_month_starts_from_projected_balance(self):
+        today = date(2025, 1, 15)
+        rent = RecurringTransaction.objects.create(
+            owner=self.user, account=self.bank, direction="OUT", amount=Decimal("500"), day_of_month=20,
+        )
+        self.tx("200", direction="IN", day=date(2025, 1, 10))
+        self.tx("100", day=date(2025, 1, 18))
+        self.tx("40", direction="IN", day=date(2025, 1, 25), is_estimate=True)
+        self.tx("500", day=date(2025, 2, 20), is_estimate=True, source_recurring=rent)
+
+        forecast = build_forecast(self.user, today, months=2)
+        projected = dict(zip(forecast["dates"], forecast["total"]["balances"]))
+        for first_month in ((2025, 2), (2025, 3)):
+            with self.subTest(first_month=first_month):
+                month = build_cash_calendar(self.user, first_month, first_month, today)[0]
+                first_day = month["days"][0]
+                # ค่าเช่า / ประมาณการระหว่างพรุ่งนี้ถึงต้นเดือนต้องอยู่ในยอดยกมา ตรงกับหน้าพยากรณ์
+                self.assertEqual(first_day["balance"], projected[first_day["date"]])
+                self.assertEqual(month["end_balance"], projected[month["days"][-1]["date"]])
+        self.assertEqual(projected[date(2025, 1, 31)], Decimal("1000") - 5000 + 200 - 100 + 40 - 500)
+
+
+def reference_debt_plan(debts, monthly_budget, strategy, max_months, quick_win=None):
+    """จำลองแผนปลดหนี้ทีละเดือนแบบตรงไปตรงมา (ไม่มีทางลัด) ใช้เทียบกับ calculate_debt_plan"""
+    items = [
+        {
+            "name": d["name"],
+            "rate": Decimal(d["interest_rate"]),
+            "min": Decimal(d["min_payment"]),
+            "balance": Decimal(d["balance"]),
+        }
+        for d in debts
+    ]
+    threshold = Decimal(monthly_budget if quick_win is None else quick_win)
+    order_keys = {
+        "SNOWBALL": lambda idx: items[idx]["balance"],
+        "AVALANCHE": lambda idx: -items[idx]["rate"],
+        "HYBRID": lambda idx: (
+            (0, items[idx]["balance"]) if items[idx]["balance"] <= threshold else (1, -items[idx]["rate"])
+        ),
+    }
+    plan = []
+    month = 0
+    while month < max_months and any(i["balance"] > 0 for i in items):
+        month += 1
+        for i in items:
+            if i["balance"] > 0:
+                i["balance"] = i["balance"] * (1 + (i["rate"] / 100) / 12)
+        payments = [
+            {"name": i["name"], "pay_min": min(i["min"], i["balance"]) if i["balance"] > 0 else Decimal("0"),
+             "extra": Decimal("0")}
+            for i in items
+        ]
+        total_min = sum(p["pay_min"] for p in payments)
+        if monthly_budget < total_min:
+            plan.append({
+                "month": month, "warning": "งบไม่พอจ่ายขั้นต่ำทุกใบ", "details": payments,
+                "total_payment": monthly_budget, "total_balance": sum(i["balance"] for i in items),
+            })
+            break
+        extra = monthly_budget - total_min
+        for idx in sorted(range(len(items)), key=order_keys[strategy]):
+            if extra <= 0:
+                break
+            remaining = items[idx]["balance"] - payments[idx]["pay_min"]
+            if items[idx]["balance"] <= 0 or remaining <= 0:
+                continue
+            payments[idx]["extra"] = min(extra, remaining)
+            extra -= payments[idx]["extra"]
+        for i, p in zip(items, payments):
+            i["balance"] = max(i["balance"] - (p["pay_min"] + p["extra"]), Decimal("0"))
+        plan.append({
+            "month": month, "details": payments,
+            "total_payment": monthly_budget, "total_balance": sum(i["balance"] for i in items),
+        })
+    return plan
+
+
+class DebtPlanTests(TestCase):
+    """calculate_debt_plan (ทางลัดช่วงจ่ายเท่าเดิม) ต้องได้ผลเท่าการจำลองทีละเดือนทุกหลัก"""
+
+    DEBT_SETS = {
+        "mixed": [
+            {"name": "บัตร A", "balance": "45000", "interest_rate": "18", "min_payment": "1500"},
+            {"name": "บัตร B", "balance": "12000", "interest_rate": "25", "min_payment": "600"},
+            {"name": "ผ่อนรถ", "balance": "250000", "interest_rate": "3.5", "min_payment": "6000"},
+            {"name": "ยืมเพื่อน", "balance": "5000", "interest_rate": "0", "min_payment": "500"},
+        ],
+        "ties_and_edges": [
+            {"name": "เท่ากัน 1", "balance": "8000", "interest_rate": "20", "min_payment": "400"},
+            {"name": "เท่ากัน 2", "balance": "8000", "interest_rate": "20", "min_payment": "400"},
+            {"name": "ขั้นต่ำเกินยอด", "balance": "150", "interest_rate": "12", "min_payment": "1000"},
+            {"name": "เงินเกิน", "balance": "-300", "interest_rate": "15", "min_payment": "100"},
+        ],
+        "interest_only": [
+            {"name": "ดอกพอดี", "balance": "120000", "interest_rate": "12", "min_payment": "1200"},
+            {"name": "ดอกสูง", "balance": "30000", "interest_rate": "28", "min_payment": "900"},
+        ],
+    }
+
+    def test_matches_month_by_month_simulation(self):
+        for set_name, debts in self.DEBT_SETS.items():
+            for budget in ("1000", "3000", "9500", "40000"):
+                for strategy in DEBT_STRATEGIES:
+                    for quick_win in (None, Decimal("10000")):
+                        with self.subTest(debts=set_name, budget=budget, strategy=strategy, quick_win=quick_win):
+                            args = (debts, Decimal(budget), strategy, 360)
+                            self.assertEqual(
+                                calculate_debt_plan(*args, quick_win=quick_win),
+                                reference_debt_plan(*args, quick_win=quick_win),
+                            )
+
+
+class DebtSweepTests(FinanceTestCase):
+    """sweep งบ x strategy: ทุกช่องเท่ากับการคิดแผนทีละแผน และ endpoint ใช้แค่หนี้ของ user"""
+
+    DEBTS = DebtPlanTests.DEBT_SETS["mixed"]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_every_cell_matches_a_single_plan(self):
+        budgets = [Decimal("9000"), Decimal("15000"), Decimal("40000")]
+        result = sweep_debt_plans(self.DEBTS, budgets, max_months=240, parallel=False)
+        self.assertEqual(set(result["surface"]), set(DEBT_STRATEGIES))
+        for strategy, cells in result["surface"].items():
+            for budget, cell in zip(budgets, cells):
+                with self.subTest(strategy=strategy, budget=budget):
+                    plan = calculate_debt_plan(self.DEBTS, budget, strategy, 240)
+                    self.assertEqual(cell, summarize_debt_plan(self.DEBTS, plan))
+        # งบมากขึ้นต้องปลดหนี้ได้เร็วขึ้นหรือเท่าเดิม
+        months = [c["months"] for c in result["surface"]["AVALANCHE"]]
+        self.assertEqual(months, sorted(months, reverse=True))
+
+    def test_endpoint_uses_only_the_users_debts(self):
+        other = User.objects.create_user("other", password="pw")
+        Account.objects.create(
+            owner=other, name="หนี้คนอื่น", account_type="LOAN", opening_balance=Decimal("-90000"),
+            interest_rate=Decimal("10"),
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("app_finance:debts_sweep_json"),
+            {"budgets": "500,1000,abc,-5", "strategies": "snowball,bogus", "max_months": "99999"},
+        )
+        data = response.json()
+        self.assertEqual((data["debt_count"], data["total_debt"]), (1, 5000.0))
+        self.assertEqual(data["budgets"], [500.0, 1000.0])
+        self.assertEqual(data["strategies"], ["SNOWBALL"])
+        self.assertLessEqual(data["max_months"], DEBT_SWEEP_MAX_MONTHS)
+        self.assertEqual(len(data["surface"]["SNOWBALL"]["months"]), 2)
+        self.assertLess(data["surface"]["SNOWBALL"]["months"][1], data["surface"]["SNOWBALL"]["months"][0])
+
+    def test_endpoint_ignores_huge_amounts(self):
+        self.client.force_login(self.user)
+        url = reverse("app_finance:debts_sweep_json")
+        cases = [
+            ({"budgets": "1e30,800"}, [800.0]),
+            ({"min": "1e40", "max": "1e41", "steps": "2", "max_months": "12"}, None),
+            ({"min": "500", "max": "1e20", "steps": "2", "max_months": "12"}, [500.0, 1500.0]),
+            ({"budgets": "800", "quick_win": "1e50"}, [800.0]),
+        ]
+        for params, budgets in cases:
+            with self.subTest(**params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                if budgets is not None:
+                    self.assertEqual(response.json()["budgets"], budgets)
+
+    def test_results_are_cached_by_debt_snapshot(self):
+        budgets = [Decimal("9000"), Decimal("15000")]
+        first = sweep_debt_plans(self.DEBTS, budgets, parallel=False)
+        self.assertEqual((first["computed"], first["cached"]), (6, 0))
+
+        again = sweep_debt_plans(self.DEBTS, budgets + [Decimal("20000")], parallel=False)
+        self.assertEqual((again["computed"], again["cached"]), (3, 6))
+        self.assertEqual(again["surface"]["HYBRID"][:2], first["surface"]["HYBRID"])
+
+        # ยอดหนี้เปลี่ยน -> snapshot เปลี่ยน -> ไม่หยิบผลเก่ามาใช้
+        changed = [dict(d) for d in self.DEBTS]
+        changed[0]["balance"] = "44000"
+        self.assertEqual(sweep_debt_plans(changed, budgets, parallel=False)["computed"], 6)
+
+    @override_settings(DEBT_PLAN_CACHE="missing-alias")
+    def test_unknown_cache_alias_falls_back_to_default(self):
+        sweep_debt_plans(self.DEBTS, [Decimal("9000")], parallel=False)
+        self.assertEqual(sweep_debt_plans(self.DEBTS, [Decimal("9000")], parallel=False)["cached"], 3)
+
+    def test_key_covers_every_input(self):
+        snapshot = debt_snapshot(self.DEBTS)
+        base = debt_plan_key(snapshot, Decimal("9000"), "AVALANCHE", 360, None)
+        self.assertEqual(debt_plan_key(snapshot, Decimal("9000.00"), "AVALANCHE", 360, None), base)
+        for changed in (
+            (snapshot, Decimal("9000.01"), "AVALANCHE", 360, None),
+            (snapshot, Decimal("9000"), "SNOWBALL", 360, None),
+            (snapshot, Decimal("9000"), "AVALANCHE", 120, None),
+            (snapshot, Decimal("9000"), "AVALANCHE", 360, Decimal("9000")),
+            (snapshot[::-1], Decimal("9000"), "AVALANCHE", 360, None),
+        ):
+            with self.subTest(changed=changed[1:]):
+                self.assertNotEqual(debt_plan_key(*changed), base)
+
+
+class AsyncReportViewTests(FinanceTestCase):
+    """view รายงานแบบ async (ยิง query พร้อมกัน) ต้องได้ตัวเลขเดียวกับข้อมูลจริง และเห็นแค่ของ user นี้"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = User.objects.create_user("other", password="pw")
+        other_bank = Account.objects.create(owner=other, name="ธนาคาร", account_type="BANK")
+        Transaction.objects.create(
+            owner=other, account=other_bank, category=cls.food, date=cls.today,
+            direction="OUT", amount=Decimal("999"),
+        )
+
+    async def login(self):
+        await self.async_client.aforce_login(self.user)
+
+    async def test_monthly_report_and_budgets(self):
+        await self.login()
+        await sync_to_async(self.tx)("1200", direction="IN", category=self.salary)
+        await sync_to_async(self.tx)("400", category=self.food)
+        await CategoryBudget.objects.acreate(
+            owner=self.user, category=self.food, year=self.today.year, month=self.today.month,
+            amount=Decimal("300"),
+        )
+        params = {"year": self.today.year, "month": self.today.month}
+
+        report = (await self.async_client.get(reverse("app_finance:monthly_report"), params)).context
+        self.assertEqual(
+            (report["income_sum"], report["expense_sum"], report["net_sum"]),
+            (Decimal("1200"), Decimal("400"), Decimal("800")),
+        )
+        self.assertEqual(report["years"], [self.today.year])
+
+        budgets = (await self.async_client.get(reverse("app_finance:budgets_overview"), params)).context
+        self.assertEqual([item["spent"] for item in budgets["items"]], [Decimal("400")])
+        self.assertTrue(budgets["items"][0]["over"])
+        self.assertEqual(budgets["total_diff"], Decimal("-100"))
+
+    async def test_goals_list_creates_and_shows_progress(self):
+        await self.login()
+        url = reverse("app_finance:goals_list")
+        response = await self.async_client.post(url, {
+            "name": "ทริป", "account": self.bank.pk, "target_amount": "1000", "direction": "IN",
+            "is_active": "on",
+        })
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        goal = await Goal.objects.aget(owner=self.user, name="ทริป")
+        await sync_to_async(self.tx)("250", direction="IN", goal=goal)
+
+        goals = (await self.async_client.get(url)).context["goals"]
+        self.assertEqual([(g.name, g.done_amount, g.percent) for g in goals], [("ทริป", Decimal("250"), 25.0)])
+
+
+class GoalProgressTests(FinanceTestCase):
+    """Goal.done_amount ตามทุกการแก้รายการ + goal_progress / project_goal คาดการณ์วันถึงเป้า"""
+
+    def setUp(self):
+        self.trip = Goal.objects.create(owner=self.user, name="เที่ยว", target_amount=Decimal("1000"))
+        self.car = Goal.objects.create(owner=self.user, name="รถ", target_amount=Decimal("5000"))
+
+    def done(self, goal):
+        return Goal.objects.get(pk=goal.pk).done_amount
+
+    def assertGoalsConsistent(self):
+        self.assertEqual(rebuild_goal_progress(Goal.objects.filter(owner=self.user), fix=False), [])
+
+    def test_transaction_changes_apply_deltas(self):
+        t = self.tx("300", direction="IN", goal=self.trip)
+        self.tx("50", direction="IN", goal=self.trip, is_estimate=True)
+        self.tx("70", direction="OUT", goal=self.trip)  # ทิศทางไม่ตรงกับเป้า ไม่นับ
+        self.assertEqual(self.done(self.trip), Decimal("300"))
+
+        t.amount = Decimal("350")
+        t.save()
+        self.assertEqual(self.done(self.trip), Decimal("350"))
+
+        t.goal = self.car
+        t.save()
+        self.assertEqual((self.done(self.trip), self.done(self.car)), (Decimal("0"), Decimal("350")))
+
+        t.is_estimate = True
+        t.save()
+        self.assertEqual(self.done(self.car), Decimal("0"))
+        t.is_estimate = False
+        t.save()
+        t.delete()
+        self.assertEqual(self.done(self.car), Decimal("0"))
+        self.assertGoalsConsistent()
+
+    def test_saving_a_goal_recounts_progress(self):
+        stale = Goal.objects.get(pk=self.trip.pk)
+        self.tx("200", direction="IN", goal=self.trip)
+        self.tx("80", direction="OUT", goal=self.trip)
+        # ตัวที่โหลดไว้ก่อนยังถือ done_amount = 0 บันทึกแล้วต้องไม่ทับยอดจริง
+        stale.name = "เที่ยวญี่ปุ่น"
+        stale.save()
+        self.assertEqual(self.done(self.trip), Decimal("200"))
+
+        stale.direction = "OUT"
+        stale.save()
+        self.assertEqual((stale.done_amount, self.done(self.trip)), (Decimal("80"), Decimal("80")))
+        self.assertGoalsConsistent()
+
+    def test_progress_and_projection(self):
+        today = self.today
+        self.tx("100", direction="IN", goal=self.trip, day=today - timedelta(days=200))
+        self.tx("300", direction="IN", goal=self.trip, day=today - timedelta(days=29))
+        self.tx("150", direction="IN", goal=self.trip, day=today)
+
+        progress = goal_progress(self.user, [self.trip, self.car], today)
+        self.assertEqual(list(progress), [self.trip.pk])
+        self.assertEqual(progress[self.trip.pk]["done"], Decimal("550"))
+        self.assertEqual(progress[self.trip.pk]["count"], 3)
+        self.assertEqual(progress[self.trip.pk]["recent"], Decimal("450"))
+
+        self.trip.target_date = today + timedelta(days=50)
+        projection = project_goal(self.trip, Decimal("550"), progress[self.trip.pk], today)
+        # 450 บาทใน 90 วัน = 5 บาท/วัน เหลือ 450 -> 90 วัน เลยวันเป้า
+        self.assertEqual(projection["per_month"], Decimal("150.00"))
+        self.assertEqual(projection["projected_date"], today + timedelta(days=90))
+        self.assertFalse(projection["on_track"])
+
+        reached = project_goal(self.trip, Decimal("1000"), progress[self.trip.pk], today)
+        self.assertTrue(reached["reached"])
+        self.assertEqual(project_goal(self.car, Decimal("0"), None, today)["projected_date"], None)
+
+
+class CategorySpendingTests(FinanceTestCase):
+    """category_spending ที่หน้าหมวดหมู่ / สรุปรายเดือนใช้ร่วมกัน: ยอดจริงต่อหมวดเทียบงบ"""
+
+    def setUp(self):
+        self.travel = Category.objects.create(name="เดินทาง", kind="EXPENSE")
+        self.first = self.today.replace(day=1)
+        self.tx("400", category=self.food, day=self.first)
+        self.tx("250", category=self.travel, day=self.first)
+        self.tx("999", category=self.food, day=self.first, is_estimate=True)  # ประมาณการไม่นับ
+        self.tx("50", category=self.food, day=self.first - timedelta(days=1))  # เดือนก่อน
+        CategoryBudget.objects.create(
+            owner=self.user, category=self.food, year=self.first.year, month=self.first.month,
+            amount=Decimal("300"),
+        )
+
+    def spending(self, **kwargs):
+        return category_spending(
+            self.user, self.first.year, self.first.month, [self.food, self.travel], **kwargs,
+        )
+
+    def test_user_budget_overrides_category_default(self):
+        result = self.spending()
+        food, travel = result["rows"]
+        self.assertEqual(
+            (food["used"], food["budget"], food["remaining"], food["over"]),
+            (Decimal("400"), Decimal("300"), Decimal("-100"), True),
+        )
+        self.assertEqual((travel["used"], travel["budget"], travel["percent"]), (Decimal("250"), Decimal("0"), None))
+        self.assertEqual(
+            (result["total_budget"], result["total_used"], result["net_remaining"]),
+            (Decimal("300"), Decimal("650"), Decimal("-350")),
+        )
+
+    def test_category_default_budget_and_views(self):
+        food = self.spending(user_budgets=False)["rows"][0]
+        self.assertEqual((food["budget"], food["percent"], food["over"]), (Decimal("3000"), 400 / 3000 * 100, False))
+
+        self.client.force_login(self.user)
+        params = {"year": self.first.year, "month": self.first.month}
+        summary = self.client.get(reverse("app_finance:summary_month"), params).context
+        # หน้าสรุป / PDF เทียบกับงบกลางของหมวด ไม่ใช่งบรายเดือน 300 ของ user
+        for context in (summary, build_report_context(self.user, self.first.year, self.first.month)):
+            budgets = {row["category"].name: row["budget"] for row in context["rows"]}
+            self.assertEqual((budgets["อาหาร"], budgets["เดินทาง"]), (Decimal("3000"), Decimal("0")))
+            self.assertEqual(
+                (context["total_budget"], context["total_used"], context["net_remaining"]),
+                (Decimal("3000"), Decimal("650"), Decimal("2350")),
+            )
+        categories = self.client.get(reverse("app_finance:categories_manage")).context["categories"]
+        used = {c.name: c.expense_this_month for c in categories}
+        self.assertEqual((used["อาหาร"], used["เงินเดือน"]), (Decimal("400"), Decimal("0")))
+
+
+@override_settings(REPORT_WORKERS=0)
+class ReportJobTests(FinanceTestCase):
+    """คิว PDF: ใช้ไฟล์เดิมเมื่อข้อมูลไม่เปลี่ยน สร้างใหม่เมื่อ FAILED / ค้าง / ไฟล์หาย / ข้อมูลเปลี่ยน"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.enterContext(mock.patch.object(utils_reports, "render_report_pdf", return_value=b"%PDF-test"))
+        self.year, self.month = self.today.year, self.today.month
+        self.tx("100", category=self.food)
+
+    def ensure(self, **kwargs):
+        return ensure_report_job(self.user, self.year, self.month, **kwargs)
+
+    def build(self):
+        job, _ = self.ensure()
+        self.assertTrue(run_report_job(job.pk))
+        return ReportJob.objects.get(pk=job.pk)
+
+    def test_done_job_is_reused_until_the_data_changes(self):
+        job = self.build()
+        self.assertEqual((job.status, job.pdf.read()), ("DONE", b"%PDF-test"))
+        self.assertEqual(self.ensure(), (job, False))
+        self.assertFalse(run_report_job(job.pk))  # ไม่ได้อยู่ในคิว
+
+        self.tx("50", category=self.food)
+        fresh, queued = self.ensure()
+        self.assertTrue(queued)
+        self.assertNotEqual(fresh.data_version, job.data_version)
+        self.assertTrue(run_report_job(fresh.pk))
+        self.assertFalse(ReportJob.objects.filter(pk=job.pk).exists())  # เวอร์ชันเก่าถูกลบพร้อมไฟล์
+        self.assertFalse(job.pdf.storage.exists(job.pdf.name))
+
+    def test_failed_stale_and_missing_file_are_queued_again(self):
+        job = self.build()
+        self.assertEqual(self.ensure(force=True), (job, True))
+
+        ReportJob.objects.filter(pk=job.pk).update(status="FAILED", error="boom")
+        job, queued = self.ensure()
+        self.assertEqual((queued, job.error), (True, ""))
+
+        ReportJob.objects.filter(pk=job.pk).update(status="RUNNING", started_at=timezone.now())
+        self.assertEqual(self.ensure(), (job, False))  # ยังทำงานอยู่
+        ReportJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - REPORT_JOB_STALE_AFTER - timedelta(minutes=1),
+        )
+        self.assertEqual(self.ensure(), (job, True))
+
+        job = self.build()
+        job.pdf.storage.delete(job.pdf.name)
+        self.assertEqual(self.ensure(), (job, True))
+        self.assertTrue(run_report_job(job.pk))
+        self.assertTrue(job.pdf.storage.exists(ReportJob.objects.get(pk=job.pk).pdf.name))
+
+    def test_render_errors_mark_the_job_failed(self):
+        utils_reports.render_report_pdf.side_effect = ReportUnavailable("no pdf")
+        job, _ = self.ensure()
+        self.assertFalse(run_report_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ("FAILED", "no pdf"))
+
+        utils_reports.render_report_pdf.side_effect = RuntimeError("broken template")
+        self.ensure()
+        with self.assertLogs(utils_reports.logger, "ERROR"):
+            self.assertEqual(run_pending_jobs(), (0, 1))
+        utils_reports.render_report_pdf.side_effect = None
+        self.ensure()
+        self.assertEqual(run_pending_jobs(), (1, 0))
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, "DONE")
+
+
+class ForecastTests(FinanceTestCase):
+    """พยากรณ์ยอดรายวัน: ยอดตั้งต้น, รายการล่วงหน้า, ประมาณการที่ค้าง, รายการประจำไม่นับซ้ำ"""
+
+    def test_daily_balances(self):
+        today = date(2025, 1, 15)
+        rent = RecurringTransaction.objects.create(
+            owner=self.user, account=self.bank, direction="OUT", amount=Decimal("500"), day_of_month=20,
+        )
+        RecurringTransaction.objects.create(
+            owner=self.user, account=self.bank, direction="IN", amount=Decimal("50"), day_of_month=25,
+        )
+        self.tx("200", direction="IN", day=date(2025, 1, 10))
+        # ประมาณการที่เลยวันมาแล้ว ยังไม่ได้จ่าย -> ต้องไปอยู่วันแรกของการพยากรณ์ ไม่หายไป
+        self.tx("300", day=date(2025, 1, 5), is_estimate=True, is_paid=False)
+        self.tx("100", day=date(2025, 1, 18))
+        self.tx("500", day=date(2025, 1, 20), is_estimate=True, is_paid=False, source_recurring=rent)
+
+        forecast = build_forecast(self.user, today, months=0)
+        self.assertEqual(forecast["dates"][0], date(2025, 1, 16))
+        self.assertEqual(forecast["end"], date(2025, 1, 31))
+        self.assertEqual(forecast["events"], 4)
+
+        bank = next(s for s in forecast["accounts"] if s["account"] == self.bank)
+        self.assertEqual(bank["start"], Decimal("1200"))
+        by_day = dict(zip(forecast["dates"], bank["balances"]))
+        self.assertEqual(by_day[date(2025, 1, 16)], Decimal("900"))
+        self.assertEqual(by_day[date(2025, 1, 18)], Decimal("800"))
+        self.assertEqual(by_day[date(2025, 1, 20)], Decimal("300"))
+        self.assertEqual(by_day[date(2025, 1, 31)], Decimal("350"))
+        self.assertEqual((bank["low"], bank["low_date"]), (Decimal("300"), date(2025, 1, 20)))
+
+        self.assertEqual(forecast["total"]["end"], Decimal("350") - Decimal("5000"))
+        self.assertEqual(forecast["first_negative"], date(2025, 1, 16))
+
+
+class AsyncQueryStatsTests(FinanceTestCase):
+    """QueryStatsMiddleware ต้องนับ query ของ async view (ORM ที่วิ่งใน thread ของ sync_to_async) ด้วย"""
+
+    def setUp(self):
+        perf_stats.reset()
+        Goal.objects.create(owner=self.user, name="เที่ยว", target_amount=Decimal("1000"))
+
+    def recorded(self, view_name):
+        return {v["view"]: v for v in perf_stats.snapshot()}[view_name]
+
+    async def test_async_views_are_counted(self):
+        await self.async_client.aforce_login(self.user)
+        for name in ("goals_list", "budgets_overview", "dashboard"):
+            with self.subTest(view=name):
+                response = await self.async_client.get(reverse(f"app_finance:{name}"))
+                self.assertEqual(response.status_code, 200)
+                stats = await sync_to_async(self.recorded)(f"app_finance:{name}")
+                # มากกว่า session + user ที่ middleware ของ auth ยิงเอง
+                self.assertGreater(stats["queries"]["max"], 2)
+
+    @override_settings(QUERY_BUDGET_STRICT=True, QUERY_BUDGETS={"app_finance:goals_list": 3})
+    async def test_async_view_over_budget_raises(self):
+        await self.async_client.aforce_login(self.user)
+        with self.assertRaises(QueryBudgetExceeded):
+            await self.async_client.get(reverse("app_finance:goals_list"))
+
+
+class GenerateDataTests(TestCase):
+    """generate_data ใช้ bulk_create จึงต้องคำนวณยอดสะสม / สรุปรายเดือน / เป้าหมาย / index เองให้ครบ"""
+
+    def test_generated_users_are_consistent(self):
+        options = dict(users=2, transactions=300, months=3, batch_size=70, seed=3, stdout=io.StringIO())
+        call_command("generate_data", **options)
+        users = User.objects.filter(username__startswith="bench")
+        self.assertEqual(Transaction.objects.filter(owner__in=users).count(), 600)
+
+        self.assertEqual(rebuild_account_balances(Account.objects.filter(owner__in=users), fix=False), [])
+        self.assertEqual(rebuild_monthly_summaries(users, fix=False), [])
+        self.assertEqual(rebuild_goal_progress(Goal.objects.filter(owner__in=users), fix=False), [])
+        owner_ids = set(users.values_list("pk", flat=True))
+        if search_backend() is not None:
+            self.assertEqual(check_search_index(owner_ids), (set(), set()))
+
+        with self.assertRaises(CommandError):
+            call_command("generate_data", **options)  # ชื่อซ้ำต้องใส่ --clear
+        call_command("generate_data", clear=True, **options)
+        self.assertEqual(Transaction.objects.filter(owner__username__startswith="bench").count(), 600)
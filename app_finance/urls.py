@@ -6,10 +6,14 @@ app_name = "app_finance"
 urlpatterns = [
     path("", views.home, name="home"),
     path("dashboard/", views.dashboard, name="dashboard"),
+    path("dashboard/cards/<slug:name>/", views.dashboard_card_json, name="dashboard_card_json"),
     path("dashboard/preferences/", views.dashboard_preferences, name="dashboard_preferences"),
     path("transactions/", views.transactions_list, name="transactions_list"),
+    path("transactions/page/", views.transactions_page_json, name="transactions_page_json"),
+    path("transactions/search/", views.transactions_search_json, name="transactions_search_json"),
     path("transactions/<int:pk>/edit/", views.transaction_edit, name="transaction_edit"),
     path("transactions/export/", views.transactions_export_csv, name="transactions_export_csv"),
+    path("transactions/import/", views.transactions_import, name="transactions_import"),
     path("transactions/add/", views.transaction_create, name="transaction_create"),
     path("accounts/", views.accounts_manage, name="accounts_manage"),
     path("accounts/<int:pk>/edit/", views.account_edit, name="account_edit"),
@@ -20,12 +24,19 @@ urlpatterns = [
     path("goals/", views.goals_list, name="goals_list"),
     path("goals/<int:pk>/", views.goal_detail, name="goal_detail"), 
     path("report/month/pdf/", views.monthly_report_pdf, name="monthly_report_pdf"),
+    path("report/jobs/<int:pk>/", views.report_job_status, name="report_job_status"),
+    path("report/jobs/<int:pk>/pdf/", views.report_job_download, name="report_job_download"),
     path("calendar/", views.cash_calendar, name="cash_calendar"),
+    path("forecast/", views.cash_forecast, name="cash_forecast"),
+    path("forecast/data/", views.cash_forecast_json, name="cash_forecast_json"),
     path("budgets/", views.budgets_overview, name="budgets_overview"),
     path("report/monthly/", views.monthly_report, name="monthly_report"),
     path("debts/", views.debts_overview, name="debts_overview"),
+    path("debts/sweep/", views.debts_sweep_json, name="debts_sweep_json"),
     path("tools/", views.tools_home, name="tools_home"),
+    path("tools/perf/", views.perf_stats_json, name="perf_stats_json"),
     path("tools/export/json/", views.export_full_json, name="export_full_json"),
+    path("tools/import/json/", views.import_full_json, name="import_full_json"),
     path("recurring/", views.recurring_list, name="recurring_list"),
     path("recurring/apply-month/", views.recurring_apply_month, name="recurring_apply_month"),
     path("howto/", views.howto_view, name="howto"),
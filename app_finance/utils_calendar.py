@@ -0,0 +1,135 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import Account, Transaction
+from .utils_ledger import signed_amount
+from .utils_recurring import active_rules, iter_months, occurrence_date
+from .utils_rollup import MONTH_LABELS, month_range
+
+
+def _starting_balance(user, start):
+    """
+    ยอดเงินรวมบัญชีที่ยังใช้งานของ user ณ ต้นวัน start (ยอดยกมา + รายการจริงก่อนหน้า)
+    บัญชีที่ปิดแล้วไม่นับ เหมือนยอดรวมบน Dashboard / หน้าคาดการณ์
+    """
+    balance = (
+        Account.objects.filter(owner=user, is_active=True).aggregate(s=Sum("opening_balance"))["s"]
+        or Decimal("0")
+    )
+    rows = (
+        Transaction.objects
+        .filter(owner=user, account__is_active=True, is_estimate=False, date__lt=start)
+        .values("direction")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in rows:
+        balance += signed_amount(row["direction"], row["total"] or Decimal("0"))
+    return balance
+
+
+def build_cash_calendar(user, first_month, last_month, today):
+    """
+    ปฏิทินเงินเข้า–ออกรายวันของ user ตั้งแต่ first_month ถึง last_month (รวมปลาย)
+    ใช้จำนวน query คงที่ไม่ว่าจะกี่เดือน:
+      - ยอดต่อวันดึงด้วย GROUP BY (date, direction, is_estimate) ครั้งเดียว
+      - รายการประจำดึงครั้งเดียว แล้วกระจายลงวันใน memory
+        (day_of_month 29-31 ปัดเป็นวันสุดท้ายของเดือนสั้น ไม่หายไป)
+    ยอดคงเหลือรายวัน: วันที่ผ่านมาแล้วใช้รายการจริง วันหลังจากวันนี้บวกรายการประมาณการ
+    และรายการประจำที่ยังไม่ได้สร้างเป็น Transaction เพิ่มเข้าไปเป็นยอดคาดการณ์
+    ดูเดือนในอนาคต: ยอดคาดการณ์ตั้งแต่พรุ่งนี้ถึงก่อนวันแรกของปฏิทินรวมเข้ายอดยกมาด้วย
+    (ช่วงเดียวกับหน้าพยากรณ์) ดึงใน query ชุดเดิมโดยขยายช่วงวันที่
+
+    return: list ของเดือน {"year", "month", "label", "days", "empty_start", "total_in", "total_out"}
+    """
+    start = month_range(*first_month)[0]
+    end = month_range(*last_month)[1]
+    plan_from = min(start, today + timedelta(days=1))
+    plan_month = (plan_from.year, plan_from.month)
+
+    actual = {}
+    planned = {}
+    rows = (
+        Transaction.objects
+        .filter(owner=user, account__is_active=True, date__gte=plan_from, date__lt=end)
+        .values("date", "direction", "is_estimate")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    for row in rows:
+        if row["date"] < start and not row["is_estimate"]:
+            continue  # รายการจริงก่อน start อยู่ในยอดยกมาแล้ว
+        bucket = planned if row["is_estimate"] else actual
+        key = (row["date"], row["direction"])
+        bucket[key] = bucket.get(key, Decimal("0")) + (row["total"] or Decimal("0"))
+
+    rules = list(active_rules(plan_month, last_month, owners=[user]).filter(account__is_active=True))
+    materialized = set(
+        Transaction.objects
+        .filter(owner=user, source_recurring__isnull=False, date__gte=plan_from, date__lt=end)
+        .values_list("source_recurring_id", "date")
+    ) if rules else set()
+
+    recurring_by_day = {}
+    for year, month in iter_months(plan_month, last_month):
+        for r in rules:
+            tx_date = occurrence_date(r, year, month)
+            if tx_date is None:
+                continue
+            recurring_by_day.setdefault(tx_date, []).append(r)
+            if (r.pk, tx_date) not in materialized:
+                key = (tx_date, r.direction)
+                planned[key] = planned.get(key, Decimal("0")) + r.amount
+
+    balance = _starting_balance(user, start)
+    for (day, direction), amount in planned.items():
+        if plan_from <= day < start:
+            balance += signed_amount(direction, amount)
+    zero = Decimal("0")
+    months = []
+    current = start
+    for year, month in iter_months(first_month, last_month):
+        month_end = month_range(year, month)[1]
+        days = []
+        total_in = total_out = zero
+        while current < month_end:
+            day_in = actual.get((current, "IN"), zero)
+            day_out = actual.get((current, "OUT"), zero)
+            balance += day_in - day_out
+
+            projected = current > today
+            planned_in = planned.get((current, "IN"), zero) if projected else zero
+            planned_out = planned.get((current, "OUT"), zero) if projected else zero
+            balance += planned_in - planned_out
+
+            days.append({
+                "date": current,
+                "day": current.day,
+                "weekday": current.weekday(),
+                "total_in": day_in,
+                "total_out": day_out,
+                "net": day_in - day_out,
+                "planned_in": planned_in,
+                "planned_out": planned_out,
+                "balance": balance,
+                "is_projected": projected,
+                "recurring": recurring_by_day.get(current, []),
+            })
+            total_in += day_in
+            total_out += day_out
+            current += timedelta(days=1)
+
+        months.append({
+            "year": year,
+            "month": month,
+            "label": f"{MONTH_LABELS[month]} {year}",
+            "days": days,
+            "empty_start": list(range(days[0]["weekday"])),
+            "total_in": total_in,
+            "total_out": total_out,
+            "net": total_in - total_out,
+            "end_balance": balance,
+        })
+    return months
@@ -0,0 +1,437 @@
+import calendar
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Sum
+from django.utils.functional import cached_property
+
+from .models import (
+    Account,
+    CategoryBudget,
+    DashboardVersion,
+    DebtPlanSetting,
+    Goal,
+    RecurringTransaction,
+    Transaction,
+)
+from .utils_rollup import MONTH_LABELS, add_months, build_monthly_rollup, months_back
+
+
+# cache ที่เก็บผลของแต่ละการ์ด (alias ใน CACHES) และอายุของผล
+DASHBOARD_CACHE = getattr(settings, "DASHBOARD_CACHE", "default")
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 60 * 60)
+
+# version ของข้อมูลกลาง (เช่น ชื่อหมวดหมู่ ที่ทุก user ใช้ร่วมกัน)
+GLOBAL_VERSION_SCOPE = "global"
+
+
+class DashboardCard:
+    """
+    การ์ด 1 ใบบน Dashboard: ชื่อ, field ใน DashboardPreference ที่เปิด/ปิด, ฟังก์ชันคำนวณ
+    template = partial ของการ์ดที่โหลดทีหลังผ่าน JSON endpoint (None = คำนวณพร้อมหน้าหลัก)
+    json_keys = ค่าที่ส่งไปใน JSON ด้วย (เช่น ข้อมูลกราฟ)
+    """
+
+    __slots__ = ("name", "flag", "compute", "template", "json_keys")
+
+    def __init__(self, name, flag, compute, template=None, json_keys=()):
+        self.name = name
+        self.flag = flag
+        self.compute = compute
+        self.template = template
+        self.json_keys = json_keys
+
+    @property
+    def lazy(self):
+        return self.template is not None
+
+    def enabled(self, pref):
+        return self.flag is None or pref is None or getattr(pref, self.flag)
+
+
+# name -> DashboardCard เรียงตามลำดับที่ลงทะเบียน
+DASHBOARD_CARDS = {}
+
+
+def dashboard_card(name, flag=None, lazy=False, json_keys=()):
+    """
+    ลงทะเบียนฟังก์ชันคำนวณการ์ด ฟังก์ชันรับ DashboardData แล้วคืน dict ที่จะเอาไปรวมใน context
+    flag = None คือการ์ดที่ต้องคำนวณเสมอ (เช่น ยอดรวมด้านบน)
+    lazy = True -> หน้าหลักแสดงแค่ที่ว่างไว้ แล้วดึงการ์ดจริงจาก app_finance/_dashboard_<name>.html ทีหลัง
+    """
+    def register(func):
+        template = f"app_finance/_dashboard_{name}.html" if lazy else None
+        DASHBOARD_CARDS[name] = DashboardCard(name, flag, func, template, json_keys)
+        return func
+    return register
+
+
+# =========================
+#   Version counter (ใช้ทำ key ของ cache)
+# =========================
+
+def _cache():
+    return caches[DASHBOARD_CACHE]
+
+
+def _version_scope(user_id):
+    return f"user:{user_id}"
+
+
+def dashboard_versions(user_id):
+    """
+    (version ของ user, version กลาง) อ่านจาก DashboardVersion ด้วย query เดียว (ยังไม่เคยเลื่อน = 0)
+    อยู่ในฐานข้อมูลไม่ใช่ใน cache: ถ้าใช้ LocMemCache แต่ละ worker จะเห็น version คนละค่า
+    และการ์ดของ worker อื่นจะค้างข้อมูลเก่าไปจนหมดอายุ
+    """
+    scopes = [_version_scope(user_id), GLOBAL_VERSION_SCOPE]
+    found = dict(
+        DashboardVersion.objects.filter(scope__in=scopes).values_list("scope", "version")
+    )
+    return found.get(scopes[0], 0), found.get(scopes[1], 0)
+
+
+def _bump_versions(scopes):
+    """
+    ตั้ง version ใหม่ (เวลาปัจจุบัน ns) ใน transaction เดียวกับข้อมูลที่เปลี่ยน
+    request อื่นจึงเห็น version ใหม่พร้อมกับข้อมูลใหม่ตอน commit ไม่ก่อนไม่หลัง
+    """
+    version = time.time_ns()
+    updated = DashboardVersion.objects.filter(scope__in=scopes).update(version=version)
+    if updated < len(scopes):
+        # แถวที่ยังไม่มี (ครั้งแรกของ user) สร้างให้ ถ้ามี request อื่นสร้างไปพร้อมกันก็เขียนทับอีกรอบ
+        DashboardVersion.objects.bulk_create(
+            [DashboardVersion(scope=scope, version=version) for scope in scopes],
+            ignore_conflicts=True,
+        )
+        DashboardVersion.objects.filter(scope__in=scopes).update(version=version)
+
+
+def bump_dashboard_version(user_ids):
+    """ข้อมูลของ user เหล่านี้เปลี่ยน -> การ์ดที่ cache ไว้ทั้งหมดของเขาใช้ไม่ได้แล้ว"""
+    scopes = sorted({_version_scope(uid) for uid in user_ids if uid})
+    if scopes:
+        _bump_versions(scopes)
+
+
+def bump_global_dashboard_version():
+    """ข้อมูลที่ทุก user ใช้ร่วมกันเปลี่ยน (เช่น หมวดหมู่)"""
+    _bump_versions([GLOBAL_VERSION_SCOPE])
+
+
+# =========================
+#   ข้อมูลที่หลายการ์ดใช้ร่วมกัน
+# =========================
+
+class DashboardData:
+    """
+    ของที่หลายการ์ดใช้ร่วมกัน คำนวณตอนมีการ์ดเรียกใช้ครั้งแรกเท่านั้น
+    การ์ดที่ถูกปิด / ได้จาก cache ไม่เรียก -> ไม่มี query
+    """
+
+    def __init__(self, user, today, key_prefix):
+        self.user = user
+        self.today = today
+        self.year = today.year
+        self.month = today.month
+        self.trend_months = months_back(self.year, self.month, 6)
+        self.key_prefix = key_prefix
+
+    @cached_property
+    def rollup(self):
+        # ยอดรวมรายเดือน 6 เดือนล่าสุด (query เดียว ใช้ร่วมทุกการ์ด)
+        # เก็บใน cache ด้วย การ์ดที่โหลดแยกกันทีหลังจะได้ไม่ต้อง query ซ้ำคนละรอบ
+        key = f"{self.key_prefix}:rollup"
+        rollup = _cache().get(key)
+        if rollup is None:
+            rollup = build_monthly_rollup(self.user, self.trend_months[0], self.trend_months[-1])
+            _cache().set(key, rollup, timeout=DASHBOARD_CACHE_TIMEOUT)
+        return rollup
+
+    @cached_property
+    def expense_by_cat(self):
+        return self.rollup.category_ranking(self.year, self.month, "OUT")
+
+    @cached_property
+    def expense_map_by_cat(self):
+        return {cid: total for cid, _, total in self.expense_by_cat}
+
+
+# =========================
+#   การ์ด
+# =========================
+
+@dashboard_card("overview")
+def _overview(data):
+    """บัญชี & Net Worth (ของ user นี้เท่านั้น) ใช้ทั้งหัวหน้าและฟอร์มเพิ่มรายการด่วน"""
+    accounts = list(Account.objects.filter(owner=data.user, is_active=True))
+
+    total_assets = Decimal("0")
+    total_debt = Decimal("0")
+    for acc in accounts:
+        bal = Decimal(acc.current_balance or Decimal("0"))
+        if bal >= 0:
+            total_assets += bal
+        else:
+            total_debt += abs(bal)
+
+    return {
+        "accounts": accounts,
+        "total_assets": total_assets,
+        "total_liabilities": total_debt,
+        "net_worth": total_assets - total_debt,
+    }
+
+
+@dashboard_card("today_summary", "show_today_summary")
+def _today_summary(data):
+    today_totals = {
+        row["direction"]: row["s"]
+        for row in Transaction.objects.filter(
+            owner=data.user,
+            date=data.today,
+            is_estimate=False,
+        ).values("direction").annotate(s=Sum("amount")).order_by()
+    }
+    today_income = today_totals.get("IN") or Decimal("0")
+    today_expense = today_totals.get("OUT") or Decimal("0")
+    today_net = today_income - today_expense
+
+    return {
+        "today_income": today_income,
+        "today_expense": today_expense,
+        "today_net": today_net,
+        "today_income_str": f"{today_income:.2f}",
+        "today_expense_str": f"{today_expense:.2f}",
+        "today_net_str": f"{today_net:.2f}",
+    }
+
+
+@dashboard_card("recent_transactions", "show_recent_transactions")
+def _recent_transactions(data):
+    recent_tx = list(
+        Transaction.objects
+        .filter(owner=data.user)
+        .select_related("account", "category")
+        .order_by("-date", "-id")[:10]
+    )
+    return {"recent_tx": recent_tx}
+
+
+@dashboard_card(
+    "trend_chart", "show_trend_chart", lazy=True,
+    json_keys=("chart_labels", "chart_income", "chart_expense"),
+)
+def _trend_chart(data):
+    labels, income_data, expense_data = [], [], []
+    for y2, m2 in data.trend_months:
+        labels.append(f"{MONTH_LABELS.get(m2, m2)} {str(y2)[2:]}")
+        income_data.append(float(data.rollup.total(y2, m2, "IN")))
+        expense_data.append(float(data.rollup.total(y2, m2, "OUT")))
+    return {
+        "chart_labels": labels,
+        "chart_income": income_data,
+        "chart_expense": expense_data,
+    }
+
+
+@dashboard_card(
+    "expense_pie", "show_expense_pie", lazy=True,
+    json_keys=("cat_labels", "cat_values"),
+)
+def _expense_pie(data):
+    return {
+        "cat_labels": [name or "ไม่ระบุหมวด" for _, name, _ in data.expense_by_cat],
+        "cat_values": [float(total) for _, _, total in data.expense_by_cat],
+    }
+
+
+@dashboard_card("smart_insights", "show_smart_insights", lazy=True)
+def _smart_insights(data):
+    rollup = data.rollup
+    income_month = rollup.total(data.year, data.month, "IN")
+    expense_month = rollup.total(data.year, data.month, "OUT")
+
+    # หมวดที่จ่ายเยอะสุด
+    insight_top_category_name = None
+    insight_top_category_amount = None
+    if data.expense_by_cat:
+        _, top_name, top_total = data.expense_by_cat[0]
+        insight_top_category_name = top_name or "ไม่ระบุหมวด"
+        insight_top_category_amount = top_total
+
+    # เทียบกับค่าเฉลี่ย 3 เดือนก่อนหน้า (รวมทั้งเดือน)
+    last3_months = [add_months(data.year, data.month, -i) for i in range(1, 4)]
+    total_exp_prev = sum((rollup.total(y3, m3, "OUT") for y3, m3 in last3_months), Decimal("0"))
+    avg_exp_prev = total_exp_prev / len(last3_months)
+
+    insight_expense_vs_avg = None
+    insight_expense_vs_avg_percent = None
+    insight_expense_higher = None
+    if avg_exp_prev and avg_exp_prev > 0:
+        diff = expense_month - avg_exp_prev
+        insight_expense_vs_avg = diff
+        insight_expense_higher = diff > 0
+        insight_expense_vs_avg_percent = float((diff / avg_exp_prev) * 100)
+
+    return {
+        "income_month": income_month,
+        "expense_month": expense_month,
+        "net_month": income_month - expense_month,
+        "insight_top_category_name": insight_top_category_name,
+        "insight_top_category_amount": insight_top_category_amount,
+        "insight_expense_vs_avg": insight_expense_vs_avg,
+        "insight_expense_vs_avg_percent": insight_expense_vs_avg_percent,
+        "insight_expense_higher": insight_expense_higher,
+        "avg_exp_prev": avg_exp_prev,
+    }
+
+
+@dashboard_card("estimate_box", "show_estimate_box", lazy=True)
+def _estimate_box(data):
+    est_income = data.rollup.total(data.year, data.month, "IN", is_estimate=True)
+    est_expense = data.rollup.total(data.year, data.month, "OUT", is_estimate=True)
+    return {
+        "est_income": est_income,
+        "est_expense": est_expense,
+        "est_net": est_income - est_expense,
+    }
+
+
+@dashboard_card("budget_box", "show_budget_box", lazy=True)
+def _budget_box(data):
+    budget_items = []
+    budget_over_count = 0
+    budgets_qs = (
+        CategoryBudget.objects
+        .filter(owner=data.user, year=data.year, month=data.month)
+        .select_related("category")
+    )
+    for b in budgets_qs:
+        budget_amount = b.amount or Decimal("0")
+        spent = data.expense_map_by_cat.get(b.category_id, Decimal("0"))
+        percent_b = float(spent / budget_amount * 100) if budget_amount > 0 else None
+        over = spent > budget_amount
+        if over:
+            budget_over_count += 1
+
+        budget_items.append({
+            "obj": b,
+            "category_name": b.category.name,
+            "budget_amount": budget_amount,
+            "spent": spent,
+            "diff": budget_amount - spent,
+            "percent": percent_b,
+            "over": over,
+        })
+
+    budget_items_sorted = sorted(
+        budget_items,
+        key=lambda x: (x["percent"] if x["percent"] is not None else -1),
+        reverse=True,
+    )
+    return {
+        "budget_items_dashboard": budget_items_sorted[:3],
+        "budget_total_count": len(budget_items),
+        "budget_over_count": budget_over_count,
+    }
+
+
+@dashboard_card("goals", "show_goals", lazy=True)
+def _goals(data):
+    goals_preview = []
+    goals = (
+        Goal.objects
+        .filter(owner=data.user, is_active=True)
+        .select_related("account")
+        .order_by("target_date", "name")[:3]
+    )
+    for g in goals:
+        # ยอดสะสมเก็บไว้ใน Goal.done_amount แล้ว ไม่ต้อง aggregate ทีละเป้า
+        done_g = g.done_amount
+        target_g = g.target_amount or Decimal("0")
+
+        goals_preview.append({
+            "obj": g,
+            "done": done_g,
+            "target": target_g,
+            "percent": float(done_g / target_g * 100) if target_g > 0 else None,
+            "remaining": target_g - done_g,
+        })
+    return {"goals_preview": goals_preview}
+
+
+@dashboard_card("recurring", "show_recurring", lazy=True)
+def _upcoming_recurring(data):
+    """รายการประจำที่กำลังจะถึงในเดือนนี้ 5 รายการแรก"""
+    last_day = calendar.monthrange(data.year, data.month)[1]
+    upcoming = []
+    rules = (
+        RecurringTransaction.objects
+        .filter(owner=data.user, is_active=True)
+        .select_related("account", "category")
+    )
+    for r in rules:
+        next_date = data.today.replace(day=min(r.day_of_month, last_day))
+        if next_date < data.today:
+            continue
+        upcoming.append({"obj": r, "next_date": next_date})
+
+    upcoming.sort(key=lambda x: x["next_date"])
+    return {"upcoming_recurring": upcoming[:5]}
+
+
+@dashboard_card("debt_plan_card", "show_debt_plan_card", lazy=True)
+def _debt_plan_card(data):
+    debt_plan, _ = DebtPlanSetting.objects.get_or_create(user=data.user)
+    return {"debt_plan": debt_plan}
+
+
+# =========================
+#   ประกอบ context
+# =========================
+
+def lazy_dashboard_cards(pref):
+    """ชื่อการ์ดแบบโหลดทีหลังที่ user เปิดไว้"""
+    return [card.name for card in DASHBOARD_CARDS.values() if card.lazy and card.enabled(pref)]
+
+
+def build_dashboard(user, pref, today, only=None):
+    """
+    context ของการ์ดที่ user เปิดไว้เท่านั้น (การ์ดที่ปิดไม่คำนวณเลย)
+    only = ชื่อการ์ดที่ต้องการ (None = ทุกการ์ดที่เปิดไว้)
+    ผลแต่ละการ์ด cache ไว้ต่อ user ด้วย key (version ของ user, version กลาง, วันที่, ชื่อการ์ด)
+    ข้อมูลเปลี่ยน -> version ถูกเลื่อน (ดู signals) -> key เปลี่ยน -> คำนวณใหม่เฉพาะตอนถูกเรียก
+
+    return: (context dict, list ชื่อการ์ดที่ต้องคำนวณใหม่รอบนี้)
+    """
+    user_version, global_version = dashboard_versions(user.pk)
+    prefix = f"dashboard:{user.pk}:{user_version}:{global_version}:{today.isoformat()}"
+    cards = [
+        card for card in DASHBOARD_CARDS.values()
+        if card.enabled(pref) and (only is None or card.name in only)
+    ]
+    keys = {card.name: f"{prefix}:card:{card.name}" for card in cards}
+
+    cache = _cache()
+    cached = cache.get_many(keys.values())
+
+    data = DashboardData(user, today, prefix)
+    context = {}
+    fresh = {}
+    computed = []
+    for card in cards:
+        key = keys[card.name]
+        if key in cached:
+            result = cached[key]
+        else:
+            result = card.compute(data)
+            fresh[key] = result
+            computed.append(card.name)
+        context.update(result)
+
+    if fresh:
+        cache.set_many(fresh, timeout=DASHBOARD_CACHE_TIMEOUT)
+    return context, computed
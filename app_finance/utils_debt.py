@@ -1,6 +1,93 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from decimal import Decimal
+from math import log
 
-def calculate_debt_plan(debts, monthly_budget, strategy="AVALANCHE", max_months=120):
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+
+ZERO = Decimal("0")
+ONE = Decimal("1")
+HUNDRED = Decimal("100")
+TWELVE = Decimal("12")
+
+# ช่วงเดือนที่ใช้ทางลัด (fast path) ต้องเหลือระยะห่างจากจุดที่สูตรปิดคำนวณได้อย่างน้อยเท่านี้
+# กันความคลาดเคลื่อนของ float ทำให้ข้ามเดือนที่มีหนี้ปิดไป
+STEADY_SAFETY_MONTHS = 2
+
+DEBT_STRATEGIES = ("SNOWBALL", "AVALANCHE", "HYBRID")
+
+# sweep: grid ตั้งแต่กี่ช่องขึ้นไปถึงจะแจกให้ process pool (grid เล็กคิดเองเร็วกว่าส่งข้าม process)
+SWEEP_PARALLEL_MIN_CELLS = 24
+SWEEP_MAX_WORKERS = 4
+
+# เปลี่ยนเลขนี้เมื่อแก้สูตรจำลอง ผลเก่าใน cache (ที่อาจเก็บในไฟล์ / DB) จะไม่ถูกหยิบมาใช้อีก
+DEBT_PLAN_CACHE_VERSION = 1
+
+
+class _DebtArrays:
+    """
+    ข้อมูลหนี้เก็บเป็น list ขนานกัน (index เดียวกัน = หนี้ใบเดียวกัน) แทน dict ต่อใบ
+    growth = ตัวคูณดอกเบี้ยรายเดือน คิดครั้งเดียวด้วยสูตรเดียวกับแบบเดิม ผลจึงเท่ากันทุกหลัก
+    """
+
+    __slots__ = ("names", "rates", "mins", "balances", "growth")
+
+    def __init__(self, debts):
+        self.names = [d["name"] for d in debts]
+        self.rates = [Decimal(d["interest_rate"]) for d in debts]
+        self.mins = [Decimal(d["min_payment"]) for d in debts]
+        self.balances = [Decimal(d["balance"]) for d in debts]
+        self.growth = [ONE + (r / HUNDRED) / TWELVE for r in self.rates]
+
+
+def _dynamic_order(open_idx, balances, order_key):
+    """
+    ลำดับหนี้ตาม order_key(ยอด, index) จากน้อยไปมาก (เท่ากันเรียงตาม index เหมือน sorted แบบ stable)
+    ส่วนใหญ่ใช้แค่ใบแรก จึงหา min ก่อน แล้วค่อย sort ทั้งหมดเมื่อเงินเหลือไปใบถัดไปจริง ๆ
+    """
+    def key(i):
+        return order_key(balances[i], i)
+
+    first = min(open_idx, key=key)
+    yield first
+    for idx in sorted(open_idx, key=key):
+        if idx != first:
+            yield idx
+
+
+def _steady_months(balance, growth, payment):
+    """
+    จำนวนเดือนที่หนี้ใบนี้ยังไม่ปิดแน่ ๆ ถ้าจ่ายเท่าเดิม payment ทุกเดือน (คำนวณด้วยสูตรปิด)
+      b(m) = c + (b0 - c) * g^m  โดย c = payment / r
+    เงื่อนไขที่ต้องเป็นจริงทุกเดือน: b(m) * g > payment (จ่ายแล้วยังเหลือหนี้)
+    return: จำนวนเดือน (None = ไม่มีวันปิดด้วยยอดจ่ายนี้) หรือ 0 ถ้าสรุปไม่ได้ให้เดินทีละเดือน
+    """
+    b0, g, p = float(balance), float(growth), float(payment)
+    if p <= 0:
+        return None
+    r = g - 1
+    if r < 0:
+        return 0
+    if r == 0:
+        return max(int((b0 - p) / p) - STEADY_SAFETY_MONTHS, 0)
+
+    c = p / r
+    gap = c - b0
+    if abs(gap) < 1e-6 * c:
+        # ยอดจ่ายแทบเท่าดอกเบี้ยพอดี float แยกไม่ออกว่าหนี้ลดหรือเพิ่ม
+        return 0
+    if gap < 0:
+        return None  # จ่ายน้อยกว่าดอกเบี้ย หนี้ไม่ลด
+    ratio = (c - p / g) / gap
+    if ratio <= 1:
+        return 0
+    return max(int(log(ratio) / log(g)) - STEADY_SAFETY_MONTHS, 0)
+
+
+def calculate_debt_plan(debts, monthly_budget, strategy="AVALANCHE", max_months=120, quick_win=None):
     """
     debts: list ของ dict
       [
@@ -13,101 +100,292 @@ def calculate_debt_plan(debts, monthly_budget, strategy="AVALANCHE", max_months=
         ...
       ]
     monthly_budget: Decimal
-    strategy: "AVALANCHE" หรือ "SNOWBALL"
+    strategy: "AVALANCHE", "SNOWBALL" หรือ "HYBRID"
+      HYBRID = ใบที่ยอดไม่เกิน quick_win ปิดก่อน (ยอดเล็กก่อน) ที่เหลือไล่ดอกสูงก่อน
+      quick_win ไม่ระบุ = งบต่อเดือน (ใบที่ปิดได้ในเดือนเดียว)
     return: list ของเดือน
+
+    ผลลัพธ์เท่ากับการจำลองทีละเดือนแบบเดิมทุกหลัก แต่
+    - คิดเฉพาะหนี้ที่ยังไม่ปิด และเรียงลำดับใหม่เฉพาะตอนมีหนี้ปิด (AVALANCHE)
+    - ช่วงที่ไม่มีหนี้ใบไหนปิด (จ่ายเท่าเดิมทุกเดือน) คำนวณจำนวนเดือนล่วงหน้าด้วยสูตรปิด
+      แล้วเดินช่วงนั้นแบบไม่ต้องตัดสินใจใหม่ทุกเดือน
+    รองรับหนี้หลายร้อยใบ / max_months หลายร้อยเดือนได้
     """
-    # copy ข้อมูลก่อน กัน side effect
-    items = []
-    for d in debts:
-        items.append({
-            "name": d["name"],
-            "interest_rate": Decimal(d["interest_rate"]),
-            "min_payment": Decimal(d["min_payment"]),
-            "balance": Decimal(d["balance"]),
-        })
+    state = _DebtArrays(debts)
+    names, rates, mins, bal, growth = (
+        state.names, state.rates, state.mins, state.balances, state.growth,
+    )
+    n = len(names)
 
-    plan = []
+    # SNOWBALL / HYBRID ลำดับขึ้นกับยอดคงเหลือ ต้องดูใหม่ทุกเดือน
+    if strategy == "SNOWBALL":
+        def order_key(balance, i):
+            return balance
+    elif strategy == "HYBRID":
+        threshold = Decimal(monthly_budget if quick_win is None else quick_win)
 
+        def order_key(balance, i):
+            return (0, balance) if balance <= threshold else (1, -rates[i])
+    else:
+        order_key = None
+
+    open_idx = [i for i in range(n) if bal[i] > 0]
+    # AVALANCHE: ดอกเบี้ยไม่เปลี่ยน ลำดับจึงคงที่ ตัดใบที่ปิดออกเมื่อมีหนี้ปิดเท่านั้น
+    by_rate = sorted(range(n), key=rates.__getitem__, reverse=True)
+    avalanche_open = [i for i in by_rate if bal[i] > 0]
+
+    plan = []
     month = 0
-    while month < max_months and any(i["balance"] > 0 for i in items):
+    clamp_negative = True  # เดือนแรกยอดติดลบ (ไม่ใช่หนี้) จะถูกปัดเป็น 0 เหมือนแบบเดิม
+
+    def details(pay_min, extra):
+        return [
+            {"name": names[i], "pay_min": pay_min[i], "extra": extra[i]}
+            for i in range(n)
+        ]
+
+    while month < max_months and open_idx:
         month += 1
 
-        # 1) คิดดอกเบี้ยรายเดือน (สมมติ interest_rate เป็น % ต่อปี)
-        for i in items:
-            if i["balance"] <= 0:
-                continue
-            monthly_rate = (i["interest_rate"] / Decimal("100")) / Decimal("12")
-            i["balance"] = i["balance"] * (Decimal("1") + monthly_rate)
+        # 1) คิดดอกเบี้ยรายเดือน
+        for i in open_idx:
+            bal[i] = bal[i] * growth[i]
 
         # 2) จ่ายขั้นต่ำทุกใบ
-        payments = []
-        total_min = Decimal("0")
-        for i in items:
-            if i["balance"] <= 0:
-                pay_min = Decimal("0")
-            else:
-                pay_min = min(i["min_payment"], i["balance"])
-            payments.append({
-                "name": i["name"],
-                "pay_min": pay_min,
-                "extra": Decimal("0"),
-            })
-            total_min += pay_min
+        pay_min = [ZERO] * n
+        total_min = ZERO
+        for i in open_idx:
+            pay_min[i] = min(mins[i], bal[i])
+            total_min += pay_min[i]
 
         if monthly_budget < total_min:
-            # งบไม่พอจ่ายขั้นต่ำ -> แจ้งเตือนให้รู้ใน plan
             plan.append({
                 "month": month,
                 "warning": "งบไม่พอจ่ายขั้นต่ำทุกใบ",
-                "details": payments,
+                "details": details(pay_min, [ZERO] * n),
                 "total_payment": monthly_budget,
-                "total_balance": sum(i["balance"] for i in items),
+                "total_balance": sum(bal),
             })
             break
 
+        # 3-4) ยิง extra ไปใบที่ควรจัดการก่อน
         extra = monthly_budget - total_min
-
-        # 3) เรียงลำดับหนี้ตาม strategy
-        if strategy == "SNOWBALL":
-            ordered = sorted(
-                range(len(items)),
-                key=lambda idx: items[idx]["balance"],
-            )
-        else:  # AVA
-            ordered = sorted(
-                range(len(items)),
-                key=lambda idx: items[idx]["interest_rate"],
-                reverse=True,
-            )
-
-        # 4) ยิง extra ไปใบที่ควรจัดการก่อน
-        for idx in ordered:
+        extra_pay = [ZERO] * n
+        targets = []
+        order = _dynamic_order(open_idx, bal, order_key) if order_key else avalanche_open
+        for idx in order:
             if extra <= 0:
                 break
-            i = items[idx]
-            if i["balance"] <= 0:
-                continue
-
-            # หนี้คงเหลือหลังจ่ายขั้นต่ำ
-            p = payments[idx]
-            remaining_after_min = i["balance"] - p["pay_min"]
+            remaining_after_min = bal[idx] - pay_min[idx]
             if remaining_after_min <= 0:
                 continue
-
             pay_extra = min(extra, remaining_after_min)
-            p["extra"] = pay_extra
+            extra_pay[idx] = pay_extra
             extra -= pay_extra
+            targets.append(idx)
 
         # 5) หักยอดหนี้จริง
-        for idx, i in enumerate(items):
-            total_pay = payments[idx]["pay_min"] + payments[idx]["extra"]
-            i["balance"] = max(i["balance"] - total_pay, Decimal("0"))
+        closed = False
+        for i in open_idx:
+            bal[i] = max(bal[i] - (pay_min[i] + extra_pay[i]), ZERO)
+            if bal[i] <= 0:
+                closed = True
+        if clamp_negative:
+            for i in range(n):
+                if bal[i] < 0:
+                    bal[i] = ZERO
+            clamp_negative = False
 
         plan.append({
             "month": month,
-            "details": payments,
+            "details": details(pay_min, extra_pay),
             "total_payment": monthly_budget,
-            "total_balance": sum(i["balance"] for i in items),
+            "total_balance": sum((bal[i] for i in open_idx), ZERO),
         })
 
+        if closed:
+            open_idx = [i for i in open_idx if bal[i] > 0]
+            avalanche_open = [i for i in avalanche_open if bal[i] > 0]
+            continue
+
+        # ===== fast path =====
+        # เดือนนี้ไม่มีหนี้ปิด ทุกใบจ่ายขั้นต่ำเต็ม และ extra ลงใบเดียวหมด
+        # -> เดือนถัด ๆ ไปจะจ่ายเท่าเดิมจนกว่าจะมีหนี้ใบใดใกล้ปิด
+        if len(targets) > 1 or extra > 0 or any(pay_min[i] != mins[i] for i in open_idx):
+            continue
+        target = targets[0] if targets else None
+        payments = {i: pay_min[i] + extra_pay[i] for i in open_idx}
+
+        span = max_months - month
+        for i in open_idx:
+            steady = _steady_months(bal[i], growth[i], payments[i])
+            if steady is not None:
+                span = min(span, steady)
+        if span <= 0:
+            continue
+
+        month_details = details(pay_min, extra_pay)
+        for _ in range(span):
+            grown = {i: bal[i] * growth[i] for i in open_idx}
+            if order_key and target is not None and target != min(
+                open_idx, key=lambda i: order_key(grown[i], i)
+            ):
+                break  # ลำดับเปลี่ยน กลับไปคิดแบบเต็ม (ยังไม่แตะยอดของเดือนนี้)
+            month += 1
+            for i in open_idx:
+                bal[i] = max(grown[i] - payments[i], ZERO)
+            plan.append({
+                "month": month,
+                "details": [dict(d) for d in month_details],
+                "total_payment": monthly_budget,
+                "total_balance": sum((bal[i] for i in open_idx), ZERO),
+            })
+
     return plan
+
+
+# =========================
+#   Scenario sweep (งบ x strategy)
+# =========================
+
+def debt_snapshot(debts):
+    """
+    แปลง list ของหนี้เป็น tuple ที่ hash ได้ ใช้สร้าง key ของ cache
+    (ลำดับหนี้มีผลกับผลลัพธ์ตอนยอด/ดอกเท่ากัน จึงคงลำดับเดิมไว้)
+    """
+    return tuple(
+        (d["name"], Decimal(d["balance"]), Decimal(d["interest_rate"]), Decimal(d["min_payment"]))
+        for d in debts
+    )
+
+
+def summarize_debt_plan(debts, plan):
+    """
+    สรุปผลแผน: จำนวนเดือน, ปิดหนี้หมดไหม, จ่ายรวม, ดอกเบี้ยรวม
+    ดอกเบี้ยรวม = จ่ายรวม + หนี้ที่เหลือ - หนี้ตั้งต้น
+    """
+    start_total = sum((Decimal(d["balance"]) for d in debts if Decimal(d["balance"]) > 0), ZERO)
+    total_paid = ZERO
+    months = 0
+    warning = None
+    for entry in plan:
+        if "warning" in entry:
+            warning = entry["warning"]
+            break
+        months = entry["month"]
+        for d in entry["details"]:
+            total_paid += d["pay_min"] + d["extra"]
+
+    end_total = plan[-1]["total_balance"] if plan else start_total
+    cent = Decimal("0.01")
+    return {
+        "months": months,
+        "paid_off": warning is None and end_total <= 0,
+        "warning": warning,
+        "total_paid": total_paid.quantize(cent),
+        "total_interest": (total_paid + end_total - start_total).quantize(cent),
+        "end_balance": Decimal(end_total).quantize(cent),
+    }
+
+
+def _simulate_cell(args):
+    """รัน 1 ช่องของ grid (ต้องอยู่ระดับ module ให้ process pool pickle ได้)"""
+    snapshot, budget, strategy, max_months, quick_win = args
+    debts = [
+        {"name": name, "balance": balance, "interest_rate": rate, "min_payment": min_payment}
+        for name, balance, rate, min_payment in snapshot
+    ]
+    plan = calculate_debt_plan(debts, budget, strategy, max_months, quick_win=quick_win)
+    return summarize_debt_plan(debts, plan)
+
+
+_executor = None
+
+
+def _plan_cache():
+    """
+    cache ที่เก็บผลจำลอง เลือก backend ได้จาก settings.DEBT_PLAN_CACHE (ชื่อ alias ใน CACHES)
+    ไม่ได้ตั้งไว้ / alias ไม่มีอยู่จริง ใช้ cache "default"
+    """
+    alias = getattr(settings, "DEBT_PLAN_CACHE", "default")
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def debt_plan_key(snapshot, budget, strategy, max_months, quick_win):
+    """
+    key ของผลจำลอง 1 ช่อง = hash ของข้อมูลทุกอย่างที่มีผลกับผลลัพธ์
+    (ยอดหนี้, ดอกเบี้ย, ขั้นต่ำ, งบ, strategy, ...) ข้อมูลเปลี่ยน key ก็เปลี่ยนเอง
+    ไม่ต้องไล่ลบ cache ส่วนของเก่าที่ไม่มีใครใช้แล้วจะหลุดออกไปตาม LRU / TIMEOUT
+    """
+    raw = repr((
+        snapshot,
+        Decimal(budget).quantize(Decimal("0.01")),
+        strategy,
+        max_months,
+        None if quick_win is None else Decimal(quick_win).quantize(Decimal("0.01")),
+    ))
+    return "debtplan:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=min(SWEEP_MAX_WORKERS, os.cpu_count() or 1))
+    return _executor
+
+
+def _run_cells(cells, parallel):
+    if parallel and len(cells) >= SWEEP_PARALLEL_MIN_CELLS and (os.cpu_count() or 1) > 1:
+        global _executor
+        try:
+            return list(_get_executor().map(_simulate_cell, cells, chunksize=4))
+        except (BrokenProcessPool, OSError):
+            # pool ใช้ไม่ได้ (เช่น worker ตาย) ทิ้งแล้วคิดใน process นี้แทน
+            _executor = None
+    return [_simulate_cell(cell) for cell in cells]
+
+
+def sweep_debt_plans(debts, budgets, strategies=DEBT_STRATEGIES, max_months=360,
+                     quick_win=None, parallel=True):
+    """
+    จำลองแผนปลดหนี้ทุกช่องของ grid งบต่อเดือน x strategy ในครั้งเดียว
+    - ผลแต่ละช่องเก็บใน cache ตาม hash ของ (snapshot หนี้, งบ, strategy, ...)
+      เลื่อนงบไปมา / เปิดหน้าเดิมซ้ำ ช่องที่เคยคิดแล้วไม่ต้องจำลองใหม่
+    - ช่องที่ยังไม่เคยคิด ถ้ามีเยอะจะแจกให้ process pool คิดพร้อมกัน
+
+    return: {
+      "surface": {strategy: [สรุปของแต่ละงบ เรียงตาม budgets]},
+      "computed": จำนวนช่องที่จำลองใหม่, "cached": จำนวนช่องที่ได้จาก cache,
+    }
+    """
+    snapshot = debt_snapshot(debts)
+    quick_win = None if quick_win is None else Decimal(quick_win)
+
+    cells = [
+        (snapshot, Decimal(budget), strategy, max_months, quick_win)
+        for strategy in strategies
+        for budget in budgets
+    ]
+    keys = [debt_plan_key(*cell) for cell in cells]
+
+    cache = _plan_cache()
+    results = cache.get_many(keys, version=DEBT_PLAN_CACHE_VERSION)
+    missing = [(key, cell) for key, cell in zip(keys, cells) if key not in results]
+
+    if missing:
+        computed = _run_cells([cell for _, cell in missing], parallel)
+        fresh = {key: value for (key, _), value in zip(missing, computed)}
+        cache.set_many(fresh, version=DEBT_PLAN_CACHE_VERSION)
+        results.update(fresh)
+
+    surface = {strategy: [] for strategy in strategies}
+    for key, cell in zip(keys, cells):
+        surface[cell[2]].append(results[key])
+    return {
+        "surface": surface,
+        "computed": len(missing),
+        "cached": len(keys) - len(missing),
+    }
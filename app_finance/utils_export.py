@@ -0,0 +1,231 @@
+import csv
+import json
+import zlib
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import (
+    Account,
+    Category,
+    CategoryBudget,
+    Goal,
+    RecurringTransaction,
+    Tag,
+    Transaction,
+    TransactionTemplate,
+)
+
+
+# จำนวนแถวที่ดึงจากฐานข้อมูลต่อรอบเวลา export แบบ stream
+# (ไม่เกิน 999 เพราะ id ของ chunk ถูกส่งเป็นพารามิเตอร์ตอนดึง tag บน SQLite รุ่นเก่า)
+EXPORT_CHUNK_SIZE = 500
+
+
+class Echo:
+    """file-like object ที่ write() แล้วคืนค่ากลับเลย ใช้คู่กับ csv.writer + StreamingHttpResponse"""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(iterable, size):
+    """แบ่ง iterable เป็นก้อนละ size รายการ (ไม่โหลดทั้งหมดเข้า memory)"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_transactions_csv(
+    qs,
+    include_tags=False,
+    include_goal=False,
+    include_recurring=False,
+    chunk_size=EXPORT_CHUNK_SIZE,
+):
+    """
+    สร้าง CSV ของรายการทีละบรรทัด (generator) สำหรับ StreamingHttpResponse
+    - ดึงด้วย values_list().iterator() ไม่สร้าง model instance
+    - tag ดึงเพิ่มทีละ chunk ด้วย query เดียวต่อ chunk
+    """
+    writer = csv.writer(Echo())
+
+    header = [
+        "วันที่",
+        "บัญชี",
+        "ประเภท",
+        "จำนวนเงิน",
+        "หมวดหมู่",
+        "ประมาณการ/จริง",
+        "หมายเหตุ",
+    ]
+    fields = [
+        "id",
+        "date",
+        "account__name",
+        "direction",
+        "amount",
+        "category__name",
+        "is_estimate",
+        "note",
+    ]
+    if include_tags:
+        header.append("Tag")
+    if include_goal:
+        header.append("เป้าหมาย")
+        fields.append("goal__name")
+    if include_recurring:
+        header.append("รายการประจำ")
+        fields.extend(["source_recurring_id", "source_recurring__name"])
+
+    # BOM ให้ Excel อ่านภาษาไทยถูก (ใส่ครั้งเดียวต้นไฟล์)
+    yield "\ufeff" + writer.writerow(header)
+
+    rows = qs.values_list(*fields).iterator(chunk_size=chunk_size)
+    for chunk in iter_chunks(rows, chunk_size):
+        tag_map = {}
+        if include_tags:
+            tag_rows = (
+                Transaction.tags.through.objects
+                .filter(transaction_id__in=[row[0] for row in chunk])
+                .values_list("transaction_id", "tag__name")
+                .order_by("tag__name")
+            )
+            for tx_id, tag_name in tag_rows:
+                tag_map.setdefault(tx_id, []).append(tag_name)
+
+        lines = []
+        for row in chunk:
+            tx_id, tx_date, account_name, direction, amount, category_name, is_estimate, note = row[:8]
+            line = [
+                tx_date.strftime("%Y-%m-%d"),
+                account_name or "",
+                "รายรับ" if direction == "IN" else "รายจ่าย",
+                f"{amount:.2f}",
+                category_name or "",
+                "ประมาณการ" if is_estimate else "จริง",
+                (note or "").replace("\n", " "),
+            ]
+            extra = row[8:]
+            if include_tags:
+                line.append(", ".join(tag_map.get(tx_id, [])))
+            if include_goal:
+                line.append(extra[0] or "")
+                extra = extra[1:]
+            if include_recurring:
+                recurring_id, recurring_name = extra
+                if recurring_id:
+                    line.append(recurring_name or f"รายการประจำ #{recurring_id}")
+                else:
+                    line.append("")
+            lines.append(writer.writerow(line))
+
+        yield "".join(lines)
+
+
+# =========================
+#   Full backup (JSON / NDJSON)
+# =========================
+
+def backup_tables(user):
+    """
+    ตารางที่อยู่ในไฟล์สำรองข้อมูล เรียงตามลำดับที่ต้อง restore
+    return: list ของ (ชื่อ key ในไฟล์, queryset.values())
+    M2M ดึงผ่าน owner ของฝั่ง model หลักตรง ๆ ไม่ต้องรวบรวม id ก่อน
+    """
+    return [
+        ("accounts", Account.objects.filter(owner=user).order_by("id").values()),
+        ("categories", Category.objects.order_by("id").values()),  # ของกลาง
+        ("tags", Tag.objects.filter(owner=user).order_by("id").values()),
+        ("goals", Goal.objects.filter(owner=user).order_by("id").values()),
+        ("category_budgets", CategoryBudget.objects.filter(owner=user).order_by("id").values()),
+        (
+            "recurring_transactions",
+            RecurringTransaction.objects.filter(owner=user).order_by("id").values(),
+        ),
+        (
+            "transaction_templates",
+            TransactionTemplate.objects.filter(owner=user).order_by("id").values(),
+        ),
+        ("transactions", Transaction.objects.filter(owner=user).order_by("id").values()),
+        (
+            "transaction_tags",
+            Transaction.tags.through.objects
+            .filter(transaction__owner=user)
+            .order_by("id")
+            .values(),
+        ),
+        (
+            "transaction_template_tags",
+            TransactionTemplate.tags.through.objects
+            .filter(transactiontemplate__owner=user)
+            .order_by("id")
+            .values(),
+        ),
+    ]
+
+
+def _dumps(value, **kwargs):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False, **kwargs)
+
+
+def iter_backup_json(user, generated_at, compact=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    เขียนไฟล์สำรองข้อมูลเป็น JSON ก้อนเดียว (โครงสร้างเดียวกับแบบเดิม) ทีละตาราง ทีละ chunk
+    compact=False จะจัดย่อหน้า 2 ช่องเหมือนไฟล์เดิม
+    """
+    if compact:
+        item_sep, open_list, close_list, key_sep = ",", "[", "]", ":"
+
+        def dump_row(row):
+            return _dumps(row, separators=(",", ":"))
+    else:
+        item_sep, open_list, close_list, key_sep = ",\n    ", "[\n    ", "\n  ]", ": "
+
+        def dump_row(row):
+            return _dumps(row, indent=2).replace("\n", "\n    ")
+
+    field_sep = "," if compact else ",\n  "
+    yield ("{" if compact else "{\n  ") + field_sep.join([
+        _dumps("generated_at") + key_sep + _dumps(generated_at),
+        _dumps("user") + key_sep + _dumps(user.username),
+    ])
+
+    for key, qs in backup_tables(user):
+        yield field_sep + _dumps(key) + key_sep
+        first = True
+        for chunk in iter_chunks(qs.iterator(chunk_size=chunk_size), chunk_size):
+            body = item_sep.join(dump_row(row) for row in chunk)
+            yield (open_list if first else item_sep) + body
+            first = False
+        yield "[]" if first else close_list
+
+    yield "}" if compact else "\n}"
+
+
+def iter_backup_ndjson(user, generated_at, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    เขียนไฟล์สำรองข้อมูลแบบ NDJSON: 1 บรรทัด = 1 แถว {"table": ..., "row": {...}}
+    บรรทัดแรกเป็น meta {"table": "_meta", "row": {"generated_at": ..., "user": ...}}
+    """
+    yield _dumps({
+        "table": "_meta",
+        "row": {"generated_at": generated_at, "user": user.username},
+    }) + "\n"
+
+    for key, qs in backup_tables(user):
+        for chunk in iter_chunks(qs.iterator(chunk_size=chunk_size), chunk_size):
+            yield "".join(_dumps({"table": key, "row": row}) + "\n" for row in chunk)
+
+
+def gzip_stream(chunks, encoding="utf-8"):
+    """บีบอัด stream ของ str เป็น gzip ทีละ chunk"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode(encoding))
+        if data:
+            yield data
+    yield compressor.flush()
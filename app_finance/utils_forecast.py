@@ -0,0 +1,196 @@
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db.models import Count, Q, Sum
+
+from .models import Account, Transaction
+from .utils_recurring import active_rules, iter_months
+from .utils_rollup import add_months, month_range
+
+# ช่วงเวลาที่เลือกพยากรณ์ได้ (จำนวนเดือน)
+FORECAST_HORIZONS = (3, 12, 36)
+FORECAST_DEFAULT_MONTHS = 3
+
+
+def _to_satang(amount):
+    return int((Decimal(amount or 0) * 100).to_integral_value())
+
+
+def _from_satang(value):
+    return Decimal(value).scaleb(-2)
+
+
+def forecast_end(today, months):
+    """วันสุดท้ายของการพยากรณ์ = สิ้นเดือนที่ months นับจากเดือนนี้ (เดือนนี้ = เดือนที่ 0)"""
+    return month_range(*add_months(today.year, today.month, months + 1))[0] - timedelta(days=1)
+
+
+def build_forecast(user, today, months=FORECAST_DEFAULT_MONTHS):
+    """
+    พยากรณ์ยอดคงเหลือรายวันของแต่ละบัญชี ตั้งแต่พรุ่งนี้ถึงสิ้นเดือนที่ months
+    ใช้ 4 query ไม่ว่าจะพยากรณ์กี่วัน / มีกี่ rule:
+      - บัญชีของ user (ยอดปัจจุบันจาก ledger_balance)
+      - รายการหลังวันนี้ + รายการประมาณการ GROUP BY (บัญชี, วัน, ประเภท, ประมาณการ)
+      - รายการประจำที่ active ในช่วงนั้น + ที่สร้างเป็น Transaction ไปแล้ว (กันนับซ้ำ)
+    แล้วคำนวณใน memory เป็นเลขจำนวนเต็ม (สตางค์) ต่อบัญชี:
+    กระจายยอดลงช่อง "วันที่ i" ของ list ก่อน แล้วสะสมทีเดียวด้วย accumulate
+
+    ยอดตั้งต้น = ยอดยกมา + รายการจริงถึงวันนี้ (ไม่รวมประมาณการ)
+    หลังวันนี้บวกรายการที่ลงวันที่ล่วงหน้า ประมาณการ และรายการประจำที่ยังไม่ได้สร้าง
+    ประมาณการที่ลงวันที่ไม่เกินวันนี้ (ค้างอยู่) นับเข้าวันแรกของการพยากรณ์
+    (day_of_month 29-31 ปัดเป็นวันสุดท้ายของเดือนสั้น / เคารพ start_date, end_date)
+
+    return: dict {
+      "today", "end", "months", "dates",
+      "accounts": list ของ {"account", "start", "end", "low", "low_date", "balances"},
+      "total": {"start", "end", "low", "low_date", "balances"},
+      "first_negative": วันแรกที่ยอดรวมติดลบ (None = ไม่ติดลบ),
+      "events": จำนวนรายการที่คาดว่าจะเกิด,
+    }
+    """
+    start = today + timedelta(days=1)
+    end = forecast_end(today, months)
+    days = (end - start).days + 1
+    dates = [start + timedelta(days=i) for i in range(days)]
+
+    accounts = list(
+        Account.objects.filter(owner=user, is_active=True).order_by("account_type", "name")
+    )
+    index = {acc.pk: i for i, acc in enumerate(accounts)}
+    opening = [_to_satang(acc.current_balance) for acc in accounts]
+    deltas = [[0] * days for _ in accounts]
+    events = 0
+
+    # ledger_balance รวมทุกรายการ ต้องหักของที่ยังไม่ถึงวัน / ประมาณการออกก่อน
+    rows = (
+        Transaction.objects
+        .filter(owner=user, account__in=list(index))
+        .filter(Q(date__gt=today) | Q(is_estimate=True))
+        .values("account_id", "date", "direction", "is_estimate")
+        .annotate(total=Sum("amount"), tx_count=Count("id"))
+        .order_by()
+    )
+    for row in rows:
+        i = index[row["account_id"]]
+        amount = _to_satang(row["total"])
+        if row["direction"] != "IN":
+            amount = -amount
+        opening[i] -= amount
+
+        offset = (row["date"] - start).days
+        if offset < 0:
+            # ประมาณการที่เลยวันมาแล้วแต่ยังไม่ได้เปลี่ยนเป็นรายการจริง ยังต้องจ่าย/รับอยู่
+            # นับเข้าวันแรกของการพยากรณ์ แทนที่จะหายไปจากยอด
+            offset = 0
+        if offset < days:
+            deltas[i][offset] += amount
+            events += row["tx_count"]
+
+    first_month = (start.year, start.month)
+    last_month = (end.year, end.month)
+    rules = [
+        r for r in active_rules(first_month, last_month, owners=[user])
+        if r.account_id in index
+    ]
+    materialized = set(
+        (rule_id, (tx_date - start).days)
+        for rule_id, tx_date in (
+            Transaction.objects
+            .filter(owner=user, source_recurring__in=[r.pk for r in rules], date__gte=start)
+            .values_list("source_recurring_id", "date")
+        )
+    ) if rules else set()
+
+    # (offset ของวันที่ 1, จำนวนวัน) ของแต่ละเดือน คำนวณครั้งเดียวใช้กับทุก rule
+    slots = []
+    for year, month in iter_months(first_month, last_month):
+        month_start, next_month = month_range(year, month)
+        slots.append(((month_start - start).days, (next_month - month_start).days))
+
+    for r in rules:
+        rule_id = r.pk
+        row = deltas[index[r.account_id]]
+        amount = _to_satang(r.amount)
+        if r.direction != "IN":
+            amount = -amount
+        # ช่วงที่ rule มีผล เป็น offset จาก start (ตรงกับ occurrence_date)
+        low = max((r.start_date - start).days, 0) if r.start_date else 0
+        high = min((r.end_date - start).days, days - 1) if r.end_date else days - 1
+        for month_offset, month_days in slots:
+            offset = month_offset + min(r.day_of_month, month_days) - 1
+            if low <= offset <= high and (rule_id, offset) not in materialized:
+                row[offset] += amount
+                events += 1
+
+    account_series = []
+    total = [0] * days
+    for acc, base, row in zip(accounts, opening, deltas):
+        balances = list(accumulate(row, initial=base))[1:]
+        total = [a + b for a, b in zip(total, balances)]
+        account_series.append({"account": acc, **_series(base, balances, dates)})
+
+    total_series = _series(sum(opening), total, dates)
+    first_negative = next((d for d, v in zip(dates, total) if v < 0), None)
+
+    return {
+        "today": today,
+        "end": end,
+        "months": months,
+        "dates": dates,
+        "accounts": account_series,
+        "total": total_series,
+        "first_negative": first_negative,
+        "events": events,
+    }
+
+
+def _series(base, balances, dates):
+    """สรุปเส้นยอดคงเหลือ 1 เส้น (หน่วยสตางค์ -> Decimal บาท)"""
+    if balances:
+        low = min(balances)
+        low_date = dates[balances.index(low)]
+        end = balances[-1]
+    else:
+        low, low_date, end = base, None, base
+    return {
+        "start": _from_satang(base),
+        "end": _from_satang(end),
+        "low": _from_satang(low),
+        "low_date": low_date,
+        "balances": [_from_satang(v) for v in balances],
+    }
+
+
+def forecast_as_json(forecast):
+    """แปลงผลพยากรณ์เป็น dict ที่ส่งเป็น JSON ได้ (ยอดเงินเป็น string กันทศนิยมเพี้ยน)"""
+
+    def series(s):
+        return {
+            "start": str(s["start"]),
+            "end": str(s["end"]),
+            "low": str(s["low"]),
+            "low_date": s["low_date"].isoformat() if s["low_date"] else None,
+            "balances": [str(v) for v in s["balances"]],
+        }
+
+    return {
+        "today": forecast["today"].isoformat(),
+        "end": forecast["end"].isoformat(),
+        "months": forecast["months"],
+        "dates": [d.isoformat() for d in forecast["dates"]],
+        "accounts": [
+            {
+                "id": s["account"].pk,
+                "name": s["account"].name,
+                "account_type": s["account"].account_type,
+                **series(s),
+            }
+            for s in forecast["accounts"]
+        ],
+        "total": series(forecast["total"]),
+        "first_negative": (
+            forecast["first_negative"].isoformat() if forecast["first_negative"] else None
+        ),
+        "events": forecast["events"],
+    }
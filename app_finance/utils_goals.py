@@ -0,0 +1,154 @@
+from datetime import timedelta
+from decimal import Decimal
+from math import ceil
+
+from django.db.models import Count, F, Min, Q, Sum
+
+from .models import Goal, Transaction
+from .utils_ledger import CENT
+
+# ความเร็วการเก็บเงินคิดจากรายการย้อนหลังกี่วัน (ใช้คาดการณ์วันถึงเป้า)
+GOAL_VELOCITY_DAYS = 90
+
+
+def apply_goal_change(old, new):
+    """
+    อัปเดต Goal.done_amount ตามการเปลี่ยนแปลงของ Transaction 1 รายการ
+    old / new: dict ที่มี key goal_id, direction, amount, is_estimate (หรือ None)
+    นับเฉพาะรายการจริงที่ทิศทางตรงกับเป้า (เช็ค direction ใน UPDATE เลย ไม่ต้องอ่าน Goal ก่อน)
+    """
+    deltas = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if not state or not state["goal_id"] or state["is_estimate"]:
+            continue
+        key = (state["goal_id"], state["direction"])
+        deltas[key] = deltas.get(key, Decimal("0")) + sign * Decimal(state["amount"] or 0)
+
+    for (goal_id, direction), delta in deltas.items():
+        if not delta:
+            continue
+        Goal.objects.filter(pk=goal_id, direction=direction).update(
+            done_amount=F("done_amount") + delta
+        )
+
+
+def compute_goal_totals(goals):
+    """
+    ยอดสะสมจริงของแต่ละเป้าด้วย GROUP BY (goal_id, direction) เดียว
+    goals: queryset ของ Goal
+    return: {goal_id: Decimal} (เฉพาะเป้าที่มีรายการ)
+    """
+    directions = dict(goals.values_list("pk", "direction"))
+    rows = (
+        Transaction.objects
+        .filter(goal__in=goals, is_estimate=False)
+        .values("goal_id", "direction")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    return {
+        row["goal_id"]: (row["total"] or Decimal("0")).quantize(CENT)
+        for row in rows
+        if directions.get(row["goal_id"]) == row["direction"]
+    }
+
+
+def rebuild_goal_progress(goals, fix=True):
+    """
+    เทียบ done_amount ที่เก็บไว้กับยอดจริง (เหมือน rebuild_account_balances)
+    return: list ของ (goal, ยอดที่เก็บไว้, ยอดจริง) เฉพาะเป้าที่ไม่ตรงกัน
+    """
+    actual = compute_goal_totals(goals)
+
+    mismatches = []
+    for goal in goals.only("id", "name", "done_amount"):
+        expected = actual.get(goal.pk, Decimal("0"))
+        if goal.done_amount != expected:
+            mismatches.append((goal, goal.done_amount, expected))
+            goal.done_amount = expected
+
+    if fix and mismatches:
+        Goal.objects.bulk_update([m[0] for m in mismatches], ["done_amount"])
+
+    return mismatches
+
+
+def goal_progress(user, goals, today, since=None, until=None):
+    """
+    ความคืบหน้าของหลายเป้าพร้อมกันด้วย query เดียว (ไม่ขึ้นกับจำนวนเป้า)
+    since / until: จำกัดช่วงวันที่ [since, until) เช่น เฉพาะเดือนของรายงาน (None = ทั้งหมด)
+
+    return: {goal_id: {"done", "count", "recent", "first_date"}} เฉพาะเป้าที่มีรายการ
+      recent = ยอดในช่วง GOAL_VELOCITY_DAYS วันล่าสุด (ใช้คิดความเร็ว)
+    """
+    goals = list(goals)
+    if not goals:
+        return {}
+    directions = {g.pk: g.direction for g in goals}
+
+    qs = Transaction.objects.filter(owner=user, goal__in=directions.keys(), is_estimate=False)
+    if since:
+        qs = qs.filter(date__gte=since)
+    if until:
+        qs = qs.filter(date__lt=until)
+
+    window_start = today - timedelta(days=GOAL_VELOCITY_DAYS)
+    rows = (
+        qs.values("goal_id", "direction")
+        .annotate(
+            total=Sum("amount"),
+            count=Count("id"),
+            recent=Sum("amount", filter=Q(date__gt=window_start, date__lte=today)),
+            first_date=Min("date"),
+        )
+        .order_by()
+    )
+
+    progress = {}
+    for row in rows:
+        if directions.get(row["goal_id"]) != row["direction"]:
+            continue
+        progress[row["goal_id"]] = {
+            "done": (row["total"] or Decimal("0")).quantize(CENT),
+            "count": row["count"],
+            "recent": (row["recent"] or Decimal("0")).quantize(CENT),
+            "first_date": row["first_date"],
+        }
+    return progress
+
+
+def project_goal(goal, done, progress, today):
+    """
+    คาดการณ์วันถึงเป้าจากความเร็วการเก็บเงินช่วงหลัง
+    progress: ค่าจาก goal_progress() ของเป้านี้ (หรือ None ถ้ายังไม่มีรายการ)
+
+    return: dict {
+      "per_month": ยอดเฉลี่ยต่อเดือน (None = ยังไม่มีรายการช่วงหลัง),
+      "projected_date": วันที่คาดว่าจะถึงเป้า (None = ถึงแล้ว / คาดไม่ได้),
+      "on_track": ทันวันเป้าไหม (None = ไม่ได้ตั้งวันเป้า / คาดไม่ได้),
+      "reached": ถึงเป้าแล้ว,
+    }
+    """
+    target = goal.target_amount or Decimal("0")
+    remaining = target - done
+    result = {"per_month": None, "projected_date": None, "on_track": None, "reached": False}
+
+    if target > 0 and remaining <= 0:
+        result["reached"] = True
+        result["on_track"] = True
+        return result
+    if not progress or progress["recent"] <= 0:
+        return result
+
+    # ช่วงที่ใช้คิดความเร็ว: GOAL_VELOCITY_DAYS วัน หรือตั้งแต่รายการแรก (ถ้าเพิ่งเริ่ม)
+    days = GOAL_VELOCITY_DAYS
+    if progress["first_date"]:
+        days = min(days, max((today - progress["first_date"]).days + 1, 1))
+    per_day = progress["recent"] / days
+
+    result["per_month"] = (per_day * 30).quantize(CENT)
+    if target > 0:
+        result["projected_date"] = today + timedelta(days=ceil(remaining / per_day))
+        if goal.target_date:
+            result["on_track"] = result["projected_date"] <= goal.target_date
+    return result
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from .models import Account, Transaction
+
+# SQLite รวม Decimal เป็น float ต้องปัดกลับเป็นสตางค์ก่อนเทียบ
+CENT = Decimal("0.01")
+
+
+def signed_amount(direction, amount):
+    """แปลง amount (เก็บเป็นบวกเสมอ) ให้เป็นยอดมีเครื่องหมาย: IN = +, OUT = -"""
+    amount = Decimal(amount or 0)
+    return amount if direction == "IN" else -amount
+
+
+def apply_transaction_change(old, new):
+    """
+    อัปเดต Account.ledger_balance ตามการเปลี่ยนแปลงของ Transaction 1 รายการ
+
+    old / new: dict ที่มี key account_id, direction, amount (หรือ None)
+      - สร้างใหม่: old=None
+      - ลบ: new=None
+      - แก้ไข: มีทั้งคู่ (รองรับย้ายบัญชี / สลับ IN-OUT / แก้จำนวนเงิน)
+    ใช้ F() ให้ฐานข้อมูลบวกลบเอง กันปัญหาบันทึกพร้อมกันหลาย request
+    """
+    deltas = {}
+    if old:
+        deltas[old["account_id"]] = (
+            deltas.get(old["account_id"], Decimal("0"))
+            - signed_amount(old["direction"], old["amount"])
+        )
+    if new:
+        deltas[new["account_id"]] = (
+            deltas.get(new["account_id"], Decimal("0"))
+            + signed_amount(new["direction"], new["amount"])
+        )
+
+    for account_id, delta in deltas.items():
+        if not account_id or not delta:
+            continue
+        Account.objects.filter(pk=account_id).update(
+            ledger_balance=F("ledger_balance") + delta
+        )
+
+
+def compute_ledger_balances(accounts=None):
+    """
+    คำนวณยอดสุทธิจาก Transaction จริงด้วย GROUP BY เดียว
+    accounts: queryset ของ Account (None = ทุกบัญชี)
+    return: {account_id: Decimal}
+    """
+    qs = Transaction.objects.all()
+    if accounts is not None:
+        qs = qs.filter(account__in=accounts)
+
+    balances = {}
+    rows = qs.values("account_id", "direction").annotate(total=Sum("amount")).order_by()
+    for row in rows:
+        balances[row["account_id"]] = (
+            balances.get(row["account_id"], Decimal("0"))
+            + signed_amount(row["direction"], row["total"])
+        )
+    return {account_id: total.quantize(CENT) for account_id, total in balances.items()}
+
+
+def rebuild_account_balances(accounts, fix=True):
+    """
+    เทียบ ledger_balance ที่เก็บไว้กับยอดจริง
+    accounts: queryset ของ Account ที่ต้องการตรวจ
+    fix: ถ้า True จะเขียนยอดที่ถูกต้องทับให้เลย
+
+    return: list ของ (account, ยอดที่เก็บไว้, ยอดจริง) เฉพาะบัญชีที่ไม่ตรงกัน
+    """
+    actual = compute_ledger_balances(accounts)
+
+    mismatches = []
+    for acc in accounts.only("id", "name", "account_type", "ledger_balance"):
+        expected = actual.get(acc.pk, Decimal("0"))
+        if acc.ledger_balance != expected:
+            mismatches.append((acc, acc.ledger_balance, expected))
+            acc.ledger_balance = expected
+
+    if fix and mismatches:
+        Account.objects.bulk_update([m[0] for m in mismatches], ["ledger_balance"])
+
+    return mismatches
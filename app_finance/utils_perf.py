@@ -0,0 +1,175 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+# ขอบบนของแต่ละช่องใน histogram (ช่องสุดท้าย = มากกว่าช่องก่อนหน้า)
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (1, 3, 5, 10, 15, 25, 50, 100)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """view ใช้ query เกิน QUERY_BUDGETS (ยกขึ้นมาเมื่อ QUERY_BUDGET_STRICT = True เช่นตอนรัน test)"""
+
+
+# recorder ของ request ที่กำลังทำงานอยู่ (ContextVar ตามไปถึง thread ของ sync_to_async ด้วย)
+_current_recorder = ContextVar("query_recorder", default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper ที่ติดไว้ถาวรกับทุก connection (ทุก thread)
+    ส่งต่อให้ recorder ของ request ที่กำลังทำงานใน context นี้ ไม่มี = ยิง SQL ตามปกติ
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    """ติด _record_query ให้ connection (ผูกกับ signal connection_created / เรียกซ้ำได้)"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class QueryRecorder:
+    """
+    เก็บ SQL ที่ยิงระหว่าง request 1 ตัว (จำนวน / เวลารวม / ตัวที่ช้าที่สุด)
+    async view ยิง ORM ผ่าน sync_to_async ซึ่งใช้ connection ของอีก thread
+    จึงไม่ผูก wrapper กับ connection ของ thread ที่เรียก capture() แต่ตั้ง recorder ไว้ใน ContextVar
+    แล้วให้ _record_query ที่ติดอยู่กับทุก connection ส่งมาที่นี่
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sql_seconds = 0.0
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            # sync_to_async(thread_sensitive=False) อาจยิงพร้อมกันหลาย thread
+            with self._lock:
+                self.count += 1
+                self.sql_seconds += elapsed
+                self.queries.append((elapsed, sql))
+
+    @contextmanager
+    def capture(self):
+        # connection ที่เปิดไว้ก่อนผูก signal (เช่น ของ thread นี้) ติดให้ตรงนี้ด้วย
+        for alias in connections:
+            install_query_recorder(connections[alias])
+        token = _current_recorder.set(self)
+        try:
+            yield self
+        finally:
+            _current_recorder.reset(token)
+
+    def slowest(self, limit):
+        return [
+            {"ms": round(elapsed * 1000, 2), "sql": sql[:300]}
+            for elapsed, sql in heapq.nlargest(limit, self.queries, key=lambda q: q[0])
+        ]
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def _histogram(values, buckets):
+    counts = [0] * (len(buckets) + 1)
+    for v in values:
+        counts[bisect_left(buckets, v)] += 1
+    labels = [f"<={b}" for b in buckets] + [f">{buckets[-1]}"]
+    return dict(zip(labels, counts))
+
+
+class PerfStats:
+    """
+    สถิติต่อ view ใน memory ของ process (ไม่แชร์ข้าม process / หายตอน restart)
+    เก็บ request ล่าสุด window ตัวต่อ view แล้วคิด p50 / p95 / histogram จากช่วงนั้น
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, queries, sql_ms, total_ms, over_budget):
+        with self._lock:
+            entry = self._views.get(view_name)
+            if entry is None:
+                entry = self._views[view_name] = {
+                    "requests": 0,
+                    "over_budget": 0,
+                    "samples": deque(maxlen=self.window),
+                }
+            entry["requests"] += 1
+            entry["over_budget"] += bool(over_budget)
+            entry["samples"].append((queries, sql_ms, total_ms))
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self):
+        """dict ต่อ view พร้อมส่งเป็น JSON (เรียงตาม p95 ของเวลารวม มากไปน้อย)"""
+        with self._lock:
+            views = {
+                name: (entry["requests"], entry["over_budget"], list(entry["samples"]))
+                for name, entry in self._views.items()
+            }
+
+        budgets = query_budgets()
+        result = []
+        for name, (requests, over_budget, samples) in views.items():
+            queries = sorted(s[0] for s in samples)
+            sql_ms = sorted(s[1] for s in samples)
+            total_ms = sorted(s[2] for s in samples)
+            result.append({
+                "view": name,
+                "requests": requests,
+                "window": len(samples),
+                "budget": budgets.get(name),
+                "over_budget": over_budget,
+                "queries": {
+                    "p50": _percentile(queries, 50),
+                    "p95": _percentile(queries, 95),
+                    "max": queries[-1],
+                    "histogram": _histogram(queries, QUERY_BUCKETS),
+                },
+                "sql_ms": {
+                    "p50": round(_percentile(sql_ms, 50), 2),
+                    "p95": round(_percentile(sql_ms, 95), 2),
+                },
+                "total_ms": {
+                    "p50": round(_percentile(total_ms, 50), 2),
+                    "p95": round(_percentile(total_ms, 95), 2),
+                    "max": round(total_ms[-1], 2),
+                    "histogram": _histogram(total_ms, LATENCY_BUCKETS_MS),
+                },
+            })
+        result.sort(key=lambda v: v["total_ms"]["p95"], reverse=True)
+        return result
+
+
+perf_stats = PerfStats(window=getattr(settings, "PERF_STATS_WINDOW", 500))
+
+
+def query_budgets():
+    """{view_name: จำนวน query สูงสุด} จาก settings.QUERY_BUDGETS"""
+    return getattr(settings, "QUERY_BUDGETS", {})
@@ -0,0 +1,130 @@
+import calendar
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import Account, RecurringTransaction, Transaction
+from .utils_dashboard import bump_dashboard_version
+from .utils_ledger import rebuild_account_balances
+from .utils_rollup import add_months, month_range, rebuild_monthly_summaries
+from .utils_search import index_transactions
+
+
+RECURRING_BATCH_SIZE = 1000
+
+
+def occurrence_date(rule, year, month):
+    """
+    วันที่ที่รายการประจำเกิดในเดือนนั้น
+    - day_of_month เกินจำนวนวันของเดือน (29-31) ปัดลงเป็นวันสุดท้ายของเดือน
+    - อยู่นอกช่วง start_date / end_date ของ rule -> None
+    """
+    day = min(rule.day_of_month, calendar.monthrange(year, month)[1])
+    tx_date = date(year, month, day)
+    if rule.start_date and tx_date < rule.start_date:
+        return None
+    if rule.end_date and tx_date > rule.end_date:
+        return None
+    return tx_date
+
+
+def iter_months(first_month, last_month):
+    """(year, month) ตั้งแต่ first_month ถึง last_month (รวมปลาย)"""
+    year, month = first_month
+    while (year, month) <= tuple(last_month):
+        yield year, month
+        year, month = add_months(year, month, 1)
+
+
+def active_rules(first_month, last_month, owners=None):
+    """RecurringTransaction ที่เปิดใช้และมีช่วง start/end คาบเกี่ยวกับเดือนที่ขอ"""
+    range_start = month_range(*first_month)[0]
+    range_end = month_range(*last_month)[1]
+
+    rules = (
+        RecurringTransaction.objects
+        .filter(is_active=True)
+        .exclude(start_date__gte=range_end)
+        .exclude(end_date__lt=range_start)
+        .select_related("category")
+    )
+    if owners is not None:
+        rules = rules.filter(owner__in=owners)
+    return rules
+
+
+def materialize_recurring(first_month, last_month, owners=None, estimate=True):
+    """
+    สร้าง Transaction จากรายการประจำทุกเดือนในช่วง first_month..last_month
+    owners: queryset / list ของ User (None = ทุกคน)
+    estimate=True  -> สร้างเป็นรายการประมาณการ (ยังไม่จ่าย)
+    estimate=False -> สร้างเป็นรายการจริง (จ่ายแล้ว)
+
+    - ของที่สร้างไปแล้ว (rule เดียวกัน วันเดียวกัน) ดึงมาทีเดียวด้วย query เดียว แล้วข้ามไป
+    - ที่เหลือคำนวณใน memory แล้ว bulk_create
+    - bulk_create ไม่ผ่าน signals จึงคำนวณยอดคงเหลือใหม่เฉพาะบัญชีที่โดน
+      และตารางสรุปใหม่เฉพาะ user ที่โดน ในเดือน first_month..last_month
+
+    return: dict {"created": จำนวน, "skipped": จำนวนที่มีอยู่แล้ว, "owners": set ของ owner_id}
+    """
+    range_start = month_range(*first_month)[0]
+    range_end = month_range(*last_month)[1]
+    rules_qs = active_rules(first_month, last_month, owners)
+    rules = list(rules_qs)
+    if not rules:
+        return {"created": 0, "skipped": 0, "owners": set()}
+
+    existing = set(
+        Transaction.objects
+        .filter(
+            source_recurring__in=rules_qs.values("pk"),
+            date__gte=range_start,
+            date__lt=range_end,
+        )
+        .values_list("source_recurring_id", "date")
+    )
+
+    to_create = []
+    skipped = 0
+    for year, month in iter_months(first_month, last_month):
+        for r in rules:
+            tx_date = occurrence_date(r, year, month)
+            if tx_date is None:
+                continue
+            if (r.pk, tx_date) in existing:
+                skipped += 1
+                continue
+
+            if estimate:
+                note_text = r.name or (r.category.name if r.category else "")
+            else:
+                note_text = r.name or "รายการประจำ"
+
+            to_create.append(Transaction(
+                owner_id=r.owner_id,
+                account_id=r.account_id,
+                category_id=r.category_id,
+                direction=r.direction,
+                amount=r.amount,
+                date=tx_date,
+                note=note_text,
+                is_estimate=estimate,
+                is_paid=not estimate,
+                source_recurring_id=r.pk,
+            ))
+
+    owner_ids = {tx.owner_id for tx in to_create}
+    if to_create:
+        with transaction.atomic():
+            Transaction.objects.bulk_create(to_create, batch_size=RECURRING_BATCH_SIZE)
+            rebuild_account_balances(
+                Account.objects.filter(pk__in={tx.account_id for tx in to_create})
+            )
+            rebuild_monthly_summaries(
+                User.objects.filter(pk__in=owner_ids), months=(first_month, last_month),
+            )
+            index_transactions([tx.pk for tx in to_create])
+            bump_dashboard_version(owner_ids)
+
+    return {"created": len(to_create), "skipped": skipped, "owners": owner_ids}
@@ -0,0 +1,263 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, close_old_connections, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Category, MonthlySummary, ReportJob
+from .utils_rollup import build_monthly_rollup, category_spending
+
+try:
+    from weasyprint import HTML
+except Exception:
+    HTML = None
+
+logger = logging.getLogger(__name__)
+
+# เปลี่ยนเลขนี้เมื่อแก้ template / หน้าตารายงาน เพื่อให้ PDF เก่าถูกสร้างใหม่
+REPORT_TEMPLATE_VERSION = 1
+
+# job ที่ RUNNING นานเกินนี้ถือว่า worker ตายไปแล้ว (เช่น restart server) ให้เข้าคิวใหม่
+REPORT_JOB_STALE_AFTER = timedelta(minutes=10)
+
+REPORT_MONTH_NAMES = {
+    1: "มกราคม", 2: "กุมภาพันธ์", 3: "มีนาคม", 4: "เมษายน",
+    5: "พฤษภาคม", 6: "มิถุนายน", 7: "กรกฎาคม", 8: "สิงหาคม",
+    9: "กันยายน", 10: "ตุลาคม", 11: "พฤศจิกายน", 12: "ธันวาคม",
+}
+
+
+class ReportUnavailable(Exception):
+    """เครื่องนี้สร้าง PDF ไม่ได้ (ไม่มี WeasyPrint)"""
+
+
+def pdf_available():
+    return HTML is not None
+
+
+def report_data_version(user, year, month):
+    """
+    hash ของทุกอย่างที่มีผลกับรายงานเดือนนั้น (2 query เล็ก ๆ ไม่ต้องอ่าน Transaction)
+      - ยอดรวมรายเดือนจาก MonthlySummary
+      - หมวดรายจ่าย (ชื่อ / งบกลาง)
+    ข้อมูลเดือนอื่นเปลี่ยน version เดือนนี้ไม่เปลี่ยน
+    """
+    digest = hashlib.sha1(f"v{REPORT_TEMPLATE_VERSION}".encode())
+
+    summaries = (
+        MonthlySummary.objects
+        .filter(owner=user, year=year, month=month, is_estimate=False)
+        .order_by("direction", "category_id")
+        .values_list("direction", "category_id", "total", "tx_count")
+    )
+    categories = (
+        Category.objects
+        .filter(kind="EXPENSE")
+        .order_by("pk")
+        .values_list("pk", "name", "monthly_budget")
+    )
+    for label, rows in (("s", summaries), ("c", categories)):
+        digest.update(label.encode())
+        for row in rows:
+            digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def build_report_context(user, year, month):
+    """context ของ template monthly_report_pdf.html"""
+    expense_categories = Category.objects.filter(kind="EXPENSE").order_by("name")
+
+    rollup = build_monthly_rollup(user, (year, month), (year, month))
+    # งบกลางของหมวด (Category.monthly_budget) เหมือนหน้าสรุปรายเดือน
+    spending = category_spending(user, year, month, expense_categories, rollup=rollup, user_budgets=False)
+
+    income_month = rollup.total(year, month, "IN")
+    expense_month = rollup.total(year, month, "OUT")
+
+    return {
+        "month_label": f"{REPORT_MONTH_NAMES.get(month, month)} {year}",
+        "year": year,
+        "month": month,
+        **spending,
+        "income_month": income_month,
+        "expense_month": expense_month,
+        "net_month": income_month - expense_month,
+    }
+
+
+def render_report_pdf(user, year, month):
+    """สร้าง PDF ของเดือนนั้นเป็น bytes (ช้า: WeasyPrint ใช้เวลาหลายวินาที)"""
+    if HTML is None:
+        raise ReportUnavailable("ยังไม่ได้ติดตั้ง WeasyPrint")
+    html_string = render_to_string(
+        "app_finance/monthly_report_pdf.html",
+        build_report_context(user, year, month),
+    )
+    return HTML(string=html_string, base_url=str(settings.BASE_DIR)).write_pdf()
+
+
+def report_filename(year, month):
+    return f"finance_report_{year}_{month:02d}.pdf"
+
+
+# =========================
+#   คิวงาน
+# =========================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _report_executor():
+    """
+    thread pool ใน process ของ web สำหรับสร้าง PDF เบื้องหลัง
+    REPORT_WORKERS = 0 คือไม่รันใน web เลย ปล่อยให้ `build_reports --pending` มาเก็บคิวแทน
+    """
+    global _executor
+    workers = getattr(settings, "REPORT_WORKERS", 2)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+    return _executor
+
+
+def get_report_job(user, year, month, data_version=None):
+    """job ของเวอร์ชันข้อมูลปัจจุบัน (None ถ้ายังไม่เคยสั่ง)"""
+    if data_version is None:
+        data_version = report_data_version(user, year, month)
+    return ReportJob.objects.filter(
+        owner=user, year=year, month=month, data_version=data_version
+    ).first()
+
+
+def ensure_report_job(user, year, month, force=False):
+    """
+    หา/สร้าง job ของข้อมูลเวอร์ชันปัจจุบัน
+    job ที่ FAILED (หรือ force=True) จะถูกตั้งกลับเป็น QUEUED ให้สร้างใหม่
+    return: (job, queued) queued = True ถ้าต้องสั่งรัน
+    """
+    data_version = report_data_version(user, year, month)
+    try:
+        with transaction.atomic():
+            job, created = ReportJob.objects.get_or_create(
+                owner=user, year=year, month=month, data_version=data_version,
+            )
+    except IntegrityError:
+        # อีก request สร้างไปพร้อมกัน
+        job, created = get_report_job(user, year, month, data_version), False
+
+    if created:
+        return job, True
+
+    retry = job.status == "FAILED" or (force and job.status == "DONE")
+    if job.status == "RUNNING" and job.started_at and (
+        timezone.now() - job.started_at > REPORT_JOB_STALE_AFTER
+    ):
+        retry = True
+    if job.status == "DONE" and job.pdf and not job.pdf.storage.exists(job.pdf.name):
+        # ไฟล์หายไปจาก MEDIA_ROOT
+        retry = True
+    if retry:
+        ReportJob.objects.filter(pk=job.pk).update(status="QUEUED", error="")
+        job.status = "QUEUED"
+        job.error = ""
+    return job, job.status == "QUEUED"
+
+
+def enqueue_report(user, year, month):
+    """
+    สั่งสร้าง PDF เบื้องหลัง (คืนค่าทันที)
+    ถ้ามีไฟล์ของข้อมูลเวอร์ชันนี้อยู่แล้วจะไม่สร้างซ้ำ
+    """
+    job, queued = ensure_report_job(user, year, month)
+    if queued:
+        executor = _report_executor()
+        if executor is not None:
+            transaction.on_commit(lambda: executor.submit(_run_in_thread, job.pk))
+    return job
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_report_job(job_id)
+    except Exception:
+        logger.exception("report job %s ล้มเหลว", job_id)
+    finally:
+        close_old_connections()
+
+
+def run_report_job(job_id):
+    """
+    รัน job 1 ตัว (ใช้ได้ทั้งใน thread pool และใน management command)
+    จองงานด้วย UPDATE ... WHERE status='QUEUED' กันสอง worker หยิบงานเดียวกัน
+    return: True ถ้าสร้างสำเร็จ
+    """
+    claimed = ReportJob.objects.filter(pk=job_id, status="QUEUED").update(
+        status="RUNNING", started_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+
+    job = ReportJob.objects.select_related("owner").get(pk=job_id)
+    try:
+        pdf_bytes = render_report_pdf(job.owner, job.year, job.month)
+    except Exception as exc:
+        job.status = "FAILED"
+        job.error = str(exc) or exc.__class__.__name__
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        if isinstance(exc, ReportUnavailable):
+            return False
+        raise
+
+    old_name = job.pdf.name
+    job.pdf.save(
+        f"{job.year}-{job.month:02d}-{job.data_version[:12]}.pdf",
+        ContentFile(pdf_bytes),
+        save=False,
+    )
+    if old_name and old_name != job.pdf.name:
+        job.pdf.storage.delete(old_name)
+    job.status = "DONE"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["pdf", "status", "finished_at"])
+
+    _prune_old_versions(job)
+    return True
+
+
+def _prune_old_versions(job):
+    """ลบ PDF ของเวอร์ชันเก่าในเดือนเดียวกัน (ข้อมูลเปลี่ยนไปแล้ว ไม่มีใครใช้)"""
+    stale = ReportJob.objects.filter(
+        owner_id=job.owner_id, year=job.year, month=job.month, created_at__lt=job.created_at,
+    ).exclude(status__in=["QUEUED", "RUNNING"])
+    for old in stale:
+        if old.pdf:
+            old.pdf.storage.delete(old.pdf.name)
+    stale.delete()
+
+
+def run_pending_jobs(limit=None):
+    """เก็บคิวที่ค้างอยู่ (QUEUED) เรียงตามเวลาที่สั่ง return: (สำเร็จ, ไม่สำเร็จ)"""
+    done = failed = 0
+    pending = ReportJob.objects.filter(status="QUEUED").order_by("created_at")
+    for job_id in pending.values_list("pk", flat=True)[:limit]:
+        try:
+            ok = run_report_job(job_id)
+        except Exception:
+            logger.exception("report job %s ล้มเหลว", job_id)
+            ok = False
+        if ok:
+            done += 1
+        elif ReportJob.objects.filter(pk=job_id, status="FAILED").exists():
+            failed += 1
+    return done, failed
@@ -0,0 +1,455 @@
+import gzip
+import io
+import json
+import re
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import (
+    Account,
+    Category,
+    CategoryBudget,
+    Goal,
+    RecurringTransaction,
+    Tag,
+    Transaction,
+    TransactionTemplate,
+)
+from .utils_dashboard import bump_dashboard_version
+from .utils_goals import rebuild_goal_progress
+from .utils_ledger import rebuild_account_balances
+from .utils_rollup import rebuild_monthly_summaries
+from .utils_search import index_transactions
+
+
+RESTORE_BATCH_SIZE = 2000
+
+
+class RestoreError(Exception):
+    """ไฟล์สำรองข้อมูลไม่ถูกต้อง / อ่านไม่ได้"""
+
+
+# =========================
+#   อ่านไฟล์แบบ stream
+# =========================
+
+class _JsonStreamReader:
+    """
+    อ่านไฟล์สำรองข้อมูล JSON ก้อนใหญ่ทีละแถวโดยไม่ต้องโหลดทั้งไฟล์
+    รองรับเฉพาะโครงสร้างของ export_full_json: object ชั้นนอกที่ value เป็นค่าเดี่ยวหรือ list ของ object
+    """
+
+    def __init__(self, fp, read_size=1 << 16):
+        self.fp = fp
+        self.read_size = read_size
+        self.buf = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.fp.read(self.read_size)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise RestoreError("ไฟล์จบก่อนกำหนด")
+
+    def _next_char(self):
+        ch = self._peek()
+        self.pos += 1
+        return ch
+
+    def _expect(self, expected):
+        ch = self._next_char()
+        if ch not in expected:
+            raise RestoreError(f"รูปแบบ JSON ไม่ถูกต้อง (เจอ {ch!r})")
+        return ch
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise RestoreError("อ่านค่า JSON ไม่ได้")
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if self._peek() == "[":
+                self.pos += 1
+                if self._peek() == "]":
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                yield "_meta", {key: self._value()}
+            if self._expect(",}") == "}":
+                return
+
+
+def _iter_ndjson(fp):
+    for line in fp:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            yield record["table"], record["row"]
+        except (ValueError, KeyError, TypeError):
+            raise RestoreError("บรรทัด NDJSON ไม่ถูกต้อง")
+
+
+def iter_backup_records(fileobj):
+    """
+    อ่านไฟล์สำรองข้อมูล (JSON / NDJSON / .gz ของทั้งสองแบบ) ทีละแถว
+    yield: (ชื่อตาราง, dict ของแถว)
+    """
+    raw = fileobj
+    if not hasattr(raw, "peek"):
+        raw = io.BufferedReader(raw)
+    if raw.peek(2)[:2] == b"\x1f\x8b":
+        raw = io.BufferedReader(gzip.GzipFile(fileobj=raw))
+
+    head = raw.peek(256)[:256].decode("utf-8-sig", errors="ignore")
+    text = io.TextIOWrapper(raw, encoding="utf-8-sig")
+
+    if re.match(r'\s*\{\s*"table"\s*:', head):
+        return _iter_ndjson(text)
+    return iter(_JsonStreamReader(text))
+
+
+# =========================
+#   Restore
+# =========================
+
+def _field_values(model, row, skip=()):
+    """เลือกเฉพาะ field ที่มีใน model (ตัด id / owner / FK ที่จะ map เอง)"""
+    values = {}
+    for field in model._meta.concrete_fields:
+        name = field.attname
+        if field.primary_key or name == "owner_id" or name in skip or name not in row:
+            continue
+        values[name] = row[name]
+    return values
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def _tx_fingerprint(account_id, tx_date, direction, amount, is_estimate, note):
+    return (account_id, str(tx_date), direction, _money(amount), bool(is_estimate), note or "")
+
+
+class BackupRestorer:
+    """
+    นำเข้าไฟล์สำรองข้อมูลให้ user ปลายทาง
+    - map primary key เดิมในไฟล์ -> id ใหม่ในระบบนี้
+    - ของที่มีอยู่แล้ว (เทียบด้วย natural key) จะไม่ถูกสร้างซ้ำ รันซ้ำกี่รอบผลเหมือนเดิม
+    - รายการธุรกรรมเทียบแบบนับจำนวน: ถ้าไฟล์มีรายการหน้าตาเหมือนกัน 3 รายการ
+      และในระบบมีอยู่แล้ว 1 รายการ จะสร้างเพิ่มแค่ 2
+    """
+
+    def __init__(self, user, batch_size=RESTORE_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.maps = {}
+        self.stats = {}
+
+    # ---------- ตัวช่วย ----------
+
+    def _map(self, table, old_id):
+        if old_id is None:
+            return None
+        return self.maps.get(table, {}).get(old_id)
+
+    def _count(self, table, created, existing):
+        stat = self.stats.setdefault(table, {"created": 0, "existing": 0})
+        stat["created"] += created
+        stat["existing"] += existing
+
+    def _restore_by_key(self, table, model, rows, natural_key, build, existing_qs):
+        """
+        ใช้กับตารางเล็ก: เทียบ natural key กับของที่มีอยู่ ที่ยังไม่มีค่อย bulk_create
+        natural_key(obj) ต้องคืนค่าที่เทียบกันได้ทั้ง object จากไฟล์และจากฐานข้อมูล
+        """
+        id_map = self.maps.setdefault(table, {})
+        existing = {natural_key(obj): obj.pk for obj in existing_qs}
+
+        to_create = {}
+        pending = []  # (id เดิม, key) ที่ต้องรอ id หลังสร้าง
+        matched = 0
+        for row in rows:
+            obj = build(row)
+            if obj is None:
+                continue
+            key = natural_key(obj)
+            if key in existing:
+                id_map[row["id"]] = existing[key]
+                matched += 1
+            else:
+                # key ซ้ำกันเองในไฟล์ สร้างแค่ครั้งเดียว
+                to_create.setdefault(key, obj)
+                pending.append((row["id"], key))
+
+        created = model.objects.bulk_create(list(to_create.values()), batch_size=self.batch_size)
+        for key, obj in zip(to_create.keys(), created):
+            existing[key] = obj.pk
+        for old_id, key in pending:
+            id_map[old_id] = existing[key]
+        self._count(table, len(created), matched)
+
+    # ---------- แต่ละตาราง ----------
+
+    def restore_categories(self, rows):
+        # Category เป็นของกลาง เทียบด้วยชื่อ + ประเภท
+        self._restore_by_key(
+            "categories", Category, rows,
+            natural_key=lambda c: (c.name, c.kind),
+            build=lambda row: Category(**_field_values(Category, row)),
+            existing_qs=Category.objects.all(),
+        )
+
+    def restore_accounts(self, rows):
+        def build(row):
+            # ledger_balance คำนวณใหม่จากรายการหลัง restore
+            return Account(owner=self.user, **_field_values(Account, row, skip={"ledger_balance"}))
+
+        self._restore_by_key(
+            "accounts", Account, rows,
+            natural_key=lambda a: (a.name, a.account_type),
+            build=build,
+            existing_qs=Account.objects.filter(owner=self.user),
+        )
+
+    def restore_tags(self, rows):
+        self._restore_by_key(
+            "tags", Tag, rows,
+            natural_key=lambda t: t.name,
+            build=lambda row: Tag(owner=self.user, **_field_values(Tag, row)),
+            existing_qs=Tag.objects.filter(owner=self.user),
+        )
+
+    def restore_goals(self, rows):
+        def build(row):
+            # done_amount คำนวณใหม่จากรายการหลัง restore
+            values = _field_values(Goal, row, skip={"account_id", "done_amount"})
+            return Goal(owner=self.user, account_id=self._map("accounts", row.get("account_id")), **values)
+
+        self._restore_by_key(
+            "goals", Goal, rows,
+            natural_key=lambda g: g.name,
+            build=build,
+            existing_qs=Goal.objects.filter(owner=self.user),
+        )
+
+    def restore_category_budgets(self, rows):
+        def build(row):
+            category_id = self._map("categories", row.get("category_id"))
+            if category_id is None:
+                return None
+            values = _field_values(CategoryBudget, row, skip={"category_id"})
+            return CategoryBudget(owner=self.user, category_id=category_id, **values)
+
+        self._restore_by_key(
+            "category_budgets", CategoryBudget, rows,
+            natural_key=lambda b: (b.category_id, int(b.year), int(b.month)),
+            build=build,
+            existing_qs=CategoryBudget.objects.filter(owner=self.user),
+        )
+
+    def restore_recurring_transactions(self, rows):
+        def build(row):
+            account_id = self._map("accounts", row.get("account_id"))
+            if account_id is None:
+                return None
+            values = _field_values(RecurringTransaction, row, skip={"account_id", "category_id"})
+            return RecurringTransaction(
+                owner=self.user,
+                account_id=account_id,
+                category_id=self._map("categories", row.get("category_id")),
+                **values,
+            )
+
+        self._restore_by_key(
+            "recurring_transactions", RecurringTransaction, rows,
+            natural_key=lambda r: (
+                r.account_id, r.direction, _money(r.amount), int(r.day_of_month), r.name or "",
+            ),
+            build=build,
+            existing_qs=RecurringTransaction.objects.filter(owner=self.user),
+        )
+
+    def restore_transaction_templates(self, rows):
+        def build(row):
+            values = _field_values(TransactionTemplate, row, skip={"account_id", "category_id"})
+            return TransactionTemplate(
+                owner=self.user,
+                account_id=self._map("accounts", row.get("account_id")),
+                category_id=self._map("categories", row.get("category_id")),
+                **values,
+            )
+
+        self._restore_by_key(
+            "transaction_templates", TransactionTemplate, rows,
+            natural_key=lambda t: t.name,
+            build=build,
+            existing_qs=TransactionTemplate.objects.filter(owner=self.user),
+        )
+
+    def _load_existing_transactions(self):
+        # fingerprint -> list ของ id ที่มีอยู่แล้ว (ใช้จับคู่แบบนับจำนวน)
+        existing = {}
+        rows = (
+            Transaction.objects
+            .filter(owner=self.user)
+            .order_by("id")
+            .values_list("id", "account_id", "date", "direction", "amount", "is_estimate", "note")
+            .iterator(chunk_size=self.batch_size)
+        )
+        for tx_id, *fields in rows:
+            existing.setdefault(_tx_fingerprint(*fields), []).append(tx_id)
+        return existing
+
+    def restore_transactions(self, rows):
+        if not hasattr(self, "_existing_tx"):
+            self._existing_tx = self._load_existing_transactions()
+        existing = self._existing_tx
+        id_map = self.maps.setdefault("transactions", {})
+        skip = {"account_id", "category_id", "goal_id", "source_recurring_id"}
+
+        to_create = []
+        matched = 0
+        for row in rows:
+            account_id = self._map("accounts", row.get("account_id"))
+            if account_id is None:
+                continue
+            fingerprint = _tx_fingerprint(
+                account_id, row["date"], row["direction"], row["amount"],
+                row.get("is_estimate"), row.get("note"),
+            )
+            same = existing.get(fingerprint)
+            if same:
+                id_map[row["id"]] = same.pop(0)
+                matched += 1
+                continue
+
+            to_create.append((row["id"], Transaction(
+                owner=self.user,
+                account_id=account_id,
+                category_id=self._map("categories", row.get("category_id")),
+                goal_id=self._map("goals", row.get("goal_id")),
+                source_recurring_id=self._map("recurring_transactions", row.get("source_recurring_id")),
+                **_field_values(Transaction, row, skip=skip),
+            )))
+
+        created = Transaction.objects.bulk_create([obj for _, obj in to_create], batch_size=self.batch_size)
+        for (old_id, _), obj in zip(to_create, created):
+            id_map[old_id] = obj.pk
+        self._count("transactions", len(created), matched)
+
+    def _restore_links(self, table, through, owner_field, parent_table, rows):
+        pairs = set()
+        for row in rows:
+            parent_id = self._map(parent_table, row.get(owner_field))
+            tag_id = self._map("tags", row.get("tag_id"))
+            if parent_id and tag_id:
+                pairs.add((parent_id, tag_id))
+
+        # คู่ที่มีอยู่แล้ว (ดึงด้วย query เดียวต่อ batch)
+        existing = set(
+            through.objects
+            .filter(**{f"{owner_field}__in": {parent_id for parent_id, _ in pairs}})
+            .values_list(owner_field, "tag_id")
+        ) & pairs
+        links = [
+            through(**{owner_field: parent_id, "tag_id": tag_id})
+            for parent_id, tag_id in pairs - existing
+        ]
+        # unique (parent, tag) อยู่แล้ว ignore_conflicts กันไว้อีกชั้น
+        through.objects.bulk_create(links, batch_size=self.batch_size, ignore_conflicts=True)
+        self._count(table, len(links), len(existing))
+
+    def restore_transaction_tags(self, rows):
+        self._restore_links(
+            "transaction_tags", Transaction.tags.through, "transaction_id", "transactions", rows,
+        )
+
+    def restore_transaction_template_tags(self, rows):
+        self._restore_links(
+            "transaction_template_tags", TransactionTemplate.tags.through,
+            "transactiontemplate_id", "transaction_templates", rows,
+        )
+
+    # ---------- ภาพรวม ----------
+
+    def run(self, records):
+        """
+        records: iterable ของ (ชื่อตาราง, แถว) ตามลำดับในไฟล์
+        ทุกอย่างอยู่ใน transaction เดียว ถ้าพังกลางทางจะไม่มีอะไรถูกบันทึก
+        return: dict สถิติ {ตาราง: {"created": n, "existing": n}, "_seconds": วินาที}
+        """
+        started = time.perf_counter()
+        handlers = {
+            "accounts": self.restore_accounts,
+            "categories": self.restore_categories,
+            "tags": self.restore_tags,
+            "goals": self.restore_goals,
+            "category_budgets": self.restore_category_budgets,
+            "recurring_transactions": self.restore_recurring_transactions,
+            "transaction_templates": self.restore_transaction_templates,
+            "transactions": self.restore_transactions,
+            "transaction_tags": self.restore_transaction_tags,
+            "transaction_template_tags": self.restore_transaction_template_tags,
+        }
+
+        with transaction.atomic():
+            current_table, batch = None, []
+            for table, row in records:
+                if table != current_table or len(batch) >= self.batch_size:
+                    if batch:
+                        handlers[current_table](batch)
+                    current_table, batch = table, []
+                if table in handlers:
+                    batch.append(row)
+            if batch:
+                handlers[current_table](batch)
+
+            # bulk_create ไม่ผ่าน signals -> คำนวณยอดคงเหลือ / ตารางสรุปใหม่ของ user นี้
+            rebuild_account_balances(Account.objects.filter(owner=self.user))
+            rebuild_goal_progress(Goal.objects.filter(owner=self.user))
+            rebuild_monthly_summaries(User.objects.filter(pk=self.user.pk))
+            index_transactions(self.maps.get("transactions", {}).values())
+            bump_dashboard_version({self.user.pk})
+
+        self.stats["_seconds"] = time.perf_counter() - started
+        return self.stats
+
+
+def restore_backup(fileobj, user):
+    """อ่านไฟล์สำรองข้อมูลแบบ stream แล้วนำเข้าให้ user"""
+    return BackupRestorer(user).run(iter_backup_records(fileobj))
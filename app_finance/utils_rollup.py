@@ -0,0 +1,310 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import CategoryBudget, MonthlySummary, Transaction
+from .utils_ledger import CENT
+
+
+MONTH_LABELS = {
+    1: "ม.ค.", 2: "ก.พ.", 3: "มี.ค.", 4: "เม.ย.",
+    5: "พ.ค.", 6: "มิ.ย.", 7: "ก.ค.", 8: "ส.ค.",
+    9: "ก.ย.", 10: "ต.ค.", 11: "พ.ย.", 12: "ธ.ค.",
+}
+
+
+def add_months(year, month, delta):
+    """เลื่อนเดือนไป delta เดือน (ติดลบได้) return (year, month)"""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def months_back(year, month, count):
+    """list ของ (year, month) ย้อนหลัง count เดือน จบที่เดือนที่ให้มา เรียงเก่า -> ใหม่"""
+    return [add_months(year, month, -i) for i in range(count - 1, -1, -1)]
+
+
+def month_range(year, month):
+    """ช่วงวันที่ของเดือน [วันแรก, วันแรกของเดือนถัดไป)"""
+    next_y, next_m = add_months(year, month, 1)
+    return date(year, month, 1), date(next_y, next_m, 1)
+
+
+class MonthlyRollup:
+    """
+    ก้อนยอดรวมรายเดือนของ user 1 คน (เก็บใน memory)
+    key = (year, month, direction, is_estimate, category_id) -> ยอดรวม / จำนวนรายการ
+
+    สร้างด้วย build_monthly_rollup() แล้วให้แต่ละ view หยิบเฉพาะส่วนที่ต้องใช้
+    """
+
+    def __init__(self, rows):
+        self._month_totals = {}
+        self._month_counts = {}
+        self._by_category = {}
+        self.category_names = {}
+
+        for row in rows:
+            key = (row["year"], row["month"], row["direction"], row["is_estimate"])
+            total = row["total"] or Decimal("0")
+            cid = row["category_id"]
+
+            self._month_totals[key] = self._month_totals.get(key, Decimal("0")) + total
+            self._month_counts[key] = self._month_counts.get(key, 0) + row["tx_count"]
+
+            cats = self._by_category.setdefault(key, {})
+            cats[cid] = cats.get(cid, Decimal("0")) + total
+            if cid is not None:
+                self.category_names[cid] = row["category__name"]
+
+    def total(self, year, month, direction, is_estimate=False):
+        return self._month_totals.get((year, month, direction, is_estimate), Decimal("0"))
+
+    def count(self, year, month, direction, is_estimate=False):
+        return self._month_counts.get((year, month, direction, is_estimate), 0)
+
+    def by_category(self, year, month, direction="OUT", is_estimate=False):
+        """{category_id: ยอดรวม} (category_id = None คือไม่ระบุหมวด)"""
+        return dict(self._by_category.get((year, month, direction, is_estimate), {}))
+
+    def category_ranking(self, year, month, direction="OUT", is_estimate=False):
+        """list ของ (category_id, ชื่อหมวด, ยอดรวม) เรียงจากมากไปน้อย"""
+        items = [
+            (cid, self.category_names.get(cid), total)
+            for cid, total in self.by_category(year, month, direction, is_estimate).items()
+        ]
+        items.sort(key=lambda x: x[2], reverse=True)
+        return items
+
+
+def build_monthly_rollup(user, first_month, last_month):
+    """
+    ดึงยอดรวมของ user ตั้งแต่ first_month ถึง last_month (ทั้งคู่เป็น (year, month) รวมปลาย)
+    อ่านจากตาราง MonthlySummary ที่รวมไว้แล้ว ด้วย query เดียว
+    """
+    y1, m1 = first_month
+    y2, m2 = last_month
+
+    rows = (
+        MonthlySummary.objects
+        .filter(owner=user)
+        .filter(Q(year__gt=y1) | Q(year=y1, month__gte=m1))
+        .filter(Q(year__lt=y2) | Q(year=y2, month__lte=m2))
+        .values(
+            "year", "month", "direction", "is_estimate",
+            "category_id", "category__name", "total", "tx_count",
+        )
+        .order_by()
+    )
+    return MonthlyRollup(rows)
+
+
+def category_spending(user, year, month, categories, rollup=None, user_budgets=True):
+    """
+    ยอดใช้จริงต่อหมวดของ user ในเดือนที่เลือก เทียบกับงบ
+    จำนวน query คงที่ไม่ว่าจะมีกี่หมวด:
+      - ยอดต่อหมวดมาจาก build_monthly_rollup (GROUP BY ไว้แล้ว 1 query) หรือ rollup ที่ส่งมา
+      - งบรายเดือนของ user (CategoryBudget) ดึงครั้งเดียว แล้วจับคู่กับหมวดใน memory
+    categories: iterable ของ Category ที่จะแสดง (เรียงตามที่ต้องการมาแล้ว)
+    user_budgets: ถ้า True ใช้งบของ user เดือนนั้นก่อน ไม่มีค่อยใช้ Category.monthly_budget
+
+    return: dict {"rows", "total_budget", "total_used", "net_remaining"}
+      rows = list ของ {"category", "used", "budget", "remaining", "percent", "over"}
+    """
+    if rollup is None:
+        rollup = build_monthly_rollup(user, (year, month), (year, month))
+    spent_map = rollup.by_category(year, month, "OUT")
+
+    budget_map = {}
+    if user_budgets:
+        budget_map = dict(
+            CategoryBudget.objects
+            .filter(owner=user, year=year, month=month)
+            .values_list("category_id", "amount")
+        )
+
+    rows = []
+    total_budget = Decimal("0")
+    total_used = Decimal("0")
+
+    for c in categories:
+        used = spent_map.get(c.id, Decimal("0"))
+        budget = budget_map.get(c.id) or c.monthly_budget or Decimal("0")
+        remaining = None
+        percent = None
+        over = False
+
+        if budget > 0:
+            remaining = budget - used
+            percent = float(used / budget * 100)
+            over = used > budget
+            total_budget += budget
+
+        total_used += used
+
+        rows.append({
+            "category": c,
+            "used": used,
+            "budget": budget,
+            "remaining": remaining,
+            "percent": percent,
+            "over": over,
+        })
+
+    return {
+        "rows": rows,
+        "total_budget": total_budget,
+        "total_used": total_used,
+        "net_remaining": total_budget - total_used,
+    }
+
+
+# =========================
+#   ดูแลตาราง MonthlySummary
+# =========================
+
+SUMMARY_KEY_FIELDS = ("owner_id", "year", "month", "category_id", "direction", "is_estimate")
+
+
+def _summary_key(state):
+    tx_date = Transaction._meta.get_field("date").to_python(state["date"])
+    return (
+        state["owner_id"],
+        tx_date.year,
+        tx_date.month,
+        state["category_id"],
+        state["direction"],
+        bool(state["is_estimate"]),
+    )
+
+
+def _bump_summary(key, delta_total, delta_count):
+    """บวก/ลบยอดของแถว MonthlySummary 1 แถว (สร้างแถวใหม่ถ้ายังไม่มี)"""
+    lookup = dict(zip(SUMMARY_KEY_FIELDS, key))
+    changes = {
+        "total": F("total") + delta_total,
+        "tx_count": F("tx_count") + delta_count,
+    }
+
+    if MonthlySummary.objects.filter(**lookup).update(**changes):
+        if delta_count < 0:
+            MonthlySummary.objects.filter(**lookup, tx_count=0).delete()
+        return
+
+    if delta_count <= 0:
+        # ไม่มีแถวเดิมให้หักออก แปลว่าตารางยังไม่ได้ rebuild ข้ามไปก่อน
+        return
+
+    try:
+        with transaction.atomic():
+            MonthlySummary.objects.create(**lookup, total=delta_total, tx_count=delta_count)
+    except IntegrityError:
+        # มีอีก request สร้างแถวนี้ไปพร้อมกัน
+        MonthlySummary.objects.filter(**lookup).update(**changes)
+
+
+def apply_summary_change(old, new):
+    """
+    อัปเดต MonthlySummary ตามการเปลี่ยนแปลงของ Transaction 1 รายการ
+    old / new: dict ของค่าใน field (owner_id, date, category_id, direction, amount, is_estimate) หรือ None
+    """
+    changes = {}
+    if old:
+        key = _summary_key(old)
+        total, count = changes.get(key, (Decimal("0"), 0))
+        changes[key] = (total - Decimal(old["amount"] or 0), count - 1)
+    if new:
+        key = _summary_key(new)
+        total, count = changes.get(key, (Decimal("0"), 0))
+        changes[key] = (total + Decimal(new["amount"] or 0), count + 1)
+
+    for key, (delta_total, delta_count) in changes.items():
+        if delta_total or delta_count:
+            _bump_summary(key, delta_total, delta_count)
+
+
+def detach_category_summaries(category_id):
+    """
+    ก่อนลบ Category: ย้ายยอดของหมวดนั้นไปเป็น "ไม่ระบุหมวด"
+    ให้ตรงกับ Transaction ที่ถูก SET_NULL (ซึ่งไม่ผ่าน signals)
+    """
+    rows = MonthlySummary.objects.filter(category_id=category_id)
+    for row in rows:
+        key = (row.owner_id, row.year, row.month, None, row.direction, row.is_estimate)
+        _bump_summary(key, row.total, row.tx_count)
+    rows.delete()
+
+
+def rebuild_monthly_summaries(owners=None, fix=True, months=None):
+    """
+    เทียบ MonthlySummary กับยอดจริงจาก Transaction
+    owners: queryset ของ User (None = ทุกคน)
+    fix: ถ้า True จะลบแถวที่ผิดแล้วสร้างใหม่ให้ตรง
+    months: ((ปี, เดือน) แรก, (ปี, เดือน) สุดท้าย) ตรวจเฉพาะเดือนในช่วงนี้ (None = ทุกเดือน)
+
+    return: list ของ (key, ยอดที่เก็บไว้, ยอดจริง) โดยยอดเป็น (total, tx_count) หรือ None
+    """
+    tx_qs = Transaction.objects.all()
+    summary_qs = MonthlySummary.objects.all()
+    if owners is not None:
+        tx_qs = tx_qs.filter(owner__in=owners)
+        summary_qs = summary_qs.filter(owner__in=owners)
+    if months is not None:
+        (first_year, first_month), (last_year, last_month) = months
+        tx_qs = tx_qs.filter(
+            date__gte=month_range(first_year, first_month)[0],
+            date__lt=month_range(last_year, last_month)[1],
+        )
+        summary_qs = summary_qs.filter(
+            Q(year__gt=first_year) | Q(year=first_year, month__gte=first_month),
+            Q(year__lt=last_year) | Q(year=last_year, month__lte=last_month),
+        )
+
+    expected = {}
+    rows = (
+        tx_qs
+        .annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values(*SUMMARY_KEY_FIELDS)
+        .annotate(total=Sum("amount"), tx_count=Count("id"))
+        .order_by()
+    )
+    for row in rows:
+        key = tuple(row[f] for f in SUMMARY_KEY_FIELDS)
+        expected[key] = ((row["total"] or Decimal("0")).quantize(CENT), row["tx_count"])
+
+    stored = {}
+    stored_ids = {}
+    for row in summary_qs.values("id", "total", "tx_count", *SUMMARY_KEY_FIELDS):
+        key = tuple(row[f] for f in SUMMARY_KEY_FIELDS)
+        stored_ids.setdefault(key, []).append(row["id"])
+        stored[key] = (row["total"], row["tx_count"])
+
+    mismatches = []
+    for key in set(expected) | set(stored):
+        exp = expected.get(key)
+        got = stored.get(key)
+        if exp != got or len(stored_ids.get(key, [])) > 1:
+            mismatches.append((key, got, exp))
+
+    if fix and mismatches:
+        with transaction.atomic():
+            bad_ids = [pk for key, _, _ in mismatches for pk in stored_ids.get(key, [])]
+            for i in range(0, len(bad_ids), 500):
+                MonthlySummary.objects.filter(pk__in=bad_ids[i:i + 500]).delete()
+            MonthlySummary.objects.bulk_create(
+                [
+                    MonthlySummary(
+                        **dict(zip(SUMMARY_KEY_FIELDS, key)),
+                        total=exp[0],
+                        tx_count=exp[1],
+                    )
+                    for key, _, exp in mismatches
+                    if exp is not None
+                ],
+                batch_size=1000,
+            )
+
+    return mismatches
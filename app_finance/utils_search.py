@@ -0,0 +1,454 @@
+import logging
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Transaction
+
+try:
+    from pythainlp.tokenize import word_tokenize
+except Exception:
+    word_tokenize = None
+
+logger = logging.getLogger(__name__)
+
+# ตาราง index (สร้างใน migration 0020):
+# - SQLite: FTS5 virtual table  rowid = transaction id, คอลัมน์ owner / note / account / category / tags
+# - PostgreSQL: ตารางธรรมดา (transaction_id, owner_id, document tsvector) + GIN index
+# - backend อื่น / SQLite ที่ไม่มี FTS5: ไม่มีตาราง -> ค้นด้วย icontains แบบเดิม
+SEARCH_TABLE = "app_finance_transaction_search"
+
+SEARCH_COLUMNS = ("note", "account", "category", "tags")
+# น้ำหนักตอนจัดอันดับ: เจอใน note สำคัญกว่าชื่อบัญชี / หมวด / tag
+SEARCH_COLUMN_WEIGHTS = {"note": 4.0, "account": 2.0, "category": 2.0, "tags": 1.0}
+SEARCH_TSVECTOR_WEIGHTS = {"note": "A", "account": "B", "category": "B", "tags": "C"}
+
+SEARCH_BATCH_SIZE = 2000
+# คำค้นยาว ๆ ตัดเหลือเท่านี้คำ (กัน query ที่แพงเกินไป)
+SEARCH_MAX_TERMS = 8
+# จัดอันดับเฉพาะรายการล่าสุดที่ตรงคำค้นเท่านี้ตัว
+SEARCH_RANK_CANDIDATES = 1000
+# หน้า list: เจอไม่เกินนี้ส่ง id ไปเป็น list แทน subquery
+SEARCH_ID_LIST_LIMIT = 2000
+# tsvector เก็บตำแหน่งได้ถึง 16383
+TSVECTOR_MAX_POSITION = 16383
+
+# ตัวอักษรไทย (รวมสระ / วรรณยุกต์) 1 ก้อน หรือคำที่เป็นตัวอักษร/ตัวเลขภาษาอื่น
+_WORD_RE = re.compile(r"([\u0E00-\u0E7F]+)|([^\W_\u0E00-\u0E7F]+)")
+
+_backend_cache = {}
+
+
+# =========================
+#   ตัดคำ
+# =========================
+
+def thai_segmenter():
+    """
+    วิธีตัดคำไทยที่ใช้ทั้งตอนทำ index และตอนค้น (settings.SEARCH_THAI_SEGMENTER)
+    - "bigram" (ค่าเริ่มต้น): ตัดเป็นคู่ตัวอักษรซ้อนกัน ไม่ต้องมีพจนานุกรม ค้นกลางคำได้เหมือน icontains
+    - "pythainlp": ตัดเป็นคำด้วย PyThaiNLP (ต้องติดตั้งเพิ่ม) ไม่มีก็ถอยไปใช้ bigram
+    เปลี่ยนค่านี้แล้วต้อง `python manage.py rebuild_search` ใหม่
+    """
+    mode = getattr(settings, "SEARCH_THAI_SEGMENTER", "bigram")
+    if mode == "pythainlp" and word_tokenize is None:
+        logger.warning("SEARCH_THAI_SEGMENTER = pythainlp แต่ไม่ได้ติดตั้ง PyThaiNLP -> ใช้ bigram แทน")
+        return "bigram"
+    return mode
+
+
+def _thai_groups(run, segmenter):
+    """ข้อความไทย 1 ก้อน -> list ของ (tokens ที่ต้องอยู่ติดกัน, ค้นแบบ prefix ได้ไหม)"""
+    if segmenter == "pythainlp":
+        return [([w], True) for w in word_tokenize(run, keep_whitespace=False) if w.strip()]
+    if len(run) == 1:
+        return [([run], True)]
+    return [([run[i:i + 2] for i in range(len(run) - 1)], False)]
+
+
+def _term_groups(text, segmenter):
+    groups = []
+    for thai, other in _WORD_RE.findall(text.casefold()):
+        if other:
+            groups.append(([other], True))
+        else:
+            groups.extend(_thai_groups(thai, segmenter))
+    return groups
+
+
+def search_tokens(text, segmenter=None):
+    """ข้อความ -> list ของ token ที่เก็บลง index (ตัวเล็กหมด / ไทยตัดตาม thai_segmenter())"""
+    if not text:
+        return []
+    segmenter = segmenter or thai_segmenter()
+    return [token for tokens, _ in _term_groups(text, segmenter) for token in tokens]
+
+
+# =========================
+#   backend
+# =========================
+
+def search_backend():
+    """
+    "sqlite" / "postgresql" ถ้ามีตาราง index อยู่ ไม่งั้น None (ค้นด้วย icontains)
+    จำผลไว้ต่อฐานข้อมูล ไม่ต้องถามตารางทุก request
+    """
+    key = (connection.vendor, str(connection.settings_dict["NAME"]))
+    if key not in _backend_cache:
+        available = (
+            connection.vendor in ("sqlite", "postgresql")
+            and SEARCH_TABLE in connection.introspection.table_names()
+        )
+        _backend_cache[key] = connection.vendor if available else None
+    return _backend_cache[key]
+
+
+def _tsvector_literal(columns):
+    """{คอลัมน์: tokens} -> ข้อความแบบ 'token':ตำแหน่งน้ำหนัก สำหรับ cast เป็น tsvector ตรง ๆ (ไม่ผ่าน parser)"""
+    parts = []
+    position = 1
+    for column in SEARCH_COLUMNS:
+        weight = SEARCH_TSVECTOR_WEIGHTS[column]
+        for token in columns[column]:
+            if position > TSVECTOR_MAX_POSITION:
+                break
+            parts.append("'%s':%d%s" % (token.replace("\\", "\\\\").replace("'", "''"), position, weight))
+            position += 1
+        # เว้นระยะระหว่างคอลัมน์ กันวลีข้ามจาก note ไปชื่อบัญชี
+        position += 1
+    return " ".join(parts)
+
+
+def write_documents(rows, cursor=None, backend=None):
+    """
+    เขียน / แทนที่เอกสารใน index
+    rows: iterable ของ (transaction_id, owner_id, note, ชื่อบัญชี, ชื่อหมวด, [ชื่อ tag])
+    ใช้ได้ทั้งจาก signal, rebuild และ migration (ไม่ผูกกับ model)
+    """
+    backend = backend or search_backend()
+    if backend is None:
+        return 0
+    segmenter = thai_segmenter()
+
+    documents = []
+    for tx_id, owner_id, note, account, category, tags in rows:
+        columns = {
+            "note": search_tokens(note, segmenter),
+            "account": search_tokens(account, segmenter),
+            "category": search_tokens(category, segmenter),
+            "tags": search_tokens(" ".join(tags), segmenter),
+        }
+        if backend == "sqlite":
+            documents.append((tx_id, f"u{owner_id}", *(" ".join(columns[c]) for c in SEARCH_COLUMNS)))
+        else:
+            documents.append((tx_id, owner_id, _tsvector_literal(columns)))
+    if not documents:
+        return 0
+
+    def _write(cur):
+        if backend == "sqlite":
+            _delete_ids(cur, backend, [d[0] for d in documents])
+            cur.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, owner, note, account, category, tags) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                documents,
+            )
+        else:
+            cur.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (transaction_id, owner_id, document) "
+                "VALUES (%s, %s, %s::tsvector) "
+                "ON CONFLICT (transaction_id) DO UPDATE "
+                "SET owner_id = EXCLUDED.owner_id, document = EXCLUDED.document",
+                documents,
+            )
+
+    if cursor is not None:
+        _write(cursor)
+    else:
+        with connection.cursor() as cur:
+            _write(cur)
+    return len(documents)
+
+
+def _delete_ids(cursor, backend, ids):
+    key = "rowid" if backend == "sqlite" else "transaction_id"
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {key} IN ({placeholders})", list(ids))
+
+
+# =========================
+#   ให้ index ตรงกับข้อมูลจริง
+# =========================
+
+def _chunks(ids, size=SEARCH_BATCH_SIZE):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def index_transactions(ids):
+    """
+    ทำ index ใหม่ให้ Transaction ตาม id (ดึงข้อมูลทีละ batch: 2 query ต่อ batch)
+    id ที่ไม่มีใน Transaction แล้วจะถูกลบออกจาก index
+    """
+    backend = search_backend()
+    if backend is None:
+        return 0
+    written = 0
+    for chunk in _chunks(ids):
+        tags = defaultdict(list)
+        for tx_id, name in (
+            Transaction.tags.through.objects
+            .filter(transaction_id__in=chunk)
+            .values_list("transaction_id", "tag__name")
+        ):
+            tags[tx_id].append(name)
+        rows = [
+            (pk, owner_id, note, account, category, tags.get(pk, []))
+            for pk, owner_id, note, account, category in (
+                Transaction.objects
+                .filter(pk__in=chunk)
+                .values_list("pk", "owner_id", "note", "account__name", "category__name")
+            )
+        ]
+        # เขียนทั้ง batch ใน transaction เดียว (autocommit = commit ทีละแถว ช้ามาก)
+        with transaction.atomic(), connection.cursor() as cur:
+            missing = set(chunk) - {row[0] for row in rows}
+            if missing:
+                _delete_ids(cur, backend, missing)
+            written += write_documents(rows, cursor=cur, backend=backend)
+    return written
+
+
+def remove_transactions(ids):
+    backend = search_backend()
+    if backend is None:
+        return
+    with connection.cursor() as cur:
+        for chunk in _chunks(ids):
+            _delete_ids(cur, backend, chunk)
+
+
+def reindex_queryset(transactions):
+    """ทำ index ใหม่ให้ทุก Transaction ใน queryset (เช่น ทุกรายการของบัญชีที่เพิ่งเปลี่ยนชื่อ)"""
+    if search_backend() is None:
+        return 0
+    ids = transactions.order_by().values_list("pk", flat=True)
+    return index_transactions(list(ids))
+
+
+def _indexed_ids(backend, owner_ids=None):
+    with connection.cursor() as cur:
+        if backend == "sqlite":
+            if owner_ids is None:
+                cur.execute(f"SELECT rowid FROM {SEARCH_TABLE}")
+            else:
+                tokens = " OR ".join(f"u{pk}" for pk in owner_ids)
+                cur.execute(
+                    f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+                    [f"owner: ({tokens})"],
+                )
+        else:
+            if owner_ids is None:
+                cur.execute(f"SELECT transaction_id FROM {SEARCH_TABLE}")
+            else:
+                cur.execute(
+                    f"SELECT transaction_id FROM {SEARCH_TABLE} WHERE owner_id = ANY(%s)",
+                    [list(owner_ids)],
+                )
+        return {row[0] for row in cur.fetchall()}
+
+
+def check_search_index(owner_ids=None):
+    """
+    เทียบ id ใน index กับ Transaction จริง
+    return: (id ที่ยังไม่มีใน index, id ที่ค้างอยู่ใน index ทั้งที่ไม่มีรายการแล้ว)
+    """
+    backend = search_backend()
+    if backend is None:
+        return set(), set()
+    transactions = Transaction.objects.all()
+    if owner_ids is not None:
+        transactions = transactions.filter(owner_id__in=owner_ids)
+    actual = set(transactions.values_list("pk", flat=True))
+    indexed = _indexed_ids(backend, owner_ids)
+    return actual - indexed, indexed - actual
+
+
+def rebuild_search_index(owner_ids=None):
+    """
+    ล้าง index (ทั้งหมด หรือเฉพาะ user ที่ระบุ) แล้วทำใหม่จาก Transaction
+    ใช้หลัง bulk_create / เปลี่ยน SEARCH_THAI_SEGMENTER
+    return: จำนวนรายการที่ index
+    """
+    backend = search_backend()
+    if backend is None:
+        return 0
+    with transaction.atomic():
+        written = _rebuild(backend, owner_ids)
+
+    if backend == "sqlite" and owner_ids is None:
+        # รวม segment ของ FTS5 ให้เหลือก้อนเดียว ค้นเร็วขึ้นหลังเขียนเยอะ ๆ
+        with connection.cursor() as cur:
+            cur.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return written
+
+
+def _rebuild(backend, owner_ids):
+    with connection.cursor() as cur:
+        if owner_ids is None:
+            cur.execute(f"DELETE FROM {SEARCH_TABLE}")
+        else:
+            stale = _indexed_ids(backend, owner_ids)
+            for chunk in _chunks(stale):
+                _delete_ids(cur, backend, chunk)
+
+    transactions = Transaction.objects.all()
+    if owner_ids is not None:
+        transactions = transactions.filter(owner_id__in=owner_ids)
+    return reindex_queryset(transactions)
+
+
+# =========================
+#   ค้นหา
+# =========================
+
+def _query_groups(q):
+    return _term_groups(q, thai_segmenter())[:SEARCH_MAX_TERMS]
+
+
+def _fts5_expression(user, groups):
+    terms = []
+    for tokens, prefix in groups:
+        terms.append('"%s"%s' % (" ".join(tokens), "*" if prefix else ""))
+    columns = " ".join(SEARCH_COLUMNS)
+    return f"owner: u{user.pk} AND {{{columns}}}: ({' AND '.join(terms)})"
+
+
+def _tsquery(groups):
+    terms = []
+    for tokens, prefix in groups:
+        quoted = [f"'{t}'" for t in tokens]
+        if prefix:
+            quoted[-1] += ":*"
+        terms.append("(%s)" % " <-> ".join(quoted))
+    return " & ".join(terms)
+
+
+def _match_sql(backend, user, groups):
+    """SQL ที่คืน id ของรายการที่ตรงคำค้น (ใช้เป็น subquery ของ pk__in)"""
+    if backend == "sqlite":
+        return (
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+            [_fts5_expression(user, groups)],
+        )
+    return (
+        f"SELECT transaction_id FROM {SEARCH_TABLE} "
+        "WHERE owner_id = %s AND document @@ %s::tsquery",
+        [user.pk, _tsquery(groups)],
+    )
+
+
+def _icontains_filter(q):
+    return (
+        Q(note__icontains=q)
+        | Q(account__name__icontains=q)
+        | Q(category__name__icontains=q)
+        | Q(Exists(
+            Transaction.tags.through.objects.filter(
+                transaction_id=OuterRef("pk"), tag__name__icontains=q,
+            )
+        ))
+    )
+
+
+def filter_transactions(qs, user, q):
+    """
+    กรอง queryset ของ Transaction ด้วยคำค้น (note / ชื่อบัญชี / ชื่อหมวด / ชื่อ tag)
+    ทุกคำต้องเจอ (AND) และค้นแบบขึ้นต้นด้วย (prefix) ได้ ลำดับของ qs ไม่เปลี่ยน
+    ไม่มี index -> icontains แบบเดิม
+
+    เจอไม่เกิน SEARCH_ID_LIST_LIMIT รายการ -> ส่ง id ไปตรง ๆ (ดึงทีละ primary key)
+    มากกว่านั้น -> ใช้เป็น subquery ให้ฐานข้อมูลจัดการเอง
+    """
+    backend = search_backend()
+    groups = _query_groups(q) if backend else []
+    if not groups:
+        # ไม่มี index หรือคำค้นไม่มีตัวอักษร/ตัวเลขเลย (เช่น "-")
+        return qs.filter(_icontains_filter(q))
+    sql, params = _match_sql(backend, user, groups)
+    with connection.cursor() as cur:
+        cur.execute(f"{sql} LIMIT %s", [*params, SEARCH_ID_LIST_LIMIT + 1])
+        ids = [row[0] for row in cur.fetchall()]
+    if len(ids) <= SEARCH_ID_LIST_LIMIT:
+        return qs.filter(pk__in=ids)
+    return qs.filter(pk__in=RawSQL(sql, params))
+
+
+def _contains(tokens, group_tokens, prefix):
+    n = len(group_tokens)
+    for i in range(len(tokens) - n + 1):
+        last = tokens[i + n - 1]
+        if tokens[i:i + n - 1] == group_tokens[:-1] and (
+            last.startswith(group_tokens[-1]) if prefix else last == group_tokens[-1]
+        ):
+            return True
+    return False
+
+
+def _relevance(texts, groups):
+    """
+    คะแนนความเกี่ยวข้องของเอกสาร 1 ตัว: คำที่เจอในช่องไหนได้น้ำหนักของช่องนั้น
+    ช่องที่สั้นกว่าได้คะแนนมากกว่า (เจอ "กาแฟ" ใน note ว่า "กาแฟ" ตรงกว่าใน note ยาว ๆ)
+    """
+    score = 0.0
+    for column, text in zip(SEARCH_COLUMNS, texts):
+        tokens = text.split()
+        hits = sum(_contains(tokens, group_tokens, prefix) for group_tokens, prefix in groups)
+        if hits:
+            score += SEARCH_COLUMN_WEIGHTS[column] * hits / (1 + 0.1 * len(tokens))
+    return score
+
+
+def search_transactions(user, q, limit=20):
+    """
+    ค้นแบบเรียงตามความเกี่ยวข้อง สำหรับช่องค้นหาที่พิมพ์ไปค้นไป
+    จัดอันดับเฉพาะ SEARCH_RANK_CANDIDATES รายการล่าสุดที่ตรงคำค้น (เวลาคงที่ไม่ว่าจะเจอเป็นแสน)
+    - SQLite: ดึง candidate ตาม rowid ใหม่สุด (FTS5 หยุดได้ทันที) แล้วให้คะแนนใน python
+      (bm25 ของ FTS5 ต้องนับทั้ง index ก่อน คำที่เจอบ่อยจะช้ามาก)
+    - PostgreSQL: ts_rank กับ candidate ชุดเดียวกัน
+    return: list ของ Transaction (select_related บัญชี/หมวดแล้ว) ตามลำดับ
+    """
+    base = Transaction.objects.filter(owner=user).select_related("account", "category")
+    backend = search_backend()
+    groups = _query_groups(q) if backend else []
+    if not groups:
+        return list(filter_transactions(base, user, q).order_by("-date", "-id")[:limit])
+
+    with connection.cursor() as cur:
+        if backend == "sqlite":
+            cur.execute(
+                f"SELECT rowid, note, account, category, tags FROM {SEARCH_TABLE} "
+                f"WHERE {SEARCH_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s",
+                [_fts5_expression(user, groups), SEARCH_RANK_CANDIDATES],
+            )
+            ranked = sorted(cur.fetchall(), key=lambda row: -_relevance(row[1:], groups))
+            ids = [row[0] for row in ranked[:limit]]
+        else:
+            cur.execute(
+                "SELECT transaction_id FROM ("
+                f"SELECT transaction_id, document FROM {SEARCH_TABLE} "
+                "WHERE owner_id = %s AND document @@ %s::tsquery "
+                "ORDER BY transaction_id DESC LIMIT %s"
+                ") AS candidates "
+                "ORDER BY ts_rank(document, %s::tsquery) DESC, transaction_id DESC LIMIT %s",
+                [user.pk, _tsquery(groups), SEARCH_RANK_CANDIDATES, _tsquery(groups), limit],
+            )
+            ids = [row[0] for row in cur.fetchall()]
+
+    found = base.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
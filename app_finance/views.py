@@ -1,23 +1,23 @@
-import csv
-import calendar
+import asyncio
+import hashlib
+import os
 from math import ceil
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from datetime import date, datetime
 
+from asgiref.sync import sync_to_async
 from django.db.models import Sum, Q
 
+from django.conf import settings
+from django.core.cache import caches
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import logout
 from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.template.loader import get_template
-
-try:
-    from weasyprint import HTML
-except Exception:
-    HTML = None
+from django.template.loader import render_to_string
 
 from .models import (
     Account,
@@ -27,9 +27,8 @@ from .models import (
     DashboardPreference,
     Goal,
     CategoryBudget,
-    TransactionTemplate,
-    Tag,
     DebtPlanSetting,
+    ReportJob,
 )
 from .forms import (
     TransactionForm,
@@ -37,7 +36,63 @@ from .forms import (
     CategoryForm,
     RecurringTransactionForm,
     GoalForm,
+    StatementImportForm,
+)
+from .utils_calendar import build_cash_calendar
+from .utils_dashboard import (
+    DASHBOARD_CACHE,
+    DASHBOARD_CACHE_TIMEOUT,
+    DASHBOARD_CARDS,
+    build_dashboard,
+    dashboard_versions,
+    lazy_dashboard_cards,
+)
+from .utils_debt import DEBT_STRATEGIES, sweep_debt_plans
+from .utils_export import (
+    gzip_stream,
+    iter_backup_json,
+    iter_backup_ndjson,
+    iter_transactions_csv,
+)
+from .utils_forecast import (
+    FORECAST_DEFAULT_MONTHS,
+    FORECAST_HORIZONS,
+    build_forecast,
+    forecast_as_json,
 )
+from .utils_goals import goal_progress, project_goal
+from .utils_import import StatementImportError, import_statement
+from .utils_perf import perf_stats, query_budgets
+from .utils_recurring import materialize_recurring
+from .utils_search import filter_transactions, search_transactions
+from .utils_reports import (
+    REPORT_MONTH_NAMES,
+    enqueue_report,
+    pdf_available,
+    report_filename,
+)
+from .utils_restore import RestoreError, restore_backup
+from .utils_rollup import (
+    MONTH_LABELS,
+    add_months,
+    build_monthly_rollup,
+    category_spending,
+    month_range,
+)
+
+
+# render template ใน thread (context processor อ่าน session / user แบบ sync)
+arender = sync_to_async(render)
+
+
+async def _alist(qs):
+    """ดึง queryset ทั้งก้อนแบบ async"""
+    return [obj async for obj in qs]
+
+
+# จำนวนรายการต่อหน้าในหน้า transactions_list (ปรับได้ใน settings)
+TRANSACTIONS_PAGE_SIZE = getattr(settings, "FINANCE_TRANSACTIONS_PAGE_SIZE", 50)
+TRANSACTIONS_MAX_PAGE_SIZE = getattr(settings, "FINANCE_TRANSACTIONS_MAX_PAGE_SIZE", 500)
 
 
 # =========================
@@ -64,10 +119,22 @@ def home(request):
 #   ตัวช่วย filter รายการเงิน
 # =========================
 
+def _year_month_param(request, today):
+    """
+    ?year= / ?month= ของหน้าที่ดูทีละเดือน
+    ค่าที่ไม่ใช่ตัวเลขหรืออยู่นอกช่วง (เดือน 1-12, ปี 1-9998 ที่ month_range สร้างได้) ใช้ของเดือนนี้แทน
+    """
+    year = (request.GET.get("year") or "").strip()
+    month = (request.GET.get("month") or "").strip()
+    year = int(year) if year.isdigit() and 1 <= int(year) <= 9998 else today.year
+    month = int(month) if month.isdigit() and 1 <= int(month) <= 12 else today.month
+    return year, month
+
+
 def _get_filtered_transactions(request):
     """
     ใช้ร่วมกันระหว่างหน้า list + export CSV
-    รองรับการกรอง: ปี, เดือน, ประเภท (IN/OUT), คำค้นหา
+    รองรับการกรอง: ปี, เดือน, ประเภท (IN/OUT), คำค้นหา, วันที่จากปฏิทิน (?date=)
     *** ดึงเฉพาะของ user นั้น ๆ ***
     """
     qs = (
@@ -86,36 +153,112 @@ def _get_filtered_transactions(request):
     if filter_type in ["IN", "OUT"]:
         qs = qs.filter(direction=filter_type)
 
-    # ปี
-    if year.isdigit():
-        qs = qs.filter(date__year=int(year))
-
-    # เดือน
-    if month.isdigit():
-        qs = qs.filter(date__month=int(month))
+    # ปี / เดือน (กรองเป็นช่วงวันที่ ให้ใช้ index (owner, date) ได้)
+    # ปีที่ date สร้างช่วงไม่ได้ (เช่น 0 / 99999) ไม่กรองปี แทนที่จะ error
+    valid_year = year.isdigit() and 1 <= int(year) <= 9998
+    if valid_year and month.isdigit() and 1 <= int(month) <= 12:
+        start, end = month_range(int(year), int(month))
+        qs = qs.filter(date__gte=start, date__lt=end)
+    else:
+        if valid_year:
+            qs = qs.filter(date__gte=date(int(year), 1, 1), date__lt=date(int(year) + 1, 1, 1))
+        if month.isdigit():
+            qs = qs.filter(date__month=int(month))
 
-    # ค้นหา note / ชื่อบัญชี / ชื่อหมวด
+    # ค้นหา note / ชื่อบัญชี / ชื่อหมวด / ชื่อ tag (ผ่าน full-text index ถ้ามี)
     if q:
-        qs = qs.filter(
-            Q(note__icontains=q) |
-            Q(account__name__icontains=q) |
-            Q(category__name__icontains=q)
-        )
+        qs = filter_transactions(qs, request.user, q)
 
-    income_sum = qs.filter(direction="IN").aggregate(total=Sum("amount"))["total"] or Decimal("0")
-    expense_sum = qs.filter(direction="OUT").aggregate(total=Sum("amount"))["total"] or Decimal("0")
-    net_sum = income_sum - expense_sum
+    # วันที่จากปฏิทิน (?date=YYYY-MM-DD)
+    selected_date = None
+    selected_date_str = (request.GET.get("date") or "").strip()
+    if selected_date_str:
+        try:
+            selected_date = datetime.strptime(selected_date_str, "%Y-%m-%d").date()
+            qs = qs.filter(date=selected_date)
+        except ValueError:
+            selected_date = None
 
-    return qs, {
+    filter_ctx = {
         "filter_type": filter_type,
         "year": year,
         "month": month,
         "q": q,
-        "income_sum": income_sum,
-        "expense_sum": expense_sum,
-        "net_sum": net_sum,
+        "selected_date": selected_date,
+        "selected_date_str": selected_date_str,
     }
 
+    return qs, filter_ctx
+
+
+def _transactions_summary(request, qs, filter_ctx):
+    """
+    ยอดรวมรายรับ/รายจ่ายตาม filter + ตัวเลือกปีของหน้ารายการ
+    cache ตาม filter + version ข้อมูลของ user (ตัวเดียวกับ Dashboard) เลื่อนไปหน้าถัดไป / กลับมาหน้าเดิม
+    จึงไม่ต้อง SUM ทั้งช่วงกับหาปีใหม่ทุกครั้ง และหมดอายุเองทันทีที่รายการ (หรือชื่อหมวดที่ค้นได้) เปลี่ยน
+    """
+    user_version, global_version = dashboard_versions(request.user.pk)
+    signature = repr(tuple(
+        filter_ctx[name] for name in ("filter_type", "year", "month", "q", "selected_date_str")
+    ))
+    key = (
+        f"txsummary:{request.user.pk}:{user_version}:{global_version}:"
+        + hashlib.sha1(signature.encode("utf-8")).hexdigest()
+    )
+    cache = caches[DASHBOARD_CACHE]
+    summary = cache.get(key)
+    if summary is None:
+        # รวมรายรับ/รายจ่ายใน query เดียว
+        totals = {
+            row["direction"]: row["total"]
+            for row in qs.values("direction").annotate(total=Sum("amount")).order_by()
+        }
+        income_sum = totals.get("IN") or Decimal("0")
+        expense_sum = totals.get("OUT") or Decimal("0")
+        # ตัวเลือกปีจากข้อมูลของ user นี้
+        years_qs = Transaction.objects.filter(owner=request.user).dates("date", "year", order="DESC")
+        summary = {
+            "income_sum": income_sum,
+            "expense_sum": expense_sum,
+            "net_sum": income_sum - expense_sum,
+            "years": [str(d.year) for d in years_qs],
+        }
+        cache.set(key, summary, timeout=DASHBOARD_CACHE_TIMEOUT)
+    return summary
+
+
+def _keyset_page(request, qs):
+    """
+    แบ่งหน้าแบบ cursor ตามลำดับ (-date, -id) ที่ใช้อยู่แล้ว
+    ?after=YYYY-MM-DD_ID คือรายการสุดท้ายของหน้าก่อน / ?per_page= กำหนดจำนวนต่อหน้า
+    ไม่ใช้ OFFSET เลยเร็วเท่ากันไม่ว่าจะเลื่อนลึกแค่ไหน
+
+    return: (list ของรายการในหน้านี้, cursor ของหน้าถัดไป หรือ None)
+    """
+    try:
+        per_page = int(request.GET.get("per_page") or TRANSACTIONS_PAGE_SIZE)
+    except ValueError:
+        per_page = TRANSACTIONS_PAGE_SIZE
+    per_page = max(1, min(per_page, TRANSACTIONS_MAX_PAGE_SIZE))
+
+    after = (request.GET.get("after") or "").strip()
+    if after:
+        try:
+            after_date_str, after_id = after.split("_", 1)
+            after_date = datetime.strptime(after_date_str, "%Y-%m-%d").date()
+            after_id = int(after_id)
+            qs = qs.filter(Q(date__lt=after_date) | Q(date=after_date, id__lt=after_id))
+        except ValueError:
+            pass
+
+    rows = list(qs[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = f"{last.date.isoformat()}_{last.id}"
+    return rows, next_cursor
+
 
 # =========================
 #   รายการเงิน + Export CSV
@@ -123,31 +266,10 @@ def _get_filtered_transactions(request):
 
 @login_required
 def transactions_list(request):
-    """หน้าแสดงประวัติรายการทั้งหมด + filter + summary + filter ตามวันที่"""
+    """หน้าแสดงประวัติรายการทั้งหมด + filter + summary + filter ตามวันที่ (แบ่งหน้าแบบ cursor)"""
     qs, filter_ctx = _get_filtered_transactions(request)
-
-    # ===== filter ตามวันที่จากปฏิทิน (?date=YYYY-MM-DD) =====
-    selected_date = None
-    selected_date_str = (request.GET.get("date") or "").strip()
-    if selected_date_str:
-        try:
-            selected_date = datetime.strptime(selected_date_str, "%Y-%m-%d").date()
-            qs = qs.filter(date=selected_date)
-
-            income_sum = qs.filter(direction="IN").aggregate(total=Sum("amount"))["total"] or Decimal("0")
-            expense_sum = qs.filter(direction="OUT").aggregate(total=Sum("amount"))["total"] or Decimal("0")
-            net_sum = income_sum - expense_sum
-            filter_ctx.update({
-                "income_sum": income_sum,
-                "expense_sum": expense_sum,
-                "net_sum": net_sum,
-            })
-        except ValueError:
-            selected_date = None
-
-    # ตัวเลือกปีจากข้อมูลของ user นี้
-    years_qs = Transaction.objects.filter(owner=request.user).dates("date", "year", order="DESC")
-    years = [str(d.year) for d in years_qs]
+    transactions, next_cursor = _keyset_page(request, qs)
+    summary = _transactions_summary(request, qs, filter_ctx)
 
     # ตัวเลือกเดือน
     months = [
@@ -156,23 +278,90 @@ def transactions_list(request):
         ("9", "ก.ย."), ("10", "ต.ค."), ("11", "พ.ย."), ("12", "ธ.ค."),
     ]
 
-    query_string = request.GET.urlencode()  # เอาไว้ใช้กับปุ่ม Export CSV
+    # เอาไว้ใช้กับปุ่ม Export CSV และลิงก์หน้าถัดไป (ไม่รวม cursor)
+    params = request.GET.copy()
+    params.pop("after", None)
+    query_string = params.urlencode()
 
     context = {
-        "transactions": qs,
-        "years": years,
+        "transactions": transactions,
+        "next_cursor": next_cursor,
+        "is_first_page": not request.GET.get("after"),
         "months": months,
         "query_string": query_string,
-        "selected_date": selected_date,
-        "selected_date_str": selected_date_str,
         **filter_ctx,
+        **summary,
     }
     return render(request, "app_finance/transactions_list.html", context)
 
 
+@login_required
+def transactions_page_json(request):
+    """หน้าถัดไปของรายการ (JSON) สำหรับ infinite scroll ใช้ filter เดียวกับหน้า list"""
+    qs, _ = _get_filtered_transactions(request)
+    transactions, next_cursor = _keyset_page(request, qs)
+
+    rows_html = render_to_string(
+        "app_finance/_transaction_rows.html",
+        {"transactions": transactions},
+        request=request,
+    )
+    return JsonResponse({
+        "results": [
+            {
+                "id": t.id,
+                "date": t.date.isoformat(),
+                "account": t.account.name,
+                "direction": t.direction,
+                "amount": f"{t.amount:.2f}",
+                "category": t.category.name if t.category else None,
+                "is_estimate": t.is_estimate,
+                "note": t.note or "",
+            }
+            for t in transactions
+        ],
+        "html": rows_html,
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+def transactions_search_json(request):
+    """
+    ค้นรายการแบบเรียงตามความเกี่ยวข้อง (JSON) สำหรับช่องค้นหาที่พิมพ์ไปค้นไป
+    ?q=คำค้น  ?limit=จำนวนผล (1-50, ค่าเริ่มต้น 20)
+    """
+    q = (request.GET.get("q") or "").strip()
+    limit = request.GET.get("limit") or ""
+    limit = min(max(int(limit), 1), 50) if limit.isdigit() else 20
+
+    transactions = search_transactions(request.user, q, limit=limit) if q else []
+    return JsonResponse({
+        "q": q,
+        "results": [
+            {
+                "id": t.id,
+                "date": t.date.isoformat(),
+                "account": t.account.name,
+                "direction": t.direction,
+                "amount": f"{t.amount:.2f}",
+                "category": t.category.name if t.category else None,
+                "is_estimate": t.is_estimate,
+                "note": t.note or "",
+                "url": reverse("app_finance:transaction_edit", args=[t.id]),
+            }
+            for t in transactions
+        ],
+    })
+
+
 @login_required
 def transactions_export_csv(request):
-    """Export รายการตาม filter ปัจจุบันเป็น CSV (เฉพาะของ user นี้)"""
+    """
+    Export รายการตาม filter ปัจจุบันเป็น CSV (เฉพาะของ user นี้)
+    ส่งแบบ stream ทีละ chunk ใช้ memory คงที่ไม่ว่าจะมีกี่แถว
+    ตัวเลือกเพิ่มคอลัมน์: ?tags=1 / ?goal=1 / ?recurring=1
+    """
     qs, filter_ctx = _get_filtered_transactions(request)
 
     year_label = filter_ctx["year"] or "all"
@@ -180,33 +369,14 @@ def transactions_export_csv(request):
 
     filename = f"transactions_{year_label}_{month_label}.csv"
 
-    response = HttpResponse(content_type="text/csv; charset=utf-8-sig")
+    rows = iter_transactions_csv(
+        qs,
+        include_tags=request.GET.get("tags") == "1",
+        include_goal=request.GET.get("goal") == "1",
+        include_recurring=request.GET.get("recurring") == "1",
+    )
+    response = StreamingHttpResponse(rows, content_type="text/csv; charset=utf-8")
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        "วันที่",
-        "บัญชี",
-        "ประเภท",
-        "จำนวนเงิน",
-        "หมวดหมู่",
-        "ประมาณการ/จริง",
-        "หมายเหตุ",
-    ])
-
-    for t in qs:
-        direction_label = "รายรับ" if t.direction == "IN" else "รายจ่าย"
-        status_label = "ประมาณการ" if t.is_estimate else "จริง"
-        writer.writerow([
-            t.date.strftime("%Y-%m-%d"),
-            t.account.name if t.account else "",
-            direction_label,
-            f"{t.amount:.2f}",
-            t.category.name if t.category else "",
-            status_label,
-            (t.note or "").replace("\n", " "),
-        ])
-
     return response
 
 
@@ -215,295 +385,63 @@ def transactions_export_csv(request):
 # =========================
 
 @login_required
-def dashboard(request):
-    """Dashboard หลัก (ข้อมูลเฉพาะของ user คนนี้)"""
-    user = request.user
+async def dashboard(request):
+    """
+    Dashboard หลัก (ข้อมูลเฉพาะของ user คนนี้)
+    หน้าหลักคำนวณแค่การ์ดเบา ๆ (ยอดรวม, วันนี้, รายการล่าสุด) การ์ดที่เหลือเป็นที่ว่างไว้
+    แล้วหน้าเว็บดึงจาก dashboard_card_json พร้อมกันหลังแสดงหน้าแล้ว
+    """
     today = timezone.now().date()
-    year = today.year
-    month = today.month
-
-    # ===== บัญชี & Net Worth (ของ user นี้เท่านั้น) =====
-    accounts = Account.objects.filter(owner=user, is_active=True)
-
-    total_assets = Decimal("0")
-    total_debt = Decimal("0")
-
-    for acc in accounts:
-        bal = Decimal(acc.current_balance or Decimal("0"))
-        if bal >= 0:
-            total_assets += bal
-        else:
-            total_debt += abs(bal)
-
-    net_worth = total_assets - total_debt
-
-    # ===== รายรับ/รายจ่ายจริงของเดือนนี้ =====
-    base_month_qs = Transaction.objects.filter(
-        owner=user,
-        date__year=year,
-        date__month=month,
-        is_estimate=False,
-    )
-
-    income_month = base_month_qs.filter(direction="IN").aggregate(
-        s=Sum("amount")
-    )["s"] or Decimal("0")
-    expense_month = base_month_qs.filter(direction="OUT").aggregate(
-        s=Sum("amount")
-    )["s"] or Decimal("0")
-    net_month = income_month - expense_month
-
-    # ===== ประมาณการเดือนนี้ =====
-    est_tx = Transaction.objects.filter(
-        owner=user,
-        date__year=year,
-        date__month=month,
-        is_estimate=True,
-    )
-    est_income = est_tx.filter(direction="IN").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    est_expense = est_tx.filter(direction="OUT").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    est_net = est_income - est_expense
-
-    # ===== วันนี้ =====
-    today_qs = Transaction.objects.filter(
-        owner=user,
-        date=today,
-        is_estimate=False,
-    )
-    today_income = today_qs.filter(direction="IN").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    today_expense = today_qs.filter(direction="OUT").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    today_net = today_income - today_expense
-
-    def fmt(amount: Decimal) -> str:
-        a = amount or Decimal("0")
-        return f"{a:.2f}"
-
-    today_income_str = fmt(today_income)
-    today_expense_str = fmt(today_expense)
-    today_net_str = fmt(today_net)
+    user = await request.auser()
+    dash_pref, _ = await DashboardPreference.objects.aget_or_create(user=user)
 
-    # ===== รายการล่าสุด 10 รายการ =====
-    recent_tx = (
-        Transaction.objects
-        .filter(owner=user)
-        .select_related("account", "category")
-        .order_by("-date", "-id")[:10]
-    )
-
-    # ===== กราฟ 6 เดือนล่าสุด =====
-    labels, income_data, expense_data = [], [], []
-    months_back = []
-    for i in range(5, -1, -1):
-        m = month - i
-        y = year
-        while m <= 0:
-            m += 12
-            y -= 1
-        months_back.append((y, m))
-
-    month_names_short = {
-        1: "ม.ค.", 2: "ก.พ.", 3: "มี.ค.", 4: "เม.ย.",
-        5: "พ.ค.", 6: "มิ.ย.", 7: "ก.ค.", 8: "ส.ค.",
-        9: "ก.ย.", 10: "ต.ค.", 11: "พ.ย.", 12: "ธ.ค.",
+    eager = [card.name for card in DASHBOARD_CARDS.values() if not card.lazy]
+    cards, _ = await sync_to_async(build_dashboard)(user, dash_pref, today, only=eager)
+    context = {
+        "today": today,
+        "dash_pref": dash_pref,
+        "lazy_cards": lazy_dashboard_cards(dash_pref),
+        **cards,
     }
+    return await arender(request, "app_finance/dashboard.html", context)
 
-    for y2, m2 in months_back:
-        label = f"{month_names_short.get(m2, m2)} {str(y2)[2:]}"
-        labels.append(label)
-
-        base_qs = Transaction.objects.filter(
-            owner=user,
-            date__year=y2,
-            date__month=m2,
-            is_estimate=False,
-        )
-        inc = base_qs.filter(direction="IN").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-        exp = base_qs.filter(direction="OUT").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-        income_data.append(float(inc))
-        expense_data.append(float(exp))
-
-    # ===== รายจ่ายต่อหมวดเดือนนี้ (ของ user) =====
-    expense_by_cat_qs = (
-        Transaction.objects.filter(
-            owner=user,
-            date__year=year,
-            date__month=month,
-            direction="OUT",
-            is_estimate=False,
-        )
-        .values("category_id", "category__name")
-        .annotate(total=Sum("amount"))
-        .order_by("-total")
-    )
-
-    cat_labels, cat_values = [], []
-    expense_map_by_cat = {}
-    for row in expense_by_cat_qs:
-        cid = row["category_id"]
-        name = row["category__name"] or "ไม่ระบุหมวด"
-        total = row["total"] or Decimal("0")
-        expense_map_by_cat[cid] = total
-        cat_labels.append(name)
-        cat_values.append(float(total))
-
-    # Smart Insights – หมวดเยอะสุด
-    insight_top_category_name = None
-    insight_top_category_amount = None
-    if expense_by_cat_qs:
-        top = expense_by_cat_qs[0]
-        insight_top_category_name = top["category__name"] or "ไม่ระบุหมวด"
-        insight_top_category_amount = top["total"] or Decimal("0")
-
-    # เทียบกับค่าเฉลี่ย 3 เดือนก่อนหน้า (รวมทั้งเดือน)
-    last3_months = []
-    for i in range(1, 4):
-        m = month - i
-        y = year
-        while m <= 0:
-            m += 12
-            y -= 1
-        last3_months.append((y, m))
-
-    total_exp_prev = Decimal("0")
-    count_prev = 0
-    for y3, m3 in last3_months:
-        prev_qs = Transaction.objects.filter(
-            owner=user,
-            date__year=y3,
-            date__month=m3,
-            is_estimate=False,
-            direction="OUT",
-        )
-        val = prev_qs.aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        total_exp_prev += val
-        count_prev += 1
-
-    avg_exp_prev = total_exp_prev / count_prev if count_prev > 0 else None
-    insight_expense_vs_avg = None
-    insight_expense_vs_avg_percent = None
-    insight_expense_higher = None
-
-    if avg_exp_prev and avg_exp_prev > 0:
-        diff = expense_month - avg_exp_prev
-        insight_expense_vs_avg = diff
-        insight_expense_higher = diff > 0
-        insight_expense_vs_avg_percent = float((diff / avg_exp_prev) * 100)
-
-    # ===== งบประมาณรายหมวดของ user นี้ =====
-    budget_items = []
-    budgets_qs = (
-        CategoryBudget.objects
-        .filter(owner=user, year=year, month=month)
-        .select_related("category")
-    )
-
-    budget_over_count = 0
-    for b in budgets_qs:
-        budget_amount = b.amount or Decimal("0")
-        spent = expense_map_by_cat.get(b.category_id, Decimal("0"))
-        diff_b = budget_amount - spent
-        percent_b = float(spent / budget_amount * 100) if budget_amount > 0 else None
-        over = spent > budget_amount
-        if over:
-            budget_over_count += 1
-
-        budget_items.append({
-            "obj": b,
-            "category_name": b.category.name,
-            "budget_amount": budget_amount,
-            "spent": spent,
-            "diff": diff_b,
-            "percent": percent_b,
-            "over": over,
-        })
-
-    budget_items_sorted = sorted(
-        budget_items,
-        key=lambda x: (x["percent"] if x["percent"] is not None else -1),
-        reverse=True,
-    )
-    budget_items_dashboard = budget_items_sorted[:3]
-    budget_total_count = len(budget_items)
-
-    # ===== เป้าหมายของ user นี้ =====
-    goals_preview = []
-    for g in Goal.objects.filter(owner=user, is_active=True).select_related("account").order_by("target_date", "name")[:3]:
-        qs_goal = Transaction.objects.filter(
-            owner=user,
-            goal=g,
-            is_estimate=False,
-            direction=g.direction,
-        )
-        done_g = qs_goal.aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        target_g = g.target_amount or Decimal("0")
-        percent_g = float(done_g / target_g * 100) if target_g > 0 else None
-        remaining_g = target_g - done_g
-
-        goals_preview.append({
-            "obj": g,
-            "done": done_g,
-            "target": target_g,
-            "percent": percent_g,
-            "remaining": remaining_g,
-        })
-
-    # ===== รายการประจำที่กำลังจะถึง (ของ user นี้) =====
-    upcoming_recurring = []
-    last_day = calendar.monthrange(year, month)[1]
+@login_required
+def dashboard_card_json(request, name):
+    """การ์ด 1 ใบของ Dashboard (HTML ของการ์ด + ข้อมูลกราฟ) สำหรับโหลดทีหลัง"""
+    card = DASHBOARD_CARDS.get(name)
+    if card is None or not card.lazy:
+        raise Http404("ไม่พบการ์ดนี้")
 
-    for r in RecurringTransaction.objects.filter(owner=user, is_active=True).select_related("account", "category"):
-        d = min(r.day_of_month, last_day)
-        next_date = today.replace(day=d)
-        if next_date < today:
-            continue
-        upcoming_recurring.append({"obj": r, "next_date": next_date})
+    today = timezone.now().date()
+    dash_pref, _ = DashboardPreference.objects.get_or_create(user=request.user)
+    if not card.enabled(dash_pref):
+        return JsonResponse({"card": name, "enabled": False, "html": "", "data": {}})
+
+    result, _ = build_dashboard(request.user, dash_pref, today, only=[name])
+    html = render_to_string(card.template, {"today": today, **result}, request=request)
+    return JsonResponse({
+        "card": name,
+        "enabled": True,
+        "html": html,
+        "data": {key: result[key] for key in card.json_keys},
+    })
 
-    upcoming_recurring.sort(key=lambda x: x["next_date"])
-    upcoming_recurring = upcoming_recurring[:5]
 
-    # ===== ตั้งค่าหน้า dashboard & แผนปลดหนี้ของ user =====
-    dash_pref, _ = DashboardPreference.objects.get_or_create(user=user)
-    debt_plan, _ = DebtPlanSetting.objects.get_or_create(user=user)
+# การ์ดที่เปิด/ปิดได้ในหน้าตั้งค่า Dashboard (field ของ DashboardPreference, ชื่อที่แสดง)
+DASHBOARD_PREFERENCE_FIELDS = [
+    ("show_smart_insights", "Smart Insights รายจ่าย"),
+    ("show_budget_box", "กล่องสถานะงบประมาณ"),
+    ("show_goals", "เป้าหมายเก็บเงิน"),
+    ("show_recurring", "รายการประจำที่กำลังจะถึง"),
+    ("show_today_summary", "สรุปวันนี้"),
+    ("show_trend_chart", "กราฟแนวโน้ม 6 เดือน"),
+    ("show_expense_pie", "กราฟวงกลมรายจ่าย"),
+    ("show_estimate_box", "กล่องประมาณการเดือนนี้"),
+    ("show_accounts", "รายการบัญชีทั้งหมด"),
+    ("show_recent_transactions", "รายการล่าสุด"),
+    ("show_debt_plan_card", "การ์ดแผนปลดหนี้"),
+]
 
-    context = {
-        "today": today,
-        "total_assets": total_assets,
-        "total_liabilities": total_debt,
-        "net_worth": net_worth,
-        "accounts": accounts,
-        "income_month": income_month,
-        "expense_month": expense_month,
-        "net_month": net_month,
-        "est_income": est_income,
-        "est_expense": est_expense,
-        "est_net": est_net,
-        "today_income": today_income,
-        "today_expense": today_expense,
-        "today_net": today_net,
-        "today_income_str": today_income_str,
-        "today_expense_str": today_expense_str,
-        "today_net_str": today_net_str,
-        "recent_tx": recent_tx,
-        "chart_labels": labels,
-        "chart_income": income_data,
-        "chart_expense": expense_data,
-        "cat_labels": cat_labels,
-        "cat_values": cat_values,
-        "insight_top_category_name": insight_top_category_name,
-        "insight_top_category_amount": insight_top_category_amount,
-        "insight_expense_vs_avg": insight_expense_vs_avg,
-        "insight_expense_vs_avg_percent": insight_expense_vs_avg_percent,
-        "insight_expense_higher": insight_expense_higher,
-        "avg_exp_prev": avg_exp_prev,
-        "budget_items_dashboard": budget_items_dashboard,
-        "budget_total_count": budget_total_count,
-        "budget_over_count": budget_over_count,
-        "goals_preview": goals_preview,
-        "upcoming_recurring": upcoming_recurring,
-        "dash_pref": dash_pref,
-        "debt_plan": debt_plan,
-    }
-    return render(request, "app_finance/dashboard.html", context)
 
 @login_required
 def dashboard_preferences(request):
@@ -511,28 +449,18 @@ def dashboard_preferences(request):
     pref, _ = DashboardPreference.objects.get_or_create(user=request.user)
 
     if request.method == "POST":
-        fields = [
-            "show_smart_insights",
-            "show_budget_box",
-            "show_goals",
-            "show_recurring",
-            "show_today_summary",
-            "show_trend_chart",
-            "show_expense_pie",
-            "show_estimate_box",
-            "show_accounts",
-            "show_recent_transactions",
-            "show_debt_plan_card",
-        ]
-
-        for field in fields:
+        for field, _label in DASHBOARD_PREFERENCE_FIELDS:
             setattr(pref, field, field in request.POST)
 
         pref.save()
         messages.success(request, "บันทึกการตั้งค่าหน้า Dashboard แล้วคับ")
         return redirect("app_finance:dashboard")
 
-    return render(request, "app_finance/dashboard_preferences.html", {"pref": pref})
+    cards = [
+        (field, label, getattr(pref, field))
+        for field, label in DASHBOARD_PREFERENCE_FIELDS
+    ]
+    return render(request, "app_finance/dashboard_preferences.html", {"pref": pref, "cards": cards})
 
 
 # =========================
@@ -545,68 +473,98 @@ def tools_home(request):
     return render(request, "app_finance/tools.html", {"now": now})
 
 
+@login_required
+def perf_stats_json(request):
+    """
+    สถิติ query / เวลาต่อ view ของ process นี้ (จาก QueryStatsMiddleware) เฉพาะ staff
+    POST ?reset=1 ล้างสถิติเริ่มนับใหม่
+    """
+    if not request.user.is_staff:
+        raise Http404
+
+    if request.method == "POST" and request.POST.get("reset"):
+        perf_stats.reset()
+
+    return JsonResponse({
+        "pid": os.getpid(),
+        "window": perf_stats.window,
+        "budgets": query_budgets(),
+        "views": perf_stats.snapshot(),
+    })
+
+
 @login_required
 def export_full_json(request):
     """
-    Export ข้อมูลหลักทั้งหมดของ user นี้เป็น JSON
+    Export ข้อมูลหลักทั้งหมดของ user นี้เป็น JSON (ส่งแบบ stream ทีละตาราง)
+    ตัวเลือก: ?format=ndjson (1 บรรทัดต่อแถว) / ?compact=1 (ไม่จัดย่อหน้า) / ?gzip=1 (บีบอัด)
     """
     now = timezone.now()
 
-    # เตรียม id สำหรับ filter M2M
-    tx_ids = list(
-        Transaction.objects.filter(owner=request.user).values_list("id", flat=True)
-    )
-    template_ids = list(
-        TransactionTemplate.objects.filter(owner=request.user).values_list("id", flat=True)
-    )
+    if request.GET.get("format") == "ndjson":
+        chunks = iter_backup_ndjson(request.user, now)
+        content_type = "application/x-ndjson"
+        extension = "ndjson"
+    else:
+        chunks = iter_backup_json(request.user, now, compact=request.GET.get("compact") == "1")
+        content_type = "application/json"
+        extension = "json"
 
-    data = {
-        "generated_at": now,
-        "user": request.user.username,
-
-        "accounts": list(Account.objects.filter(owner=request.user).values()),
-        "categories": list(Category.objects.all().values()),  # ของกลาง
-        "tags": list(Tag.objects.filter(owner=request.user).values()),
-        "goals": list(Goal.objects.filter(owner=request.user).values()),
-        "category_budgets": list(CategoryBudget.objects.filter(owner=request.user).values()),
-        "recurring_transactions": list(RecurringTransaction.objects.filter(owner=request.user).values()),
-        "transaction_templates": list(TransactionTemplate.objects.filter(owner=request.user).values()),
-        "transactions": list(Transaction.objects.filter(owner=request.user).values()),
-
-        "transaction_tags": list(
-            Transaction.tags.through.objects.filter(transaction_id__in=tx_ids).values()
-        ),
-        "transaction_template_tags": list(
-            TransactionTemplate.tags.through.objects.filter(transactiontemplate_id__in=template_ids).values()
-        ),
-    }
+    filename = now.strftime(f"myfinance_backup_%Y%m%d_%H%M%S.{extension}")
 
-    filename = now.strftime("myfinance_backup_%Y%m%d_%H%M%S.json")
+    if request.GET.get("gzip") == "1":
+        response = StreamingHttpResponse(gzip_stream(chunks), content_type="application/gzip")
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type=content_type)
 
-    response = JsonResponse(
-        data,
-        json_dumps_params={"ensure_ascii": False, "indent": 2},
-    )
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
+@login_required
+def import_full_json(request):
+    """
+    นำเข้าไฟล์สำรองข้อมูล (จาก export_full_json) ให้ user นี้
+    รันซ้ำได้ ของที่มีอยู่แล้วจะไม่ถูกสร้างซ้ำ
+    """
+    if request.method != "POST":
+        return redirect("app_finance:tools_home")
+
+    upload = request.FILES.get("backup_file")
+    if not upload:
+        messages.error(request, "กรุณาเลือกไฟล์สำรองข้อมูลก่อนคับ")
+        return redirect("app_finance:tools_home")
+
+    try:
+        stats = restore_backup(upload.file, request.user)
+    except RestoreError as exc:
+        messages.error(request, f"อ่านไฟล์สำรองข้อมูลไม่ได้: {exc}")
+        return redirect("app_finance:tools_home")
+
+    tx = stats.get("transactions", {"created": 0, "existing": 0})
+    messages.success(
+        request,
+        f"นำเข้าข้อมูลเรียบร้อยแล้ว รายการใหม่ {tx['created']:,} รายการ "
+        f"(ข้ามรายการที่มีอยู่แล้ว {tx['existing']:,} รายการ)",
+    )
+    return redirect("app_finance:tools_home")
+
+
 # =========================
 #   แผนปลดหนี้
 # =========================
 
-@login_required
-def debts_overview(request):
+def _user_debts(user):
     """
-    หน้าแผนปลดหนี้: ดึงเฉพาะบัญชีของ user
+    บัญชีหนี้ (บัตรเครดิต / เงินกู้ ที่ยอดติดลบ) ของ user
+    return: (list ของ dict ข้อมูลหนี้, หนี้รวม)
     """
-    today = timezone.now().date()
-
     # ดึงเฉพาะบัญชีหนี้ของ user นี้
     base_qs = (
         Account.objects
         .filter(
-            owner=request.user,
+            owner=user,
             is_active=True,
             account_type__in=["CREDIT", "LOAN"],
         )
@@ -646,6 +604,31 @@ def debts_overview(request):
             "months_to_payoff": months_to_payoff,
         })
 
+    return debts, total_debt
+
+
+def _sweep_input(debts):
+    """แปลงหนี้จาก _user_debts() เป็น input ของ calculate_debt_plan / sweep_debt_plans"""
+    return [
+        {
+            "name": d["account"].name,
+            "balance": d["debt_amount"],
+            "interest_rate": d["interest_rate"],
+            "min_payment": d["min_payment"] or Decimal("0"),
+        }
+        for d in debts
+    ]
+
+
+@login_required
+def debts_overview(request):
+    """
+    หน้าแผนปลดหนี้: ดึงเฉพาะบัญชีของ user
+    """
+    today = timezone.now().date()
+
+    debts, total_debt = _user_debts(request.user)
+
     # แผน Snowball / Avalanche (แค่ลำดับ)
     snowball_plan = sorted(debts, key=lambda x: x["debt_amount"])
     avalanche_plan = sorted(debts, key=lambda x: x["interest_rate"], reverse=True)
@@ -690,6 +673,21 @@ def debts_overview(request):
         messages.success(request, "บันทึกแผนปลดหนี้ที่ใช้อยู่เรียบร้อยแล้วคับ")
         return redirect("app_finance:debts_overview")
 
+    # จำลองแผนจริงรายเดือน (รวมดอกเบี้ย) ตามงบที่ตั้งไว้ ผลเก็บใน cache ตาม hash ของข้อมูลหนี้ + งบ
+    # เปิดหน้าซ้ำโดยข้อมูลไม่เปลี่ยนจะไม่ต้องจำลองใหม่
+    plan_results = []
+    if monthly_budget and debts:
+        sweep = sweep_debt_plans(
+            _sweep_input(debts),
+            [monthly_budget],
+            strategies=("SNOWBALL", "AVALANCHE"),
+            parallel=False,
+        )
+        plan_results = [
+            {"strategy": strategy, **cells[0]}
+            for strategy, cells in sweep["surface"].items()
+        ]
+
     # เลือกลำดับตามแผนที่ user เลือก
     active_plan = None
     if plan.strategy == "SNOWBALL":
@@ -709,12 +707,105 @@ def debts_overview(request):
         "monthly_budget_raw": monthly_budget_raw,
         "monthly_budget": monthly_budget,
         "sim_months": sim_months,
+        "plan_results": plan_results,
 
         "plan": plan,
         "active_plan": active_plan,
     }
     return render(request, "app_finance/debts_overview.html", context)
 
+
+DEBT_SWEEP_MAX_STEPS = 60
+DEBT_SWEEP_MAX_MONTHS = 600
+# งบ / ช่วงงบที่รับจาก query string (ค่าใหญ่กว่านี้ quantize ไม่ได้ -> InvalidOperation)
+DEBT_SWEEP_MAX_AMOUNT = Decimal("1e12")
+
+
+def _decimal_param(value, default=None):
+    try:
+        number = Decimal(str(value).replace(",", "").strip())
+    except (InvalidOperation, ValueError, TypeError):
+        return default
+    if not number.is_finite() or abs(number) > DEBT_SWEEP_MAX_AMOUNT:
+        return default
+    return number
+
+
+@login_required
+def debts_sweep_json(request):
+    """
+    จำลองแผนปลดหนี้จริง (รายเดือน รวมดอกเบี้ย) หลายงบ x หลาย strategy ในครั้งเดียว
+    ?budgets=5000,8000,12000 หรือ ?min=&max=&steps=
+    ?strategies=SNOWBALL,AVALANCHE,HYBRID  ?max_months=360  ?quick_win=
+    คืนตาราง (surface) ของจำนวนเดือน / ดอกเบี้ยรวม ไว้ทำกราฟ
+    """
+    debts, total_debt = _user_debts(request.user)
+    sweep_debts = _sweep_input(debts)
+    total_min = sum((d["min_payment"] for d in sweep_debts), Decimal("0"))
+
+    if request.GET.get("budgets"):
+        budgets = [
+            b for b in (_decimal_param(v) for v in request.GET["budgets"].split(","))
+            if b is not None and b > 0
+        ][:DEBT_SWEEP_MAX_STEPS]
+    else:
+        plan = DebtPlanSetting.objects.filter(user=request.user).first()
+        saved_budget = plan.monthly_budget if plan else Decimal("0")
+        low = _decimal_param(request.GET.get("min"), None) or max(total_min, Decimal("100"))
+        high = _decimal_param(request.GET.get("max"), None) or max(saved_budget * 2, low * 3)
+        try:
+            steps = int(request.GET.get("steps", 20))
+        except ValueError:
+            steps = 20
+        steps = min(max(steps, 2), DEBT_SWEEP_MAX_STEPS)
+        high = min(high, DEBT_SWEEP_MAX_AMOUNT)
+        if high <= low:
+            high = min(low * 2, DEBT_SWEEP_MAX_AMOUNT)
+        step = (high - low) / (steps - 1)
+        budgets = [(low + step * i).quantize(Decimal("1")) for i in range(steps)]
+
+    strategies = [
+        st for st in (request.GET.get("strategies") or ",".join(DEBT_STRATEGIES)).upper().split(",")
+        if st in DEBT_STRATEGIES
+    ] or list(DEBT_STRATEGIES)
+
+    try:
+        max_months = int(request.GET.get("max_months", 360))
+    except ValueError:
+        max_months = 360
+    max_months = min(max(max_months, 1), DEBT_SWEEP_MAX_MONTHS)
+
+    result = sweep_debt_plans(
+        sweep_debts,
+        budgets,
+        strategies=strategies,
+        max_months=max_months,
+        quick_win=_decimal_param(request.GET.get("quick_win")) if request.GET.get("quick_win") else None,
+    )
+
+    surface = {
+        strategy: {
+            "months": [c["months"] if c["paid_off"] else None for c in cells],
+            "total_interest": [float(c["total_interest"]) for c in cells],
+            "total_paid": [float(c["total_paid"]) for c in cells],
+            "paid_off": [c["paid_off"] for c in cells],
+        }
+        for strategy, cells in result["surface"].items()
+    }
+
+    return JsonResponse({
+        "debt_count": len(debts),
+        "total_debt": float(total_debt),
+        "total_min_payment": float(total_min),
+        "max_months": max_months,
+        "budgets": [float(b) for b in budgets],
+        "strategies": strategies,
+        "surface": surface,
+        "computed": result["computed"],
+        "cached": result["cached"],
+    })
+
+
 # =========================
 #   TRANSACTION CRUD
 # =========================
@@ -764,6 +855,41 @@ def transaction_create(request):
     })
 
 
+@login_required
+def transactions_import(request):
+    """
+    นำเข้า statement CSV ทีละหลายพันรายการ
+    ติ๊ก "ตรวจอย่างเดียว" เพื่อดูตัวอย่าง + จำนวนรายการซ้ำก่อนบันทึกจริง
+    """
+    report = None
+    if request.method == "POST":
+        form = StatementImportForm(request.POST, request.FILES, user=request.user)
+        if form.is_valid():
+            try:
+                report = import_statement(
+                    form.cleaned_data["file"].file,
+                    request.user,
+                    default_account=form.cleaned_data["account"],
+                    dry_run=form.cleaned_data["dry_run"],
+                )
+            except StatementImportError as exc:
+                form.add_error("file", str(exc))
+            else:
+                if not report["dry_run"]:
+                    messages.success(
+                        request,
+                        f"นำเข้าเรียบร้อย {report['created']:,} รายการ "
+                        f"(ข้ามรายการซ้ำ {report['duplicates']:,} / ผิดพลาด {report['errors']:,})",
+                    )
+    else:
+        form = StatementImportForm(user=request.user)
+
+    return render(request, "app_finance/transactions_import.html", {
+        "form": form,
+        "report": report,
+    })
+
+
 @login_required
 def transaction_edit(request, pk):
     """แก้ไข Transaction (ของ user นี้เท่านั้น)"""
@@ -850,27 +976,14 @@ def categories_manage(request):
     else:
         form = CategoryForm()
 
-    categories = Category.objects.all().order_by("kind", "name")
-
-    for c in categories:
-        this_month_expense = Transaction.objects.filter(
-            owner=request.user,
-            date__year=year,
-            date__month=month,
-            direction="OUT",
-            category=c,
-            is_estimate=False,
-        ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
+    categories = list(Category.objects.all().order_by("kind", "name"))
 
-        c.expense_this_month = this_month_expense
-
-        if c.monthly_budget:
-            if c.monthly_budget > 0:
-                c.budget_percent = float(this_month_expense / c.monthly_budget * 100)
-            else:
-                c.budget_percent = None
-        else:
-            c.budget_percent = None
+    # ยอดทุกหมวดมาจาก query เดียว (ไม่วน aggregate ทีละหมวด)
+    spending = category_spending(request.user, year, month, categories, user_budgets=False)
+    for row in spending["rows"]:
+        c = row["category"]
+        c.expense_this_month = row["used"]
+        c.budget_percent = row["percent"]
 
     month_label = today.strftime("%B %Y")
 
@@ -885,10 +998,6 @@ def categories_manage(request):
 #   RECURRING
 # =========================
 
-def _last_day_of_month(year: int, month: int) -> int:
-    return calendar.monthrange(year, month)[1]
-
-
 @login_required
 def recurring_list(request):
     """หน้าแสดง/เพิ่มรายการประจำทุกเดือน (เฉพาะของ user นี้)"""
@@ -922,53 +1031,23 @@ def recurring_list(request):
 
 @login_required
 def recurring_apply_month(request):
-    """สร้าง Transaction จาก recurring ของ user สำหรับเดือนที่เลือก"""
+    """สร้าง Transaction (ประมาณการ) จาก recurring ของ user สำหรับเดือนที่เลือก"""
     if request.method != "POST":
         return redirect("app_finance:recurring_list")
 
     today = timezone.now().date()
     year = int(request.POST.get("year", today.year))
     month = int(request.POST.get("month", today.month))
-    last_day = calendar.monthrange(year, month)[1]
-
-    created_count = 0
-
-    recurrings = RecurringTransaction.objects.filter(
-        owner=request.user,
-        is_active=True
-    ).select_related("account", "category")
-
-    for r in recurrings:
-        d = min(r.day_of_month, last_day)
-        tx_date = date(year, month, d)
-
-        exists = Transaction.objects.filter(
-            owner=request.user,
-            source_recurring=r,
-            date=tx_date,
-        ).exists()
-        if exists:
-            continue
 
-        note_text = r.name or (r.category.name if r.category else "")
-
-        Transaction.objects.create(
-            owner=request.user,
-            account=r.account,
-            category=r.category,
-            direction=r.direction,
-            amount=r.amount,
-            date=tx_date,
-            note=note_text,
-            is_estimate=True,
-            is_paid=False,
-            source_recurring=r,
-        )
-        created_count += 1
+    result = materialize_recurring(
+        (year, month), (year, month),
+        owners=[request.user],
+        estimate=True,
+    )
 
     messages.success(
         request,
-        f"สร้างรายการ recurring สำหรับ {month}/{year} จำนวน {created_count} รายการแล้ว"
+        f"สร้างรายการ recurring สำหรับ {month}/{year} จำนวน {result['created']} รายการแล้ว"
     )
     return redirect("app_finance:transactions_list")
 
@@ -980,50 +1059,15 @@ def recurring_generate_for_month(request):
     - สร้างเฉพาะ recurring ของ user นี้
     - กันซ้ำ: ถ้ามีรายการเดิมที่สร้างแล้วในเดือนนั้น จะไม่สร้างซ้ำ
     """
-    user = request.user
     today = timezone.now().date()
-    year = today.year
-    month = today.month
-    last_day = _last_day_of_month(year, month)
-
-    recurrings = RecurringTransaction.objects.filter(owner=user, is_active=True)
-    created = 0
-
-    for r in recurrings:
-        # เคารพ start_date / end_date
-        if r.start_date and r.start_date > today:
-            continue
-        if r.end_date and r.end_date < today:
-            continue
-
-        d = min(r.day_of_month, last_day)
-        tx_date = date(year, month, d)
-
-        exists = Transaction.objects.filter(
-            owner=user,
-            source_recurring=r,
-            date=tx_date,
-            amount=r.amount,
-            direction=r.direction,
-            account=r.account,
-            category=r.category,
-        ).exists()
-        if exists:
-            continue
+    this_month = (today.year, today.month)
 
-        Transaction.objects.create(
-            owner=user,
-            account=r.account,
-            category=r.category,
-            date=tx_date,
-            direction=r.direction,
-            amount=r.amount,
-            is_estimate=False,
-            is_paid=True,
-            note=r.name or "รายการประจำ",
-            source_recurring=r,
-        )
-        created += 1
+    result = materialize_recurring(
+        this_month, this_month,
+        owners=[request.user],
+        estimate=False,
+    )
+    created = result["created"]
 
     if created:
         messages.success(request, f"สร้างรายการประจำสำหรับเดือนนี้แล้ว {created} รายการ")
@@ -1040,55 +1084,18 @@ def recurring_generate_for_month(request):
 def summary_month(request):
     """สรุปรายจ่ายต่อหมวด (เฉพาะของ user)"""
     today = timezone.now().date()
-    year = int(request.GET.get("year", today.year))
-    month = int(request.GET.get("month", today.month))
+    year, month = _year_month_param(request, today)
 
     expense_categories = Category.objects.filter(kind="EXPENSE").order_by("name")
 
-    rows = []
-    total_budget = Decimal("0")
-    total_used = Decimal("0")
-
     month_names = {
         1: "ม.ค.", 2: "ก.พ.", 3: "มี.ค.", 4: "เม.ย.",
         5: "พ.ค.", 6: "มิ.ย.", 7: "ก.ค.", 8: "ส.ค.",
         9: "ก.ย.", 10: "ต.ค.", 11: "พ.ย.", 12: "ธ.ค.",
     }
 
-    for c in expense_categories:
-        used = Transaction.objects.filter(
-            owner=request.user,
-            date__year=year,
-            date__month=month,
-            direction="OUT",
-            category=c,
-            is_estimate=False,
-        ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-
-        budget = c.monthly_budget or Decimal("0")
-        remaining = None
-        percent = None
-        over = False
-
-        if budget > 0:
-            remaining = budget - used
-            percent = float(used / budget * 100) if budget > 0 else None
-            if used > budget:
-                over = True
-            total_budget += budget
-
-        total_used += used
-
-        rows.append({
-            "category": c,
-            "used": used,
-            "budget": budget,
-            "remaining": remaining,
-            "percent": percent,
-            "over": over,
-        })
-
-    net_remaining = total_budget - total_used
+    # งบกลางของหมวด (Category.monthly_budget) เหมือนเดิม งบรายเดือนของ user ดูที่หน้างบประมาณ
+    spending = category_spending(request.user, year, month, expense_categories, user_budgets=False)
 
     years_qs = Transaction.objects.filter(owner=request.user).dates("date", "year")
     year_options = [d.year for d in years_qs] or [today.year]
@@ -1097,10 +1104,7 @@ def summary_month(request):
     month_label = f"{month_names.get(month, month)} {year}"
 
     context = {
-        "rows": rows,
-        "total_budget": total_budget,
-        "total_used": total_used,
-        "net_remaining": net_remaining,
+        **spending,
         "year": year,
         "month": month,
         "years": year_options,
@@ -1111,47 +1115,32 @@ def summary_month(request):
 
 
 @login_required
-def monthly_report(request):
-    """รายงานสรุปรายเดือน (ของ user)"""
+async def monthly_report(request):
+    """
+    รายงานสรุปรายเดือน (ของ user)
+    query ที่ไม่ขึ้นต่อกันยิงพร้อมกันด้วย asyncio.gather
+    """
     now = timezone.now()
     today = now.date()
-    year = int(request.GET.get("year", today.year))
-    month = int(request.GET.get("month", today.month))
+    year, month = _year_month_param(request, today)
+    user = await request.auser()
 
     months = [
         (1, "ม.ค."), (2, "ก.พ."), (3, "มี.ค."), (4, "เม.ย."),
         (5, "พ.ค."), (6, "มิ.ย."), (7, "ก.ค."), (8, "ส.ค."),
         (9, "ก.ย."), (10, "ต.ค."), (11, "พ.ย."), (12, "ธ.ค."),
     ]
-    years_qs = Transaction.objects.filter(owner=request.user).dates("date", "year")
-    years = sorted({d.year for d in years_qs} | {today.year}, reverse=True)
     month_label = next((label for m, label in months if m == month), str(month))
     month_label_full = f"{month_label} {year}"
 
+    month_start, month_end = month_range(year, month)
     tx_qs = Transaction.objects.filter(
-        owner=request.user,
-        date__year=year,
-        date__month=month,
+        owner=user,
+        date__gte=month_start,
+        date__lt=month_end,
         is_estimate=False,
-    ).select_related("account", "category").prefetch_related("tags")
-
-    income_sum = tx_qs.filter(direction="IN").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    expense_sum = tx_qs.filter(direction="OUT").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    net_sum = income_sum - expense_sum
-
-    # รายจ่ายตามหมวด
-    expense_by_cat = (
-        tx_qs.filter(direction="OUT")
-        .values("category__name")
-        .annotate(total=Sum("amount"))
-        .order_by("-total")
     )
-    cat_items = []
-    for row in expense_by_cat:
-        name = row["category__name"] or "ไม่ระบุหมวด"
-        total = row["total"] or Decimal("0")
-        cat_items.append({"name": name, "total": total})
-    cat_items_top = cat_items[:7]
+    prev_year, prev_month = add_months(year, month, -1)
 
     # รายจ่ายตาม Tag
     expense_by_tag = (
@@ -1160,31 +1149,57 @@ def monthly_report(request):
         .annotate(total=Sum("amount"))
         .order_by("-total")
     )
-    tag_items = []
-    for row in expense_by_tag:
-        name = row["tags__name"] or "ไม่ระบุแท็ก"
-        total = row["total"] or Decimal("0")
-        tag_items.append({"name": name, "total": total})
-    tag_items_top = tag_items[:7]
-
     # งบประมาณ (ใช้ CategoryBudget ของ user)
     budgets_qs = (
         CategoryBudget.objects
-        .filter(owner=request.user, year=year, month=month)
+        .filter(owner=user, year=year, month=month)
         .select_related("category")
     )
+    goals_qs = Goal.objects.filter(owner=user, is_active=True).select_related("account")
+    big_tx_qs = (
+        tx_qs.select_related("account", "category")
+        .prefetch_related("tags")
+        .order_by("-amount")[:10]
+    )
 
-    expense_by_cat_id = (
-        tx_qs.filter(direction="OUT")
-        .values("category_id")
-        .annotate(total=Sum("amount"))
+    # ยอดรวมของเดือนนี้ + เดือนก่อนหน้า (query เดียว) ยิงพร้อมกับ query อื่น ๆ
+    year_dates, rollup, tag_rows, budgets, goals, big_tx = await asyncio.gather(
+        _alist(Transaction.objects.filter(owner=user).dates("date", "year")),
+        sync_to_async(build_monthly_rollup)(user, (prev_year, prev_month), (year, month)),
+        _alist(expense_by_tag),
+        _alist(budgets_qs),
+        _alist(goals_qs),
+        _alist(big_tx_qs),
     )
-    expense_map = {row["category_id"]: row["total"] or Decimal("0") for row in expense_by_cat_id}
+    years = sorted({d.year for d in year_dates} | {today.year}, reverse=True)
+
+    income_sum = rollup.total(year, month, "IN")
+    expense_sum = rollup.total(year, month, "OUT")
+    net_sum = income_sum - expense_sum
+
+    # รายจ่ายตามหมวด (รวมตามชื่อหมวด)
+    expense_by_name = {}
+    for _, name, total in rollup.category_ranking(year, month, "OUT"):
+        expense_by_name[name] = expense_by_name.get(name, Decimal("0")) + total
+    cat_items = [
+        {"name": name or "ไม่ระบุหมวด", "total": total}
+        for name, total in sorted(expense_by_name.items(), key=lambda x: x[1], reverse=True)
+    ]
+    cat_items_top = cat_items[:7]
+
+    tag_items = []
+    for row in tag_rows:
+        name = row["tags__name"] or "ไม่ระบุแท็ก"
+        total = row["total"] or Decimal("0")
+        tag_items.append({"name": name, "total": total})
+    tag_items_top = tag_items[:7]
+
+    expense_map = rollup.by_category(year, month, "OUT")
 
     budget_rows = []
     total_budget = Decimal("0")
     total_spent_vs_budget = Decimal("0")
-    for b in budgets_qs:
+    for b in budgets:
         budget_amount = b.amount or Decimal("0")
         spent = expense_map.get(b.category_id, Decimal("0"))
         diff = budget_amount - spent
@@ -1205,14 +1220,15 @@ def monthly_report(request):
     total_budget_diff = total_budget - total_spent_vs_budget
     total_budget_percent = float(total_spent_vs_budget / total_budget * 100) if total_budget > 0 else None
 
-    # เป้าหมายของ user
+    # เป้าหมายของ user: ยอดเฉพาะเดือนนี้ของทุกเป้าใน query เดียว
+    progress = await sync_to_async(goal_progress)(
+        user, goals, today, since=month_start, until=month_end,
+    )
     goals_rows = []
-    goals_qs = Goal.objects.filter(owner=request.user, is_active=True).select_related("account")
-    for g in goals_qs:
-        g_tx = tx_qs.filter(goal=g, direction=g.direction)
-        if not g_tx.exists():
+    for g in goals:
+        if g.pk not in progress:
             continue
-        done = g_tx.aggregate(total=Sum("amount"))["total"] or Decimal("0")
+        done = progress[g.pk]["done"]
         target = g.target_amount or Decimal("0")
         percent = float(done / target * 100) if target > 0 else None
         goals_rows.append({
@@ -1222,26 +1238,12 @@ def monthly_report(request):
             "percent": percent,
         })
 
-    big_tx = tx_qs.order_by("-amount")[:10]
-
     insights = []
 
     # เทียบกับเดือนก่อนหน้า
-    prev_year, prev_month = year, month - 1
-    if prev_month <= 0:
-        prev_month += 12
-        prev_year -= 1
+    prev_expense = rollup.total(prev_year, prev_month, "OUT")
 
-    prev_tx_qs = Transaction.objects.filter(
-        owner=request.user,
-        date__year=prev_year,
-        date__month=prev_month,
-        is_estimate=False,
-        direction="OUT",
-    )
-    prev_expense = prev_tx_qs.aggregate(total=Sum("amount"))["total"] or Decimal("0")
-
-    if prev_tx_qs.exists():
+    if rollup.count(prev_year, prev_month, "OUT"):
         diff_prev = expense_sum - prev_expense
         diff_percent_prev = None
         if prev_expense > 0:
@@ -1329,13 +1331,17 @@ def monthly_report(request):
         "big_tx": big_tx,
         "insights": insights,
     }
-    return render(request, "app_finance/monthly_report.html", context)
+    return await arender(request, "app_finance/monthly_report.html", context)
 
 
 @login_required
 def monthly_report_pdf(request):
-    """สร้าง PDF (เฉพาะของ user นี้)"""
-    if HTML is None:
+    """
+    PDF รายงานรายเดือน (เฉพาะของ user นี้)
+    - มีไฟล์ของข้อมูลเวอร์ชันปัจจุบันแล้ว -> ส่งไฟล์ทันที
+    - ยังไม่มี -> สั่งสร้างเบื้องหลัง แล้วแสดงหน้ารอที่คอยเช็คสถานะ
+    """
+    if not pdf_available():
         messages.error(
             request,
             "เครื่องนี้ยังไม่พร้อมใช้ระบบสร้าง PDF (WeasyPrint) ตอนนี้ใช้ปุ่ม Print → Save as PDF จาก browser แทนก่อนนะคับ"
@@ -1343,179 +1349,190 @@ def monthly_report_pdf(request):
         return redirect("app_finance:summary_month")
 
     today = timezone.now().date()
-    year = int(request.GET.get("year", today.year))
-    month = int(request.GET.get("month", today.month))
+    year, month = _year_month_param(request, today)
 
-    expense_categories = Category.objects.filter(kind="EXPENSE").order_by("name")
+    job = enqueue_report(request.user, year, month)
+    if job.status == "DONE":
+        return _report_file_response(job)
 
-    rows = []
-    total_budget = Decimal("0")
-    total_used = Decimal("0")
-
-    for c in expense_categories:
-        used = Transaction.objects.filter(
-            owner=request.user,
-            date__year=year,
-            date__month=month,
-            direction="OUT",
-            category=c,
-            is_estimate=False,
-        ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-
-        budget = c.monthly_budget or Decimal("0")
-        remaining = None
-        percent = None
-        over = False
-
-        if budget > 0:
-            remaining = budget - used
-            percent = float(used / budget * 100) if budget > 0 else None
-            if used > budget:
-                over = True
-            total_budget += budget
-
-        total_used += used
-
-        rows.append({
-            "category": c,
-            "used": used,
-            "budget": budget,
-            "remaining": remaining,
-            "percent": percent,
-            "over": over,
-        })
+    return render(request, "app_finance/report_pdf_wait.html", {
+        "job": job,
+        "month_label": f"{REPORT_MONTH_NAMES.get(month, month)} {year}",
+        "status_url": reverse("app_finance:report_job_status", args=[job.pk]),
+    })
 
-    net_remaining = total_budget - total_used
 
-    month_tx = Transaction.objects.filter(
-        owner=request.user,
-        date__year=year,
-        date__month=month,
-        is_estimate=False,
+def _report_file_response(job):
+    return FileResponse(
+        job.pdf.open("rb"),
+        content_type="application/pdf",
+        filename=report_filename(job.year, job.month),
     )
-    income_month = month_tx.filter(direction="IN").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    expense_month = month_tx.filter(direction="OUT").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    net_month = income_month - expense_month
-
-    month_names = {
-        1: "มกราคม", 2: "กุมภาพันธ์", 3: "มีนาคม", 4: "เมษายน",
-        5: "พฤษภาคม", 6: "มิถุนายน", 7: "กรกฎาคม", 8: "สิงหาคม",
-        9: "กันยายน", 10: "ตุลาคม", 11: "พฤศจิกายน", 12: "ธันวาคม",
-    }
-    month_label = f"{month_names.get(month, month)} {year}"
 
-    context = {
-        "month_label": month_label,
-        "year": year,
-        "month": month,
-        "rows": rows,
-        "total_budget": total_budget,
-        "total_used": total_used,
-        "net_remaining": net_remaining,
-        "income_month": income_month,
-        "expense_month": expense_month,
-        "net_month": net_month,
-    }
 
-    template = get_template("app_finance/monthly_report_pdf.html")
-    html_string = template.render(context)
+@login_required
+def report_job_status(request, pk):
+    """สถานะงานสร้าง PDF (หน้ารอเรียกซ้ำทุก ๆ 2 วินาที)"""
+    job = get_object_or_404(ReportJob, pk=pk, owner=request.user)
+    ready = job.status == "DONE"
+    return JsonResponse({
+        "id": job.pk,
+        "year": job.year,
+        "month": job.month,
+        "status": job.status,
+        "status_label": job.get_status_display(),
+        "ready": ready,
+        "url": reverse("app_finance:report_job_download", args=[job.pk]) if ready else None,
+        "error": job.error,
+    })
 
-    html = HTML(string=html_string, base_url=request.build_absolute_uri("/"))
-    pdf_bytes = html.write_pdf()
 
-    filename = f"finance_report_{year}_{month:02d}.pdf"
-    response = HttpResponse(pdf_bytes, content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="{filename}"'
-    return response
+@login_required
+def report_job_download(request, pk):
+    job = get_object_or_404(ReportJob, pk=pk, owner=request.user, status="DONE")
+    if not job.pdf or not job.pdf.storage.exists(job.pdf.name):
+        raise Http404("ไม่พบไฟล์รายงาน")
+    return _report_file_response(job)
 
 
 # =========================
 #   CASH CALENDAR
 # =========================
 
+# ช่วงเวลาที่เลือกดูได้ในหน้าปฏิทิน -> จำนวนเดือน
+CALENDAR_SPANS = {"month": 1, "quarter": 3, "year": 12}
+CALENDAR_MAX_MONTHS = 24
+
+
 @login_required
 def cash_calendar(request):
-    """ปฏิทินเงินเข้า–ออกของ user ต่อเดือน"""
+    """
+    ปฏิทินเงินเข้า–ออกของ user
+    ?view=month (ค่าเริ่มต้น) / quarter / year หรือ ?months=N ดูต่อกัน N เดือนจากเดือนที่เลือก
+    """
     today = timezone.now().date()
-    year = int(request.GET.get("year", today.year))
-    month = int(request.GET.get("month", today.month))
-
-    days_in_month = calendar.monthrange(year, month)[1]
-
-    days = []
-    for d in range(1, days_in_month + 1):
-        current = date(year, month, d)
-        qs = Transaction.objects.filter(
-            owner=request.user,
-            date=current,
-            is_estimate=False,
-        )
-
-        total_in = qs.filter(direction="IN").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-        total_out = qs.filter(direction="OUT").aggregate(s=Sum("amount"))["s"] or Decimal("0")
-        net = total_in - total_out
-
-        rec_today = RecurringTransaction.objects.filter(
-            owner=request.user,
-            is_active=True,
-            day_of_month=d,
-        ).select_related("account", "category")
-
-        days.append({
-            "date": current,
-            "day": d,
-            "weekday": current.weekday(),
-            "total_in": total_in,
-            "total_out": total_out,
-            "net": net,
-            "recurring": list(rec_today),
-        })
-
-    first_weekday = days[0]["weekday"] if days else 0
-    empty_start = list(range(first_weekday))
-
-    months = [
-        (1, "ม.ค."), (2, "ก.พ."), (3, "มี.ค."), (4, "เม.ย."),
-        (5, "พ.ค."), (6, "มิ.ย."), (7, "ก.ค."), (8, "ส.ค."),
-        (9, "ก.ย."), (10, "ต.ค."), (11, "พ.ย."), (12, "ธ.ค."),
-    ]
+    year, month = _year_month_param(request, today)
+
+    view_mode = request.GET.get("view", "month")
+    if view_mode not in CALENDAR_SPANS:
+        view_mode = "month"
+    span = CALENDAR_SPANS[view_mode]
+    first_month = (year, month)
+    if view_mode == "quarter":
+        first_month = (year, (month - 1) // 3 * 3 + 1)
+    elif view_mode == "year":
+        first_month = (year, 1)
+
+    try:
+        custom_span = int(request.GET.get("months", ""))
+    except ValueError:
+        custom_span = None
+    if custom_span:
+        view_mode = "months"
+        first_month = (year, month)
+        span = min(max(custom_span, 1), CALENDAR_MAX_MONTHS)
+
+    last_month = add_months(*first_month, span - 1)
+    calendar_months = build_cash_calendar(request.user, first_month, last_month, today)
+
+    months = list(MONTH_LABELS.items())
     years_qs = Transaction.objects.filter(owner=request.user).dates("date", "year")
     year_options = sorted({d.year for d in years_qs} | {today.year})
 
-    month_label = f"{dict(months).get(month, month)} {year}"
+    month_label = calendar_months[0]["label"]
+    if len(calendar_months) > 1:
+        month_label = f"{month_label} – {calendar_months[-1]['label']}"
 
     context = {
         "today": today,
         "year": year,
         "month": month,
         "month_label": month_label,
-        "days": days,
-        "empty_start": empty_start,
+        "view_mode": view_mode,
+        "span": span,
+        "calendar_months": calendar_months,
         "months": months,
         "years": year_options,
     }
     return render(request, "app_finance/cash_calendar.html", context)
 
 
+# =========================
+#   CASH FORECAST
+# =========================
+
+def _forecast_months(request):
+    """?months=3 / 12 / 36 (ค่าอื่นใช้ค่าเริ่มต้น)"""
+    try:
+        months = int(request.GET.get("months", FORECAST_DEFAULT_MONTHS))
+    except ValueError:
+        months = FORECAST_DEFAULT_MONTHS
+    return months if months in FORECAST_HORIZONS else FORECAST_DEFAULT_MONTHS
+
+
+@login_required
+def cash_forecast(request):
+    """พยากรณ์ยอดเงินแต่ละบัญชีล่วงหน้าจากรายการประจำ + รายการประมาณการ"""
+    today = timezone.now().date()
+    months = _forecast_months(request)
+    forecast = build_forecast(request.user, today, months)
+
+    context = {
+        "today": today,
+        "months": months,
+        "horizons": FORECAST_HORIZONS,
+        "forecast": forecast,
+    }
+    return render(request, "app_finance/cash_forecast.html", context)
+
+
+@login_required
+def cash_forecast_json(request):
+    """ผลพยากรณ์ยอดคงเหลือรายวัน (ทุกบัญชี + ยอดรวม) สำหรับกราฟ / ใช้ต่อที่อื่น"""
+    today = timezone.now().date()
+    forecast = build_forecast(request.user, today, _forecast_months(request))
+    return JsonResponse(forecast_as_json(forecast))
+
+
 # =========================
 #   GOALS
 # =========================
 
+def _save_goal_form(request, user):
+    """บันทึกเป้าหมายใหม่จากฟอร์ม (form validate ใช้ ORM แบบ sync)"""
+    form = GoalForm(request.POST)
+    if form.is_valid():
+        obj = form.save(commit=False)
+        obj.owner = user
+        obj.save()
+        messages.success(request, "บันทึกเป้าหมายเรียบร้อยแล้ว")
+    return form
+
+
 @login_required
-def goals_list(request):
-    """เป้าหมายเก็บเงินของ user"""
+async def goals_list(request):
+    """เป้าหมายเก็บเงินของ user (จำนวน query คงที่ไม่ว่าจะมีกี่เป้า)"""
     today = timezone.now().date()
-    goals = Goal.objects.filter(owner=request.user, is_active=True).select_related("account").order_by("target_date", "name")
+    user = await request.auser()
+
+    if request.method == "POST":
+        form = await sync_to_async(_save_goal_form)(request, user)
+        if form.is_valid():
+            return redirect("app_finance:goals_list")
+    else:
+        form = GoalForm()
+
+    goals = await _alist(
+        Goal.objects.filter(owner=user, is_active=True)
+        .select_related("account")
+        .order_by("target_date", "name")
+    )
+    # ยอดสะสมเก็บไว้ใน Goal.done_amount แล้ว query นี้ใช้คิดความเร็วเพื่อคาดการณ์วันถึงเป้า
+    progress = await sync_to_async(goal_progress)(user, goals, today)
 
     for g in goals:
-        qs = Transaction.objects.filter(
-            owner=request.user,
-            goal=g,
-            is_estimate=False,
-            direction=g.direction,
-        )
-        done = qs.aggregate(total=Sum("amount"))["total"] or Decimal("0")
-        g.done_amount = done
+        done = g.done_amount
+        g.projection = project_goal(g, done, progress.get(g.pk), today)
         target = g.target_amount or Decimal("0")
         g.remaining_amount = target - done
 
@@ -1530,18 +1547,7 @@ def goals_list(request):
         else:
             g.days_left = None
 
-    if request.method == "POST":
-        form = GoalForm(request.POST)
-        if form.is_valid():
-            obj = form.save(commit=False)
-            obj.owner = request.user
-            obj.save()
-            messages.success(request, "บันทึกเป้าหมายเรียบร้อยแล้ว")
-            return redirect("app_finance:goals_list")
-    else:
-        form = GoalForm()
-
-    return render(request, "app_finance/goals_list.html", {
+    return await arender(request, "app_finance/goals_list.html", {
         "today": today,
         "goals": goals,
         "form": form,
@@ -1565,10 +1571,12 @@ def goal_detail(request, pk):
         direction=goal.direction,
     ).select_related("account", "category").order_by("-date", "-id")
 
-    done = tx_qs.aggregate(total=Sum("amount"))["total"] or Decimal("0")
+    done = goal.done_amount
     target = goal.target_amount or Decimal("0")
     remaining = target - done
     percent = float(done / target * 100) if target > 0 else None
+    progress = goal_progress(request.user, [goal], today)
+    projection = project_goal(goal, done, progress.get(goal.pk), today)
 
     if goal.target_date:
         delta = goal.target_date - today
@@ -1585,6 +1593,7 @@ def goal_detail(request, pk):
         "remaining": remaining,
         "percent": percent,
         "days_left": days_left,
+        "projection": projection,
     }
     return render(request, "app_finance/goal_detail.html", context)
 
@@ -1594,14 +1603,11 @@ def goal_detail(request, pk):
 # =========================
 
 @login_required
-def budgets_overview(request):
-    """ดูงบประมาณรายจ่ายต่อหมวดของ user"""
+async def budgets_overview(request):
+    """ดูงบประมาณรายจ่ายต่อหมวดของ user (ปีที่มีงบ / งบเดือนนี้ / ยอดใช้จริง ยิงพร้อมกัน)"""
     today = timezone.now().date()
-    year = int(request.GET.get("year", today.year))
-    month = int(request.GET.get("month", today.month))
-
-    years_from_budget = CategoryBudget.objects.filter(owner=request.user).values_list("year", flat=True).distinct()
-    years = sorted(set(years_from_budget) | {today.year}, reverse=True)
+    year, month = _year_month_param(request, today)
+    user = await request.auser()
 
     months = [
         (1, "ม.ค."), (2, "ก.พ."), (3, "มี.ค."), (4, "เม.ย."),
@@ -1609,25 +1615,22 @@ def budgets_overview(request):
         (9, "ก.ย."), (10, "ต.ค."), (11, "พ.ย."), (12, "ธ.ค."),
     ]
 
-    budgets = (
-        CategoryBudget.objects
-        .filter(owner=request.user, year=year, month=month)
-        .select_related("category")
-        .order_by("category__name")
-    )
-
-    expense_qs = (
-        Transaction.objects.filter(
-            owner=request.user,
-            date__year=year,
-            date__month=month,
-            direction="OUT",
-            is_estimate=False,
-        )
-        .values("category_id")
-        .annotate(total=Sum("amount"))
+    years_from_budget, budgets, rollup = await asyncio.gather(
+        _alist(
+            CategoryBudget.objects.filter(owner=user)
+            .values_list("year", flat=True)
+            .distinct()
+        ),
+        _alist(
+            CategoryBudget.objects
+            .filter(owner=user, year=year, month=month)
+            .select_related("category")
+            .order_by("category__name")
+        ),
+        sync_to_async(build_monthly_rollup)(user, (year, month), (year, month)),
     )
-    expense_map = {row["category_id"]: row["total"] or Decimal("0") for row in expense_qs}
+    years = sorted(set(years_from_budget) | {today.year}, reverse=True)
+    expense_map = rollup.by_category(year, month, "OUT")
 
     items = []
     total_budget = Decimal("0")
@@ -1671,7 +1674,7 @@ def budgets_overview(request):
         "total_diff": total_diff,
         "total_percent": total_percent,
     }
-    return render(request, "app_finance/budgets_overview.html", context)
+    return await arender(request, "app_finance/budgets_overview.html", context)
 
 
 # =========================
@@ -59,6 +59,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app_finance.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,6 +100,78 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# ผลจำลองแผนปลดหนี้ใช้ alias ตาม DEBT_PLAN_CACHE (LocMem ตัด entry ที่ใช้น้อยสุดทิ้งเมื่อเกิน MAX_ENTRIES)
+# อยากให้แชร์กันหลาย process / อยู่รอดตอน restart เปลี่ยน BACKEND เป็น
+#   "django.core.cache.backends.filebased.FileBasedCache" + LOCATION เป็น path โฟลเดอร์ หรือ
+#   "django.core.cache.backends.db.DatabaseCache" + LOCATION เป็นชื่อตาราง (แล้วรัน createcachetable)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'debt_plans': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'debt-plans',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 4096},
+    },
+}
+
+DEBT_PLAN_CACHE = 'debt_plans'
+
+# จำนวน thread ที่สร้าง PDF รายงานเบื้องหลังใน process ของ web
+# ตั้งเป็น 0 ถ้าไม่อยากให้ web ทำเอง แล้วรัน `python manage.py build_reports --pending` ผ่าน cron แทน
+REPORT_WORKERS = 2
+
+# ตัดคำไทยสำหรับ search index ของรายการ: "bigram" (ไม่ต้องติดตั้งอะไรเพิ่ม) หรือ "pythainlp" (ต้อง pip install pythainlp)
+# เปลี่ยนแล้วต้องรัน `python manage.py rebuild_search`
+SEARCH_THAI_SEGMENTER = 'bigram'
+
+# วัดจำนวน SQL / เวลาต่อ request (app_finance.middleware.QueryStatsMiddleware) ดูสรุปได้ที่ /tools/perf/ (staff)
+PERF_STATS_ENABLED = True
+PERF_STATS_WINDOW = 500    # เก็บ request ล่าสุดกี่ตัวต่อ view ไว้คิด p50 / p95
+PERF_SLOW_QUERIES = 3      # แนบ query ที่ช้าที่สุดกี่ตัวไปกับ log
+
+# จำนวน query สูงสุดต่อ view (นับรวม session / auth แล้ว) เกิน = log warning
+# QUERY_BUDGET_STRICT = True จะ raise QueryBudgetExceeded แทน (เปิดไว้ตอนรัน test)
+QUERY_BUDGETS = {
+    'app_finance:home': 10,
+    'app_finance:dashboard': 15,
+    'app_finance:dashboard_card_json': 10,
+    'app_finance:transactions_list': 10,
+    'app_finance:transactions_page_json': 8,
+    'app_finance:transactions_search_json': 5,
+    'app_finance:categories_manage': 8,
+    'app_finance:summary_month': 10,
+    'app_finance:monthly_report': 20,
+    'app_finance:budgets_overview': 10,
+    'app_finance:goals_list': 10,
+    'app_finance:cash_calendar': 12,
+    'app_finance:cash_forecast': 10,
+    'app_finance:cash_forecast_json': 10,
+    'app_finance:debts_overview': 10,
+    'app_finance:debts_sweep_json': 10,
+}
+QUERY_BUDGET_STRICT = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO = log ทุก request เป็น JSON 1 บรรทัด / WARNING = เฉพาะ request ที่เกิน budget
+        'app_finance.perf': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 